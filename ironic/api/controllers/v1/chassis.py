@@ -123,7 +123,10 @@ class ChassisCollection(collection.Collection):
         collection.chassis = [Chassis.convert_with_links(ch, expand)
                               for ch in chassis]
         url = url or None
-        collection.next = collection.get_next(limit, url=url, **kwargs)
+        marker = (api_utils.encode_marker(chassis[-1], kwargs.get('sort_key'))
+                  if chassis else None)
+        collection.next = collection.get_next(limit, url=url, marker=marker,
+                                              **kwargs)
         return collection
 
     @classmethod
@@ -151,10 +154,7 @@ class ChassisController(rest.RestController):
                                 expand=False, resource_url=None):
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Chassis.get_by_uuid(pecan.request.context,
-                                                     marker)
+        marker_obj = api_utils.get_marker(objects.Chassis, marker, sort_key)
         chassis = objects.Chassis.list(pecan.request.context, limit,
                                        marker_obj, sort_key=sort_key,
                                        sort_dir=sort_dir)
@@ -164,7 +164,7 @@ class ChassisController(rest.RestController):
                                                     sort_key=sort_key,
                                                     sort_dir=sort_dir)
 
-    @wsme_pecan.wsexpose(ChassisCollection, types.uuid,
+    @wsme_pecan.wsexpose(ChassisCollection, wtypes.text,
                          int, wtypes.text, wtypes.text)
     def get_all(self, marker=None, limit=None, sort_key='id', sort_dir='asc'):
         """Retrieve a list of chassis.
@@ -176,7 +176,7 @@ class ChassisController(rest.RestController):
         """
         return self._get_chassis_collection(marker, limit, sort_key, sort_dir)
 
-    @wsme_pecan.wsexpose(ChassisCollection, types.uuid, int,
+    @wsme_pecan.wsexpose(ChassisCollection, wtypes.text, int,
                          wtypes.text, wtypes.text)
     def detail(self, marker=None, limit=None, sort_key='id', sort_dir='asc'):
         """Retrieve a list of chassis with detail.
@@ -33,16 +33,22 @@ class Collection(base.APIBase):
         """Return whether collection has more items."""
         return len(self.collection) and len(self.collection) == limit
 
-    def get_next(self, limit, url=None, **kwargs):
-        """Return a link to the next subset of the collection."""
+    def get_next(self, limit, url=None, marker=None, **kwargs):
+        """Return a link to the next subset of the collection.
+
+        :param marker: the marker of the next subset, see
+                       :func:`ironic.api.controllers.v1.utils.encode_marker`.
+                       Default: the uuid of the last item.
+        """
         if not self.has_next(limit):
             return wtypes.Unset
 
         resource_url = url or self._type
+        marker = marker or self.collection[-1].uuid
         q_args = ''.join(['%s=%s&' % (key, kwargs[key]) for key in kwargs])
         next_args = '?%(args)slimit=%(limit)d&marker=%(marker)s' % {
                                             'args': q_args, 'limit': limit,
-                                            'marker': self.collection[-1].uuid}
+                                            'marker': marker}
 
         return link.Link.make_link('next', pecan.request.host_url,
                                    resource_url, next_args).href
@@ -13,11 +13,15 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import datetime
+import threading
 
 from oslo.config import cfg
+from oslo import messaging
 import pecan
 from pecan import rest
+import six
 import wsme
 from wsme import types as wtypes
 import wsmeext.pecan as wsme_pecan
@@ -30,6 +34,7 @@ from ironic.api.controllers.v1 import types
 from ironic.api.controllers.v1 import utils as api_utils
 from ironic.common import exception
 from ironic.common.i18n import _
+from ironic.common.i18n import _LE
 from ironic.common import states as ir_states
 from ironic.common import utils
 from ironic import objects
@@ -52,6 +57,10 @@ LOG = log.getLogger(__name__)
 # versions, the API service should be restarted.
 _VENDOR_METHODS = {}
 
+# The fields of the nodes shown by the lists which are not expanded.
+_LIST_FIELDS = ['instance_uuid', 'maintenance', 'power_state',
+                'provision_state', 'uuid']
+
 
 class NodePatchType(types.JsonPatchType):
 
@@ -483,9 +492,7 @@ class Node(base.APIBase):
     @staticmethod
     def _convert_with_links(node, url, expand=True):
         if not expand:
-            except_list = ['instance_uuid', 'maintenance', 'power_state',
-                           'provision_state', 'uuid']
-            node.unset_fields_except(except_list)
+            node.unset_fields_except(_LIST_FIELDS)
         else:
             node.ports = [link.Link.make_link('self', url, 'nodes',
                                               node.uuid + "/ports"),
@@ -507,7 +514,15 @@ class Node(base.APIBase):
 
     @classmethod
     def convert_with_links(cls, rpc_node, expand=True):
-        node = Node(**rpc_node.as_dict())
+        """Convert a node to its API representation.
+
+        :param rpc_node: a :class:`ironic.objects.node.Node` object, or a
+                         dict of the values of some of its fields.
+        :param expand: whether to show all the fields of the node.
+        """
+        if not isinstance(rpc_node, dict):
+            rpc_node = rpc_node.as_dict()
+        node = Node(**rpc_node)
         return cls._convert_with_links(node, pecan.request.host_url,
                                        expand)
 
@@ -533,6 +548,18 @@ class Node(base.APIBase):
         return cls._convert_with_links(sample, 'http://localhost:6385', expand)
 
 
+class NodeBulk(Node):
+    """API representation of a node of a bulk creation request.
+
+    Unlike for :class:`Node`, the chassis is not looked up when the request
+    is parsed: NodesController.bulk() looks up the chassis of all the nodes
+    at once.
+    """
+
+    chassis_uuid = types.uuid
+    """The UUID of the chassis this node belongs"""
+
+
 class NodeCollection(collection.Collection):
     """API representation of a collection of nodes."""
 
@@ -546,7 +573,10 @@ class NodeCollection(collection.Collection):
     def convert_with_links(nodes, limit, url=None, expand=False, **kwargs):
         collection = NodeCollection()
         collection.nodes = [Node.convert_with_links(n, expand) for n in nodes]
-        collection.next = collection.get_next(limit, url=url, **kwargs)
+        marker = (api_utils.encode_marker(nodes[-1], kwargs.get('sort_key'))
+                  if nodes else None)
+        collection.next = collection.get_next(limit, url=url, marker=marker,
+                                              **kwargs)
         return collection
 
     @classmethod
@@ -683,6 +713,9 @@ class NodesController(rest.RestController):
     _custom_actions = {
         'detail': ['GET'],
         'validate': ['GET'],
+        'power': ['PUT'],
+        'provision': ['PUT'],
+        'bulk': ['POST'],
     }
 
     def _get_nodes_collection(self, chassis_uuid, instance_uuid, associated,
@@ -695,10 +728,7 @@ class NodesController(rest.RestController):
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Node.get_by_uuid(pecan.request.context,
-                                                  marker)
+        marker_obj = api_utils.get_marker(objects.Node, marker, sort_key)
         if instance_uuid:
             nodes = self._get_nodes_by_instance(instance_uuid)
         else:
@@ -710,9 +740,13 @@ class NodesController(rest.RestController):
             if maintenance is not None:
                 filters['maintenance'] = maintenance
 
-            nodes = objects.Node.list(pecan.request.context, limit, marker_obj,
-                                      sort_key=sort_key, sort_dir=sort_dir,
-                                      filters=filters)
+            if expand or sort_key not in objects.Node.fields:
+                nodes = objects.Node.list(pecan.request.context, limit,
+                                          marker_obj, sort_key=sort_key,
+                                          sort_dir=sort_dir, filters=filters)
+            else:
+                nodes = self._get_nodes_fields(limit, marker_obj, sort_key,
+                                               sort_dir, filters)
 
         parameters = {'sort_key': sort_key, 'sort_dir': sort_dir}
         if associated:
@@ -724,6 +758,23 @@ class NodesController(rest.RestController):
                                                  expand=expand,
                                                  **parameters)
 
+    def _get_nodes_fields(self, limit, marker, sort_key, sort_dir, filters):
+        """Get only the fields of the nodes shown by unexpanded lists.
+
+        Only these columns are read from the database, and the other
+        fields, which may hold large JSON documents, are not decoded.
+
+        :returns: a list of dicts of the values of the fields, and of the
+                  id and sort key needed by the pagination marker.
+        """
+        columns = ['id'] + _LIST_FIELDS
+        if sort_key not in columns:
+            columns.append(sort_key)
+        rows = pecan.request.dbapi.get_nodeinfo_list(
+                columns=columns, filters=filters, limit=limit, marker=marker,
+                sort_key=sort_key, sort_dir=sort_dir)
+        return [dict(zip(columns, row)) for row in rows]
+
     def _get_nodes_by_instance(self, instance_uuid):
         """Retrieve a node by its instance uuid.
 
@@ -737,7 +788,7 @@ class NodesController(rest.RestController):
             return []
 
     @wsme_pecan.wsexpose(NodeCollection, types.uuid, types.uuid,
-               types.boolean, types.boolean, types.uuid, int, wtypes.text,
+               types.boolean, types.boolean, wtypes.text, int, wtypes.text,
                wtypes.text)
     def get_all(self, chassis_uuid=None, instance_uuid=None, associated=None,
                 maintenance=None, marker=None, limit=None, sort_key='id',
@@ -764,7 +815,7 @@ class NodesController(rest.RestController):
                                           limit, sort_key, sort_dir)
 
     @wsme_pecan.wsexpose(NodeCollection, types.uuid, types.uuid,
-            types.boolean, types.boolean, types.uuid, int, wtypes.text,
+            types.boolean, types.boolean, wtypes.text, int, wtypes.text,
             wtypes.text)
     def detail(self, chassis_uuid=None, instance_uuid=None, associated=None,
                maintenance=None, marker=None, limit=None, sort_key='id',
@@ -810,6 +861,286 @@ class NodesController(rest.RestController):
         return pecan.request.rpcapi.validate_driver_interfaces(
                 pecan.request.context, rpc_node.uuid, topic)
 
+    def _do_bulk_action(self, node_uuids, target, valid_targets, send):
+        """Send a bulk request for many nodes to the conductors.
+
+        :param node_uuids: a list of UUIDs of nodes.
+        :param target: The desired state of the nodes.
+        :param valid_targets: a list of the valid target states.
+        :param send: a function sending the request for a list of node
+                     UUIDs to a conductor, called as
+                     send(rpcapi, context, node_uuids, topic) from a
+                     thread of its own.
+        :raises: InvalidStateRequested if the requested target state is
+                 not valid.
+        :raises: InvalidParameterValue if no nodes, or more than the
+                 maximum number of resources returned by a single request,
+                 are given.
+        :returns: a dict mapping each of the node UUIDs to None if the
+                  action was started or accepted by its conductor, or else
+                  to the message of the error which prevented it.
+
+        """
+        if self.from_chassis:
+            raise exception.OperationNotPermitted
+
+        # remove duplicates, keeping the order
+        node_uuids = list(collections.OrderedDict.fromkeys(node_uuids or []))
+        if not node_uuids or len(node_uuids) > CONF.api.max_limit:
+            raise exception.InvalidParameterValue(
+                _('Between 1 and %d node UUIDs must be given.')
+                % CONF.api.max_limit)
+        if target not in valid_targets:
+            raise exception.InvalidStateRequested(
+                    state=target, node=', '.join(node_uuids))
+
+        context = pecan.request.context
+        rpcapi = pecan.request.rpcapi
+        nodes = objects.Node.list(context, filters={'uuid_in': node_uuids})
+        results = dict((uuid, six.text_type(exception.NodeNotFound(node=uuid)))
+                       for uuid in node_uuids)
+
+        def call(topic_uuids, topic):
+            try:
+                results.update(send(rpcapi, context, topic_uuids, topic))
+            except (exception.IronicException,
+                    messaging.MessagingException) as e:
+                results.update((uuid, six.text_type(e))
+                               for uuid in topic_uuids)
+            except Exception as e:
+                # This runs in a thread of its own, so the error would be
+                # lost rather than returned to the client.
+                LOG.exception(_LE('Unexpected error while sending a bulk '
+                                  'request to %s.'), topic)
+                results.update((uuid, six.text_type(e))
+                               for uuid in topic_uuids)
+
+        # The conductors are called in parallel, so that the request takes
+        # as long as the slowest of them rather than the sum of them all.
+        threads = []
+        for topic, topic_nodes in rpcapi.get_topics_for(nodes).items():
+            if topic is None:
+                for node in topic_nodes:
+                    reason = (_('No conductor service registered which '
+                                'supports driver %s.') % node.driver)
+                    results[node.uuid] = six.text_type(
+                            exception.NoValidHost(reason=reason))
+                continue
+            threads.append(threading.Thread(
+                    target=call,
+                    args=([node.uuid for node in topic_nodes], topic)))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    @wsme_pecan.wsexpose({wtypes.text: wtypes.text}, [types.uuid],
+                         wtypes.text, status_code=202)
+    def power(self, node_uuids, target):
+        """Set the power state of many nodes.
+
+        The nodes are sent in a single request to each of the conductors
+        they are mapped to, which change their power states concurrently.
+
+        :param node_uuids: a list of UUIDs of nodes.
+        :param target: The desired power state of the nodes.
+        :raises: InvalidStateRequested (HTTP 400) if the requested target
+                 state is not valid.
+        :raises: InvalidParameterValue (HTTP 400) if no nodes, or more than
+                 the maximum number of resources returned by a single
+                 request, are given.
+        :returns: a dict mapping each of the node UUIDs to None if the
+                  change of its power state was started or accepted by its
+                  conductor, or else to the message of the error which
+                  prevented it.
+
+        """
+        def send(rpcapi, context, topic_uuids, topic):
+            return rpcapi.change_nodes_power_state(context, topic_uuids,
+                                                   target, topic)
+
+        return self._do_bulk_action(node_uuids, target,
+                                    [ir_states.POWER_ON,
+                                     ir_states.POWER_OFF,
+                                     ir_states.REBOOT], send)
+
+    @wsme_pecan.wsexpose({wtypes.text: wtypes.text}, [types.uuid],
+                         wtypes.text, status_code=202)
+    def provision(self, node_uuids, target):
+        """Asynchronous trigger the provisioning of many nodes.
+
+        The nodes are sent in a single request to each of the conductors
+        they are mapped to, which validate them concurrently and start,
+        or queue, their provisioning. The client should continue to GET
+        the status of the nodes to observe the progress of the requested
+        action.
+
+        :param node_uuids: a list of UUIDs of nodes.
+        :param target: The desired provision state of the nodes.
+        :raises: InvalidStateRequested (HTTP 400) if the requested target
+                 state is not valid.
+        :raises: InvalidParameterValue (HTTP 400) if no nodes, or more than
+                 the maximum number of resources returned by a single
+                 request, are given.
+        :returns: a dict mapping each of the node UUIDs to None if its
+                  provisioning was started or accepted by its conductor, or
+                  else to the message of the error which prevented it.
+
+        """
+        def send(rpcapi, context, topic_uuids, topic):
+            if target == ir_states.DELETED:
+                return rpcapi.do_nodes_tear_down(context, topic_uuids, topic)
+            rebuild = (target == ir_states.REBUILD)
+            return rpcapi.do_nodes_deploy(context, topic_uuids, rebuild,
+                                          topic)
+
+        return self._do_bulk_action(node_uuids, target,
+                                    [ir_states.ACTIVE,
+                                     ir_states.DELETED,
+                                     ir_states.REBUILD], send)
+
+    def _check_bulk_duplicates(self, nodes, results):
+        """Check that the nodes to create have distinct UUIDs.
+
+        A UUID is generated for each node which has none, and each node
+        UUID is added to the results.
+
+        :param nodes: a list of NodeBulk objects.
+        :param results: a dict mapping node UUIDs to the error preventing
+                        their creation, or to None.
+        :returns: a dict mapping the instance UUIDs of the nodes to their
+                  node UUID.
+        """
+        by_instance = {}
+        for node in nodes:
+            if not node.uuid:
+                node.uuid = utils.generate_uuid()
+            if node.uuid in results:
+                api_utils.bulk_fail(
+                        results, node.uuid,
+                        exception.NodeAlreadyExists(uuid=node.uuid))
+                continue
+            results[node.uuid] = None
+            if not node.instance_uuid:
+                continue
+            if node.instance_uuid in by_instance:
+                api_utils.bulk_fail(
+                        results, node.uuid,
+                        exception.InstanceAssociated(
+                            instance_uuid=node.instance_uuid,
+                            node=node.uuid))
+            else:
+                by_instance[node.instance_uuid] = node.uuid
+        return by_instance
+
+    def _check_bulk_conflicts(self, results, by_instance):
+        """Check that the nodes to create do not conflict with existing ones.
+
+        :param results: a dict mapping node UUIDs to the error preventing
+                        their creation, or to None.
+        :param by_instance: a dict mapping the instance UUIDs of the nodes
+                            to their node UUID.
+        """
+        # NOTE: these queries must not be sent to the slave database: a
+        #       conflict it has not replicated yet would only be found by
+        #       create_list(), which then rejects all the nodes.
+        dbapi = pecan.request.dbapi
+        for (node_uuid,) in dbapi.get_nodeinfo_list(
+                columns=['uuid'], filters={'uuid_in': list(results)}):
+            api_utils.bulk_fail(results, node_uuid,
+                                exception.NodeAlreadyExists(uuid=node_uuid))
+        if not by_instance:
+            return
+        for node_uuid, instance_uuid in dbapi.get_nodeinfo_list(
+                columns=['uuid', 'instance_uuid'],
+                filters={'instance_uuid_in': list(by_instance)}):
+            api_utils.bulk_fail(results, by_instance[instance_uuid],
+                                exception.InstanceAssociated(
+                                    instance_uuid=instance_uuid,
+                                    node=by_instance[instance_uuid]))
+
+    def _get_bulk_chassis_ids(self, nodes, results):
+        """Set the chassis_id of the nodes to create.
+
+        :param nodes: a list of NodeBulk objects.
+        :param results: a dict mapping node UUIDs to the error preventing
+                        their creation, or to None.
+        :returns: the list of the nodes which may still be created.
+        """
+        context = pecan.request.context
+        chassis_ids = {}
+        for chassis_uuid in set(n.chassis_uuid for n in nodes
+                                if n.chassis_uuid):
+            try:
+                chassis_ids[chassis_uuid] = objects.Chassis.get_by_uuid(
+                        context, chassis_uuid).id
+            except exception.ChassisNotFound as e:
+                chassis_ids[chassis_uuid] = e
+
+        valid_nodes = []
+        for node in nodes:
+            if results[node.uuid] is not None:
+                continue
+            if node.chassis_uuid:
+                chassis_id = chassis_ids[node.chassis_uuid]
+                if isinstance(chassis_id, exception.ChassisNotFound):
+                    api_utils.bulk_fail(results, node.uuid, chassis_id)
+                    continue
+                node.chassis_id = chassis_id
+            valid_nodes.append(node)
+        return valid_nodes
+
+    @wsme_pecan.wsexpose({wtypes.text: wtypes.text}, body=[NodeBulk])
+    def bulk(self, nodes):
+        """Create many nodes.
+
+        All the nodes are validated first, checking the uniqueness of their
+        UUIDs and of their instance UUIDs with a single query each, and
+        the valid ones are then created in a single transaction.
+
+        :param nodes: a list of nodes within the request body.
+        :raises: InvalidParameterValue (HTTP 400) if no nodes, or more than
+                 the maximum number of resources returned by a single
+                 request, are given.
+        :raises: NodeAlreadyExists, InstanceAssociated (HTTP 409) if one of
+                 the valid nodes conflicts with a node created concurrently
+                 by another request. No node is created then.
+        :returns: a dict mapping the UUID of each of the nodes, which is
+                  generated if it was not given, to None if the node was
+                  created, or else to the message of the error which
+                  prevented it.
+
+        """
+        if self.from_chassis:
+            raise exception.OperationNotPermitted
+
+        if not nodes or len(nodes) > CONF.api.max_limit:
+            raise exception.InvalidParameterValue(
+                _('Between 1 and %d nodes must be given.')
+                % CONF.api.max_limit)
+
+        context = pecan.request.context
+        results = collections.OrderedDict()
+        by_instance = self._check_bulk_duplicates(nodes, results)
+        self._check_bulk_conflicts(results, by_instance)
+        new_nodes = [objects.Node(context, **node.as_dict())
+                     for node in self._get_bulk_chassis_ids(nodes, results)]
+
+        # like in post(), the driver of each node must be supported by a
+        # conductor
+        topics = pecan.request.rpcapi.get_topics_for(new_nodes)
+        for node in topics.get(None, []):
+            reason = (_('No conductor service registered which '
+                        'supports driver %s.') % node.driver)
+            api_utils.bulk_fail(results, node.uuid,
+                                exception.NoValidHost(reason=reason))
+
+        new_nodes = [n for n in new_nodes if results[n.uuid] is None]
+        if new_nodes:
+            objects.Node.create_list(context, new_nodes)
+        return results
+
     @wsme_pecan.wsexpose(Node, types.uuid)
     def get_one(self, node_uuid):
         """Retrieve information about the given node.
@@ -13,8 +13,10 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import collections
 import datetime
 
+from oslo.config import cfg
 import pecan
 from pecan import rest
 import wsme
@@ -28,8 +30,11 @@ from ironic.api.controllers.v1 import types
 from ironic.api.controllers.v1 import utils as api_utils
 from ironic.common import exception
 from ironic.common.i18n import _
+from ironic.common import utils
 from ironic import objects
 
+CONF = cfg.CONF
+
 
 class PortPatchType(types.JsonPatchType):
 
@@ -140,6 +145,18 @@ class Port(base.APIBase):
         return cls._convert_with_links(sample, 'http://localhost:6385', expand)
 
 
+class PortBulk(Port):
+    """API representation of a port of a bulk creation request.
+
+    Unlike for :class:`Port`, the node is not looked up when the request
+    is parsed: PortsController.bulk() looks up the nodes of all the ports
+    at once.
+    """
+
+    node_uuid = wsme.wsattr(types.uuid, mandatory=True)
+    """The UUID of the node this port belongs to"""
+
+
 class PortCollection(collection.Collection):
     """API representation of a collection of ports."""
 
@@ -154,7 +171,12 @@ class PortCollection(collection.Collection):
         collection = PortCollection()
         collection.ports = [Port.convert_with_links(p, expand)
                             for p in rpc_ports]
-        collection.next = collection.get_next(limit, url=url, **kwargs)
+        marker = None
+        if rpc_ports:
+            marker = api_utils.encode_marker(rpc_ports[-1],
+                                             kwargs.get('sort_key'))
+        collection.next = collection.get_next(limit, url=url, marker=marker,
+                                              **kwargs)
         return collection
 
     @classmethod
@@ -173,6 +195,7 @@ class PortsController(rest.RestController):
 
     _custom_actions = {
         'detail': ['GET'],
+        'bulk': ['POST'],
     }
 
     def _get_ports_collection(self, node_uuid, address, marker, limit,
@@ -185,10 +208,7 @@ class PortsController(rest.RestController):
         limit = api_utils.validate_limit(limit)
         sort_dir = api_utils.validate_sort_dir(sort_dir)
 
-        marker_obj = None
-        if marker:
-            marker_obj = objects.Port.get_by_uuid(pecan.request.context,
-                                                  marker)
+        marker_obj = api_utils.get_marker(objects.Port, marker, sort_key)
 
         if node_uuid:
             # FIXME(comstud): Since all we need is the node ID, we can
@@ -228,7 +248,7 @@ class PortsController(rest.RestController):
             return []
 
     @wsme_pecan.wsexpose(PortCollection, types.uuid, types.macaddress,
-                         types.uuid, int, wtypes.text, wtypes.text)
+                         wtypes.text, int, wtypes.text, wtypes.text)
     def get_all(self, node_uuid=None, address=None, marker=None, limit=None,
                 sort_key='id', sort_dir='asc'):
         """Retrieve a list of ports.
@@ -245,7 +265,7 @@ class PortsController(rest.RestController):
                                           sort_key, sort_dir)
 
     @wsme_pecan.wsexpose(PortCollection, types.uuid, types.macaddress,
-                         types.uuid, int, wtypes.text, wtypes.text)
+                         wtypes.text, int, wtypes.text, wtypes.text)
     def detail(self, node_uuid=None, address=None, marker=None, limit=None,
                 sort_key='id', sort_dir='asc'):
         """Retrieve a list of ports with detail.
@@ -281,6 +301,129 @@ class PortsController(rest.RestController):
         rpc_port = objects.Port.get_by_uuid(pecan.request.context, port_uuid)
         return Port.convert_with_links(rpc_port)
 
+    def _check_bulk_duplicates(self, ports, results):
+        """Check that the ports to create have distinct UUIDs and MACs.
+
+        A UUID is generated for each port which has none, and each port
+        UUID is added to the results.
+
+        :param ports: a list of PortBulk objects.
+        :param results: a dict mapping port UUIDs to the error preventing
+                        their creation, or to None.
+        :returns: a dict mapping the MAC addresses of the ports to their
+                  port UUID.
+        """
+        by_address = {}
+        for port in ports:
+            if not port.uuid:
+                port.uuid = utils.generate_uuid()
+            if port.uuid in results:
+                api_utils.bulk_fail(
+                        results, port.uuid,
+                        exception.PortAlreadyExists(uuid=port.uuid))
+                continue
+            results[port.uuid] = None
+            if port.address in by_address:
+                api_utils.bulk_fail(
+                        results, port.uuid,
+                        exception.MACAlreadyExists(mac=port.address))
+            else:
+                by_address[port.address] = port.uuid
+        return by_address
+
+    def _check_bulk_conflicts(self, results, by_address):
+        """Check that the ports to create do not conflict with existing ones.
+
+        :param results: a dict mapping port UUIDs to the error preventing
+                        their creation, or to None.
+        :param by_address: a dict mapping the MAC addresses of the ports to
+                           their port UUID.
+        """
+        # NOTE: these queries must not be sent to the slave database: a
+        #       conflict it has not replicated yet would only be found by
+        #       create_list(), which then rejects all the ports.
+        dbapi = pecan.request.dbapi
+        for db_port in dbapi.get_port_list(
+                filters={'uuid_in': list(results)}):
+            api_utils.bulk_fail(results, db_port.uuid,
+                                exception.PortAlreadyExists(
+                                    uuid=db_port.uuid))
+        for db_port in dbapi.get_port_list(
+                filters={'address_in': list(by_address)}):
+            api_utils.bulk_fail(results, by_address[db_port.address],
+                                exception.MACAlreadyExists(
+                                    mac=db_port.address))
+
+    def _get_bulk_node_ids(self, ports, results):
+        """Set the node_id of the ports to create.
+
+        :param ports: a list of PortBulk objects.
+        :param results: a dict mapping port UUIDs to the error preventing
+                        their creation, or to None.
+        :returns: the list of the ports which may still be created.
+        """
+        # NOTE: read from the master database, so that the nodes created
+        #       just before their ports are found.
+        node_uuids = list(set(p.node_uuid for p in ports))
+        node_ids = dict((node_uuid, node_id)
+                        for node_id, node_uuid in
+                        pecan.request.dbapi.get_nodeinfo_list(
+                            columns=['id', 'uuid'],
+                            filters={'uuid_in': node_uuids}))
+
+        valid_ports = []
+        for port in ports:
+            if results[port.uuid] is not None:
+                continue
+            if port.node_uuid not in node_ids:
+                api_utils.bulk_fail(
+                        results, port.uuid,
+                        exception.NodeNotFound(node=port.node_uuid))
+                continue
+            port.node_id = node_ids[port.node_uuid]
+            valid_ports.append(port)
+        return valid_ports
+
+    @wsme_pecan.wsexpose({wtypes.text: wtypes.text}, body=[PortBulk])
+    def bulk(self, ports):
+        """Create many ports.
+
+        All the ports are validated first, looking up their nodes and
+        checking the uniqueness of their UUIDs and of their MAC addresses
+        with a single query each, and the valid ones are then created in
+        a single transaction.
+
+        :param ports: a list of ports within the request body.
+        :raises: InvalidParameterValue (HTTP 400) if no ports, or more than
+                 the maximum number of resources returned by a single
+                 request, are given.
+        :raises: PortAlreadyExists, MACAlreadyExists (HTTP 409) if one of
+                 the valid ports conflicts with a port created concurrently
+                 by another request. No port is created then.
+        :returns: a dict mapping the UUID of each of the ports, which is
+                  generated if it was not given, to None if the port was
+                  created, or else to the message of the error which
+                  prevented it.
+
+        """
+        if self.from_nodes:
+            raise exception.OperationNotPermitted
+
+        if not ports or len(ports) > CONF.api.max_limit:
+            raise exception.InvalidParameterValue(
+                _('Between 1 and %d ports must be given.')
+                % CONF.api.max_limit)
+
+        context = pecan.request.context
+        results = collections.OrderedDict()
+        by_address = self._check_bulk_duplicates(ports, results)
+        self._check_bulk_conflicts(results, by_address)
+        new_ports = [objects.Port(context, **port.as_dict())
+                     for port in self._get_bulk_node_ids(ports, results)]
+        if new_ports:
+            objects.Port.create_list(context, new_ports)
+        return results
+
     @wsme_pecan.wsexpose(Port, body=Port, status_code=201)
     def post(self, port):
         """Create a new port.
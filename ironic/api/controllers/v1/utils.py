@@ -13,11 +13,18 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import base64
+import datetime
+import json
+
 import jsonpatch
 from oslo.config import cfg
+import pecan
+import six
 import wsme
 
 from ironic.common.i18n import _
+from ironic.common import utils
 
 CONF = cfg.CONF
 
@@ -42,6 +49,91 @@ def validate_sort_dir(sort_dir):
     return sort_dir
 
 
+# The format of the datetimes in pagination markers.
+_MARKER_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
+
+def encode_marker(obj, sort_key):
+    """Get the pagination marker of the items following an object.
+
+    The marker is an opaque string holding the value of the sort key and
+    the id of the object, so that the next items can be found without
+    reading the object again.
+
+    :param obj: the last object of a page of results.
+    :param sort_key: the attribute the results are sorted by.
+    :returns: a URL-safe string.
+    """
+    sort_key = sort_key or 'id'
+    value = obj[sort_key]
+    if isinstance(value, datetime.datetime):
+        value = {'datetime': value.strftime(_MARKER_TIME_FORMAT)}
+    marker = json.dumps([sort_key, value, obj['id']])
+    return base64.urlsafe_b64encode(marker.encode('utf-8')).decode(
+            'ascii').rstrip('=')
+
+
+def decode_marker(marker, sort_key):
+    """Get the sort key value and id held in a pagination marker.
+
+    :param marker: a marker returned by :func:`encode_marker`.
+    :param sort_key: the attribute the results are sorted by.
+    :returns: a dict of the values of sort_key and 'id'.
+    :raises: ClientSideError if the marker is invalid or was made for
+             another sort key.
+    """
+    sort_key = sort_key or 'id'
+    try:
+        padding = '=' * (-len(marker) % 4)
+        key, value, obj_id = json.loads(base64.urlsafe_b64decode(
+                str(marker + padding)).decode('utf-8'))
+        if isinstance(value, dict):
+            value = datetime.datetime.strptime(value['datetime'],
+                                               _MARKER_TIME_FORMAT)
+        obj_id = int(obj_id)
+    except (TypeError, ValueError, KeyError):
+        raise wsme.exc.ClientSideError(_("Invalid marker: %s") % marker)
+    if key != sort_key:
+        raise wsme.exc.ClientSideError(
+                _("The marker %(marker)s was returned for a list sorted by "
+                  "%(key)s, not by %(sort_key)s.") %
+                {'marker': marker, 'key': key, 'sort_key': sort_key})
+    return {sort_key: value, 'id': obj_id}
+
+
+def get_marker(obj_class, marker, sort_key):
+    """Get the pagination marker to pass to the list() of an object class.
+
+    :param obj_class: the class of the listed objects, e.g. objects.Node.
+    :param marker: the marker passed to the API: either a marker returned
+                   by :func:`encode_marker`, or the uuid of the last object
+                   of the previous page as returned by older versions, which
+                   costs an extra database query.
+    :param sort_key: the attribute the results are sorted by.
+    :returns: None if there is no marker, or else an object or dict
+              holding the values of sort_key and 'id' of the last object
+              of the previous page.
+    """
+    if not marker:
+        return None
+    if utils.is_uuid_like(marker):
+        return obj_class.get_by_uuid(pecan.request.context, marker)
+    return decode_marker(marker, sort_key)
+
+
+def bulk_fail(results, uuid, error):
+    """Record the first error preventing the creation of a resource.
+
+    :param results: a dict mapping the UUIDs of the resources of a bulk
+                    creation request to the error preventing their
+                    creation, or to None.
+    :param uuid: the UUID of the resource.
+    :param error: the exception preventing its creation.
+    """
+    if results[uuid] is None:
+        results[uuid] = six.text_type(error)
+
+
 def apply_jsonpatch(doc, patch):
     for p in patch:
         if p['op'] == 'add' and p['path'].count('/') == 1:
@@ -393,6 +393,11 @@ class NodeLocked(Conflict):
                 "after the current operation is completed.")
 
 
+class NodeConstraintsNotMet(Conflict):
+    message = _("Node %(node)s could not be reserved because it does not "
+                "match the required constraints: %(constraints)s")
+
+
 class NodeNotLocked(Invalid):
     message = _("Node %(node)s found not to be locked on release")
 
@@ -403,6 +408,11 @@ class NoFreeConductorWorker(TemporaryFailure):
     code = 503  # Service Unavailable (temporary).
 
 
+class WorkerQueueTimeout(NoFreeConductorWorker):
+    message = _('Requested action was not started because no conductor '
+                'worker became free within %(timeout)s seconds.')
+
+
 class VendorPassthruException(IronicException):
     pass
 
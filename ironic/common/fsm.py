@@ -48,6 +48,7 @@ class FSM(object):
         self._target_state = None
         # Note that _current is a _Jump instance
         self._current = None
+        self._frozen = False
 
     @property
     def start_state(self):
@@ -63,6 +64,21 @@ class FSM(object):
     def target_state(self):
         return self._target_state
 
+    @property
+    def frozen(self):
+        """Returns whether states and transitions can no longer be added."""
+        return self._frozen
+
+    def freeze(self):
+        """Freezes the states and transitions of the state machine.
+
+        Once frozen, no state or transition can be added to the machine, or
+        to its shallow copies which share its state and transition tables.
+        Shallow copies are then safe to use as cheap, independent cursors
+        over the same machine.
+        """
+        self._frozen = True
+
     @property
     def terminated(self):
         """Returns whether the state machine is in a terminal state."""
@@ -80,6 +96,9 @@ class FSM(object):
         parameter which is the event that is being processed that caused the
         state transition.
         """
+        if self._frozen:
+            raise excp.InvalidState(_("Can not add state '%s' to a frozen "
+                                      "state machine") % state)
         if state in self._states:
             raise excp.Duplicate(_("State '%s' already defined") % state)
         if on_enter is not None:
@@ -103,6 +122,10 @@ class FSM(object):
 
     def add_transition(self, start, end, event):
         """Adds an allowed transition from start -> end for the given event."""
+        if self._frozen:
+            raise excp.InvalidState(
+                _("Can not add a transition on event '%s' to a frozen "
+                  "state machine") % event)
         if start not in self._states:
             raise excp.NotFound(
                 _("Can not add a transition on event '%(event)s' that "
@@ -188,6 +211,8 @@ class FSM(object):
                         and transitions + states that is defined somewhere
                         and want to use copies to run with (the copies have
                         the current state that is different between machines).
+                        A shallow copy of a frozen machine is frozen too. A
+                        deep copy is never frozen.
         """
         c = FSM(self.start_state)
         if not shallow:
@@ -200,6 +225,7 @@ class FSM(object):
         else:
             c._transitions = self._transitions
             c._states = self._states
+            c._frozen = self._frozen
         return c
 
     def __contains__(self, state):
@@ -46,12 +46,68 @@ hash_opts = [
                     'conductor services to prepare deployment environments '
                     'and potentially allow the Ironic cluster to recover '
                     'more quickly if a conductor instance is terminated.'),
+    cfg.FloatOpt('hash_bounded_load_factor',
+                 default=0.0,
+                 help='[Experimental Feature] '
+                      'When greater than zero, the share of the hash ring '
+                      'served by each conductor is capped to (1 + this '
+                      'value) times its fair share, which is set by its '
+                      'weight. Partitions which would overload a conductor '
+                      'are handed to the next conductor on the ring with '
+                      'spare capacity. Smaller values give a more even '
+                      'distribution, at the cost of more partitions moving '
+                      'when conductors join or leave. Zero disables the '
+                      'cap.'),
 ]
 
 CONF = cfg.CONF
 CONF.register_opts(hash_opts)
 
 
+def get_hash_key(data):
+    """Return the position of the given data on a hash ring.
+
+    The key is the hex digest used by :class:`HashRing` to place the data
+    on the ring. Being fixed-width, keys sort in the same order as the
+    ring's numerical positions, which lets them be stored and compared by
+    the database.
+
+    :param data: A string identifier to be mapped across the ring.
+    :returns: A 32 character hex string.
+    """
+    try:
+        return hashlib.md5(data).hexdigest()
+    except TypeError:
+        raise exception.Invalid(
+                _("Invalid data supplied to HashRing.get_hosts."))
+
+
+def intersect_key_ranges(ranges, other):
+    """Get the hash keys which are in two lists of ranges.
+
+    :param ranges: a sorted list of disjoint (start, end) tuples of hash
+                   keys, as returned by :meth:`HashRing.get_key_ranges`.
+    :param other: another such list.
+    :returns: a sorted list of the (start, end) tuples of hash keys which
+              are in both lists.
+    """
+    result = []
+    for start, end in ranges:
+        for other_start, other_end in other:
+            # None stands for the beginning or the end of the ring
+            if start is None or other_start is None:
+                low = start or other_start
+            else:
+                low = max(start, other_start)
+            if end is None or other_end is None:
+                high = end or other_end
+            else:
+                high = min(end, other_end)
+            if low is None or high is None or low < high:
+                result.append((low, high))
+    return result
+
+
 class HashRing(object):
     """A stable hash ring.
 
@@ -63,38 +119,119 @@ class HashRing(object):
     - we hash each host many times to spread load more finely
       as otherwise adding a host gets (on average) 50% of the load of
       just one other host assigned to it.
+
+    Hosts are hashed in proportion to their weight, so that a host of
+    weight 2 gets about twice as many partitions as a host of weight 1.
+    With a bounded load factor, no host is assigned more than (1 + factor)
+    times its fair share of the ring: the partitions which would exceed
+    it go to the next host on the ring with spare capacity.
     """
 
-    def __init__(self, hosts, replicas=None):
+    def __init__(self, hosts, replicas=None, weights=None, load_factor=None):
         """Create a new hash ring across the specified hosts.
 
         :param hosts: an iterable of hosts which will be mapped.
         :param replicas: number of hosts to map to each hash partition,
                          or len(hosts), which ever is lesser.
                          Default: CONF.hash_distribution_replicas
+        :param weights: a dict mapping hosts to their (positive) capacity
+                        weight. Hosts which are not in it have a weight
+                        of 1.
+                        Default: None
+        :param load_factor: how much more than its fair share of the ring
+                            a host may serve; zero for no limit.
+                            Default: CONF.hash_bounded_load_factor
 
         """
         if replicas is None:
             replicas = CONF.hash_distribution_replicas
+        if load_factor is None:
+            load_factor = CONF.hash_bounded_load_factor
 
         try:
             self.hosts = set(hosts)
             self.replicas = replicas if replicas <= len(hosts) else len(hosts)
-        except TypeError:
+            weights = weights or {}
+            self.weights = dict((host, float(weights.get(host, 1)))
+                                for host in self.hosts)
+        except (TypeError, ValueError):
             raise exception.Invalid(
                     _("Invalid hosts supplied when building HashRing."))
+        if any(weight <= 0 for weight in self.weights.values()):
+            raise exception.Invalid(
+                    _("Invalid weights supplied when building HashRing."))
+        self.load_factor = max(load_factor, 0)
 
+        self.partition_exponent = CONF.hash_partition_exponent
         self._host_hashes = {}
         for host in hosts:
             key = str(host).encode('utf8')
             key_hash = hashlib.md5(key)
-            for p in range(2 ** CONF.hash_partition_exponent):
+            # A host of weight 1 gets the same dividers as an unweighted one
+            count = max(1, int(round(2 ** self.partition_exponent *
+                                     self.weights[host])))
+            for p in range(count):
                 key_hash.update(key)
                 hashed_key = self._hash2int(key_hash)
                 self._host_hashes[hashed_key] = host
         # Gather the (possibly colliding) resulting hashes into a bisectable
         # list.
         self._partitions = sorted(self._host_hashes.keys())
+        if self.load_factor and self._partitions:
+            self._partition_owners = self._bound_partition_owners()
+        else:
+            self._partition_owners = [self._host_hashes[divider]
+                                      for divider in self._partitions]
+        self._key_ranges = {}
+        self._partition_hosts = None
+
+    def _bound_partition_owners(self):
+        """Assign the partitions to hosts without overloading any of them.
+
+        Each partition serves the arc of the ring up to its divider, and
+        each host may serve up to (1 + load_factor) times its weighted
+        share of the whole ring. Partitions are walked in ring order; one
+        whose host is full goes to the host of the next divider on the
+        ring which has room for it, or to the least loaded host relative
+        to its capacity if none has.
+
+        :returns: a list of the host serving each partition.
+        """
+        size = 2 ** 128
+        partitions = self._partitions
+        total_weight = sum(self.weights.values())
+        capacity = dict((host, (1 + self.load_factor) * size * weight /
+                         total_weight)
+                        for host, weight in self.weights.items())
+        load = dict((host, 0) for host in self.hosts)
+
+        owners = []
+        count = len(partitions)
+        for partition in range(count):
+            if partition:
+                arc = partitions[partition] - partitions[partition - 1]
+            else:
+                # partition 0 also serves the keys after the last divider
+                arc = partitions[0] + size - partitions[-1]
+            owner = None
+            seen = set()
+            for offset in range(count):
+                host = self._host_hashes[partitions[(partition + offset) %
+                                                    count]]
+                if host in seen:
+                    continue
+                if load[host] + arc <= capacity[host]:
+                    owner = host
+                    break
+                seen.add(host)
+                if len(seen) == len(self.hosts):
+                    break
+            if owner is None:
+                owner = min(self.hosts,
+                            key=lambda h: (load[h] + arc) / capacity[h])
+            load[owner] += arc
+            owners.append(owner)
+        return owners
 
     def _hash2int(self, key_hash):
         """Convert the given hash's digest to a numerical value for the ring.
@@ -107,12 +244,15 @@ class HashRing(object):
         try:
             key_hash = hashlib.md5(data)
             hashed_key = self._hash2int(key_hash)
-            position = bisect.bisect(self._partitions, hashed_key)
-            return position if position < len(self._partitions) else 0
+            return self._get_partition_for_hash(hashed_key)
         except TypeError:
             raise exception.Invalid(
                     _("Invalid data supplied to HashRing.get_hosts."))
 
+    def _get_partition_for_hash(self, hashed_key):
+        position = bisect.bisect(self._partitions, hashed_key)
+        return position if position < len(self._partitions) else 0
+
     def get_hosts(self, data, ignore_hosts=None):
         """Get the list of hosts which the supplied data maps onto.
 
@@ -126,13 +266,64 @@ class HashRing(object):
                   this `HashRing` was created with. It may be less than this
                   if ignore_hosts is not None.
         """
-        hosts = []
         if ignore_hosts is None:
             ignore_hosts = set()
         else:
             ignore_hosts = set(ignore_hosts)
             ignore_hosts.intersection_update(self.hosts)
         partition = self._get_partition(data)
+        return self._get_hosts_for_partition(partition, ignore_hosts)
+
+    def get_hosts_many(self, data, ignore_hosts=None):
+        """Get the lists of hosts which many pieces of data map onto.
+
+        Equivalent to calling :meth:`get_hosts` for each item, but the
+        hosts serving every partition are worked out once for the whole
+        batch, leaving one digest and one bisection per item.
+
+        :param data: An iterable of string identifiers to be mapped across
+                     the ring.
+        :param ignore_hosts: A list of hosts to skip when performing the hash.
+                             Default: None.
+        :returns: a list with, for each item of data and in the same
+                  order, the list of hosts it maps onto.
+        """
+        if ignore_hosts:
+            ignore_hosts = set(ignore_hosts)
+            ignore_hosts.intersection_update(self.hosts)
+        if ignore_hosts:
+            table = self._build_partition_hosts(ignore_hosts)
+        else:
+            if self._partition_hosts is None:
+                self._partition_hosts = self._build_partition_hosts(set())
+            table = self._partition_hosts
+
+        partitions = self._partitions
+        find = bisect.bisect
+        md5 = hashlib.md5
+        try:
+            return [list(table[find(partitions, int(md5(item).hexdigest(),
+                                                   16))])
+                    for item in data]
+        except TypeError:
+            raise exception.Invalid(
+                    _("Invalid data supplied to HashRing.get_hosts."))
+
+    def _build_partition_hosts(self, ignore_hosts):
+        """Work out the hosts serving each partition.
+
+        :returns: a list indexed by the position bisect() returns, with
+                  one extra entry at the end for data past the last
+                  divider, which wraps around to partition 0.
+        """
+        table = [tuple(self._get_hosts_for_partition(partition,
+                                                     ignore_hosts))
+                 for partition in range(len(self._partitions))]
+        table.append(table[0] if table else ())
+        return table
+
+    def _get_hosts_for_partition(self, partition, ignore_hosts):
+        hosts = []
         for replica in range(0, self.replicas):
             if len(hosts) + len(ignore_hosts) == len(self.hosts):
                 # prevent infinite loop - cannot allocate more fallbacks.
@@ -147,6 +338,89 @@ class HashRing(object):
             hosts.append(host)
         return hosts
 
+    def get_key_ranges(self, host):
+        """Get the ranges of hash keys which map onto the given host.
+
+        This is the inverse of :meth:`get_hosts`: data whose hash key (see
+        :func:`get_hash_key`) falls in one of the returned ranges is mapped
+        onto the host, either as its primary or as one of its replicas.
+
+        :param host: The host to look up.
+        :returns: a list of (start, end) tuples of hash keys. start is
+                  inclusive and end is exclusive; None stands for the
+                  beginning or the end of the ring. An empty list is
+                  returned if the host is not part of this ring.
+        """
+        if host not in self.hosts:
+            return []
+        if host in self._key_ranges:
+            return self._key_ranges[host]
+
+        ranges = []
+        # Partition N serves all keys between divider N-1 (inclusive) and
+        # divider N (exclusive); partition 0 also serves the keys after
+        # the last divider, wrapping around the ring.
+        for partition in range(len(self._partitions)):
+            if host not in self._get_hosts_for_partition(partition, set()):
+                continue
+            start = (self._int2key(self._partitions[partition - 1])
+                     if partition else None)
+            end = self._int2key(self._partitions[partition])
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+
+        if ranges and ranges[0][0] is None:
+            last = self._int2key(self._partitions[-1])
+            if ranges[-1][1] == last:
+                ranges[-1] = (ranges[-1][0], None)
+            else:
+                ranges.append((last, None))
+        self._key_ranges[host] = ranges
+        return ranges
+
+    def get_moved_key_ranges(self, other):
+        """Get the ranges of hash keys mapped differently by another ring.
+
+        Compares this ring with another one, typically a rebuilt copy of
+        it after hosts joined or left, and finds the data whose hosts
+        (primary or replicas) are not the same in both rings.
+
+        :param other: The :class:`HashRing` to compare with.
+        :returns: a list of (start, end) tuples of hash keys, in the same
+                  form as :meth:`get_key_ranges`.
+        """
+        if not self._partitions or not other._partitions:
+            return [(None, None)]
+
+        # Every key between two consecutive dividers of either ring maps
+        # onto the same partitions, so checking one key per span is
+        # enough.
+        dividers = sorted(set(self._partitions) | set(other._partitions))
+        starts = [None] + dividers
+        ends = dividers + [None]
+        ranges = []
+        for start, end in zip(starts, ends):
+            hashed_key = start or 0
+            hosts = self._get_hosts_for_partition(
+                    self._get_partition_for_hash(hashed_key), set())
+            other_hosts = other._get_hosts_for_partition(
+                    other._get_partition_for_hash(hashed_key), set())
+            if hosts == other_hosts:
+                continue
+            start = self._int2key(start) if start is not None else None
+            end = self._int2key(end) if end is not None else None
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+
+    def _int2key(self, value):
+        """Convert a numerical ring position back into a hash key."""
+        return '%032x' % value
+
     def _get_host(self, partition):
         """Find what host is serving a partition.
 
@@ -154,7 +428,7 @@ class HashRing(object):
             e.g. 0 is the first partition, 1 is the second.
         :return: The host object the ring was constructed with.
         """
-        return self._host_hashes[self._partitions[partition]]
+        return self._partition_owners[partition]
 
 
 class HashRingManager(object):
@@ -179,9 +453,10 @@ class HashRingManager(object):
     def _load_hash_rings(self):
         rings = {}
         d2c = self.dbapi.get_active_driver_dict()
+        weights = self.dbapi.get_active_conductor_weights()
 
         for driver_name, hosts in d2c.iteritems():
-            rings[driver_name] = HashRing(hosts)
+            rings[driver_name] = HashRing(hosts, weights=weights)
         return rings
 
     @classmethod
@@ -189,6 +464,55 @@ class HashRingManager(object):
         with cls._lock:
             cls._hash_rings = None
 
+    def refresh(self):
+        """Rebuild the hash rings whose hosts have changed.
+
+        Unlike :meth:`reset`, rings are only rebuilt for the drivers whose
+        set of active conductors (or ring settings) differs from the one
+        they were built with; the others are kept as they are.
+
+        :returns: a dict mapping the names of the drivers whose ring
+                  changed to the list of hash key ranges which moved to
+                  different hosts, as returned by
+                  :meth:`HashRing.get_moved_key_ranges`. Drivers which
+                  were added or removed map to [(None, None)].
+        """
+        with self._lock:
+            old_rings = self._hash_rings or {}
+            d2c = self.dbapi.get_active_driver_dict()
+            weights = self.dbapi.get_active_conductor_weights()
+
+            rings = {}
+            moved = {}
+            for driver_name, hosts in d2c.iteritems():
+                ring = old_rings.get(driver_name)
+                if (ring is not None and
+                        self._is_current(ring, hosts, weights)):
+                    rings[driver_name] = ring
+                    continue
+                rings[driver_name] = HashRing(hosts, weights=weights)
+                if ring is None:
+                    moved[driver_name] = [(None, None)]
+                else:
+                    ranges = ring.get_moved_key_ranges(rings[driver_name])
+                    if ranges:
+                        moved[driver_name] = ranges
+            for driver_name in set(old_rings) - set(rings):
+                moved[driver_name] = [(None, None)]
+
+            self.__class__._hash_rings = rings
+            return moved
+
+    @staticmethod
+    def _is_current(ring, hosts, weights):
+        replicas = min(CONF.hash_distribution_replicas, len(hosts))
+        return (ring.hosts == set(hosts) and
+                ring.replicas == replicas and
+                ring.partition_exponent == CONF.hash_partition_exponent and
+                ring.load_factor == max(CONF.hash_bounded_load_factor, 0) and
+                all(ring.weights[host] == weights.get(host, 1)
+                    for host in ring.hosts))
+
     def __getitem__(self, driver_name):
         try:
             return self.ring[driver_name]
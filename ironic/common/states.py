@@ -196,3 +196,7 @@ machine.add_transition(ERROR, DEPLOYING, 'rebuild')
 # or deleted
 # ironic/conductor/manager.py:do_node_tear_down()
 machine.add_transition(ERROR, DELETING, 'delete')
+
+# NOTE: the machine is shared by all the task managers, which use shallow
+# copies of it, so it must not change from now on.
+machine.freeze()
@@ -0,0 +1,106 @@
+# coding=utf-8
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+In-memory tracking of node deadlines.
+
+Used by the conductor to expire the deploy callback timeouts of the nodes
+in DEPLOYWAIT it is responsible for at about the time they are due,
+without querying the database for them on every check.
+
+Deadlines are kept in a heap. A node which is tracked again replaces its
+previous deadline; the stale heap entry is left in place and skipped once
+it reaches the top of the heap.
+"""
+
+import heapq
+import threading
+
+
+class DeadlineTracker(object):
+    """Keep track of when each node is due."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # heap of (deadline, node uuid)
+        self._queue = []
+        # node uuid -> deadline of the tracked nodes
+        self._deadlines = {}
+
+    def __len__(self):
+        return len(self._deadlines)
+
+    def __contains__(self, node_uuid):
+        return node_uuid in self._deadlines
+
+    def add(self, node_uuid, deadline):
+        """Track a node, replacing its deadline if it was already tracked.
+
+        :param node_uuid: the uuid of the node.
+        :param deadline: when the node is due. Any values which compare
+                         with each other may be used, eg. datetimes.
+        """
+        with self._lock:
+            self._deadlines[node_uuid] = deadline
+            heapq.heappush(self._queue, (deadline, node_uuid))
+
+    def discard(self, node_uuid):
+        """Stop tracking a node, if it was tracked."""
+        with self._lock:
+            self._deadlines.pop(node_uuid, None)
+
+    def reset(self, deadlines):
+        """Replace all the tracked nodes.
+
+        :param deadlines: an iterable of (node uuid, deadline) tuples.
+        """
+        with self._lock:
+            self._deadlines = dict(deadlines)
+            self._queue = [(d, n) for n, d in self._deadlines.items()]
+            heapq.heapify(self._queue)
+
+    def next_deadline(self):
+        """Get the earliest deadline of the tracked nodes.
+
+        :returns: the earliest deadline, or None if no node is tracked.
+        """
+        with self._lock:
+            self._drop_stale()
+            if self._queue:
+                return self._queue[0][0]
+
+    def pop_expired(self, now, limit=None):
+        """Stop tracking the nodes which are due.
+
+        :param now: the current time.
+        :param limit: the maximum number of nodes to return; the others
+                      stay tracked. None means no limit.
+        :returns: a list of the uuids of the nodes whose deadline is not
+                  later than now, earliest first.
+        """
+        expired = []
+        with self._lock:
+            while limit is None or len(expired) < limit:
+                self._drop_stale()
+                if not self._queue or self._queue[0][0] > now:
+                    break
+                deadline, node_uuid = heapq.heappop(self._queue)
+                del self._deadlines[node_uuid]
+                expired.append(node_uuid)
+        return expired
+
+    def _drop_stale(self):
+        while (self._queue and
+               self._deadlines.get(self._queue[0][1]) != self._queue[0][0]):
+            heapq.heappop(self._queue)
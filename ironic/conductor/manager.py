@@ -44,14 +44,19 @@ a change, etc.
 import collections
 import datetime
 import threading
+import time
 
 import eventlet
 from eventlet import greenpool
+from eventlet import queue
+from eventlet import semaphore
 from oslo.config import cfg
 from oslo.db import exception as db_exception
 from oslo import messaging
 from oslo.utils import excutils
+from oslo.utils import timeutils
 from oslo_concurrency import lockutils
+import six
 
 from ironic.common import dhcp_factory
 from ironic.common import driver_factory
@@ -66,10 +71,14 @@ from ironic.common import keystone
 from ironic.common import rpc
 from ironic.common import states
 from ironic.common import utils as ironic_utils
+from ironic.conductor import deadline_tracker
+from ironic.conductor import poll_scheduler
+from ironic.conductor import sensor_cache
 from ironic.conductor import task_manager
 from ironic.conductor import utils
+from ironic.conductor import worker_queue
 from ironic.db import api as dbapi
-from ironic import objects
+from ironic.objects import cache as obj_cache
 from ironic.openstack.common import context as ironic_context
 from ironic.openstack.common import log
 from ironic.openstack.common import periodic_task
@@ -77,6 +86,10 @@ from ironic.openstack.common import periodic_task
 MANAGER_TOPIC = 'ironic.conductor_manager'
 WORKER_SPAWN_lOCK = "conductor_worker_spawn"
 
+# Above this many hash key ranges per driver, nodes are not filtered by hash
+# key in the database, to keep the generated queries reasonably sized.
+MAX_HASH_KEY_RANGES = 1024
+
 LOG = log.getLogger(__name__)
 
 conductor_opts = [
@@ -95,10 +108,46 @@ conductor_opts = [
                    default=60,
                    help='Interval between syncing the node power state to the '
                         'database, in seconds.'),
+        cfg.IntOpt('sync_power_state_max_interval',
+                   default=0,
+                   help='Maximum interval, in seconds, between two power '
+                        'state queries of a node whose power state does not '
+                        'change. Each query finding the same power state as '
+                        'the previous one doubles the interval until the '
+                        'next query of the node, up to this value, rounded '
+                        'down to a multiple of sync_power_state_interval; '
+                        'nodes whose power state changed or could not be '
+                        'synced are queried every sync_power_state_interval. '
+                        '0 - query every node every '
+                        'sync_power_state_interval.'),
+        cfg.IntOpt('sync_power_state_workers',
+                   default=8,
+                   help='Maximum number of greenthreads used to query node '
+                        'power states in parallel during a single '
+                        'sync_power_state pass.'),
+        cfg.DictOpt('sync_power_state_driver_workers',
+                   default={},
+                   help='Per-driver limit on the number of power state '
+                        'queries which may run concurrently during '
+                        'sync_power_state, as a comma separated list of '
+                        'driver:limit pairs, eg. "pxe_ipmitool:20,pxe_ssh:4". '
+                        'Drivers which are not listed are only limited by '
+                        'sync_power_state_workers.'),
+        cfg.IntOpt('sync_power_state_pass_timeout',
+                   default=0,
+                   help='Maximum time, in seconds, a single sync_power_state '
+                        'pass may spend dispatching power state queries. '
+                        'Nodes which have not been queried by then are left '
+                        'for the next pass. 0 - use the value of '
+                        'sync_power_state_interval.'),
         cfg.IntOpt('check_provision_state_interval',
                    default=60,
                    help='Interval between checks of provision timeouts, '
-                        'in seconds.'),
+                        'in seconds. Deploy callback timeouts are checked '
+                        'when they are due; this is the delay before '
+                        'checking again those which could not be handled '
+                        'then, eg. because the node was locked or in '
+                        'maintenance.'),
         cfg.IntOpt('deploy_callback_timeout',
                    default=1800,
                    help='Timeout (seconds) for waiting callback from deploy '
@@ -123,12 +172,47 @@ conductor_opts = [
         cfg.IntOpt('workers_pool_size',
                    default=100,
                    help='The size of the workers greenthread pool.'),
+        cfg.IntOpt('bulk_action_workers',
+                   default=8,
+                   help='Maximum number of nodes of a bulk request, eg. a '
+                        'bulk power state change, which a conductor handles '
+                        'concurrently.'),
+        cfg.IntOpt('bulk_action_reply_timeout',
+                   default=30,
+                   help='Maximum time, in seconds, a conductor spends on a '
+                        'bulk request before replying to it. The nodes '
+                        'which have not been handled by then are handled '
+                        'in the background, and reported as accepted; '
+                        'their errors are only logged. It should be less '
+                        'than rpc_response_timeout. 0 - handle all the '
+                        'nodes before replying.'),
+        cfg.IntOpt('workers_queue_size',
+                   default=0,
+                   help='Maximum number of requests waiting for a free '
+                        'worker when the workers greenthread pool is full. '
+                        'Requests made through the API, eg. deploys and '
+                        'power actions, are started before the work started '
+                        'by the conductor itself, eg. takeovers and deploy '
+                        'timeouts. 0 - reject requests as soon as the pool '
+                        'is full.'),
+        cfg.IntOpt('workers_queue_timeout',
+                   default=60,
+                   help='Maximum time, in seconds, a request may wait for a '
+                        'free worker. Requests which are not started by '
+                        'then are dropped, as if they had been rejected. '
+                        '0 - wait forever.'),
         cfg.IntOpt('node_locked_retry_attempts',
                    default=3,
                    help='Number of attempts to grab a node lock.'),
         cfg.IntOpt('node_locked_retry_interval',
                    default=1,
-                   help='Seconds to sleep between node lock attempts.'),
+                   help='Seconds to sleep after the first failed node lock '
+                        'attempt. The sleep is doubled after each failed '
+                        'attempt, and randomized.'),
+        cfg.IntOpt('node_locked_retry_max_interval',
+                   default=10,
+                   help='Maximum number of seconds to sleep between node '
+                        'lock attempts.'),
         cfg.BoolOpt('send_sensor_data',
                    default=False,
                    help='Enable sending sensor data message via the '
@@ -143,6 +227,42 @@ conductor_opts = [
                         ' sent to Ceilometer. The default value, "ALL", is a '
                         'special value meaning send all the sensor data.'
                         ),
+        cfg.IntOpt('send_sensor_data_workers',
+                   default=4,
+                   help='The maximum number of nodes whose sensor data is '
+                        'collected in parallel during a send_sensor_data '
+                        'pass.'),
+        cfg.IntOpt('send_sensor_data_wait_timeout',
+                   default=300,
+                   help='Seconds to wait for the sensor data of a single '
+                        'node before giving up on it for the current '
+                        'send_sensor_data pass. The ipmitool driver also '
+                        'kills the ipmitool process reading the sensors '
+                        'after this long. 0 - wait forever.'),
+        cfg.IntOpt('send_sensor_data_batch_size',
+                   default=1,
+                   help='The maximum number of nodes whose sensor data is '
+                        'sent in a single "hardware.ipmi.metrics" '
+                        'notification. With a value greater than 1, the '
+                        'payload of the notification is a dict with a '
+                        '"nodes" key holding the list of the per node '
+                        'messages which would otherwise have been sent '
+                        'individually. 1 - send one notification per node.'),
+        cfg.IntOpt('send_sensor_data_snapshot_every',
+                   default=1,
+                   help='Send the sensor data of all the sensors of a node '
+                        'once every this many send_sensor_data passes. In '
+                        'the other passes, only the sensors whose reading '
+                        'changed since it was last sent are sent, and the '
+                        'full_snapshot field of the message is false. '
+                        '1 - always send all the sensors.'),
+        cfg.FloatOpt('send_sensor_data_change_threshold',
+                     default=0.0,
+                     help='How much the numeric reading of a sensor must '
+                          'have changed since it was last sent for it to be '
+                          'sent again, when send_sensor_data_snapshot_every '
+                          'is greater than 1. Readings which are not numeric '
+                          'are sent again whenever they change.'),
         cfg.IntOpt('sync_local_state_interval',
                    default=180,
                    help='When conductors join or leave the cluster, existing '
@@ -152,6 +272,50 @@ conductor_opts = [
                         'conductor will check for nodes that it should '
                         '"take over". Set it to a negative value to disable '
                         'the check entirely.'),
+        cfg.IntOpt('prepare_replicas_interval',
+                   default=600,
+                   help='When hash_distribution_replicas is more than one, '
+                        'how often, in seconds, each conductor caches the '
+                        'images, eg. the deploy and instance kernels and '
+                        'ramdisks, of the active nodes it is a replica of, '
+                        'so that it can quickly take them over if their '
+                        'primary conductor leaves the cluster. Set it to a '
+                        'negative value to disable it.'),
+        cfg.FloatOpt('hash_ring_weight',
+                     default=1.0,
+                     help='Capacity of this conductor relative to the other '
+                          'conductors of the cluster. The share of the hash '
+                          'ring, and so of the nodes, mapped to a conductor '
+                          'is proportional to its weight. It must be '
+                          'greater than zero.'),
+        cfg.IntOpt('object_cache_size',
+                   default=0,
+                   help='Maximum number of nodes, and of lists of the ports '
+                        'of a node, kept in the conductor\'s object cache. '
+                        'The cache is used by tasks which only need a '
+                        'shared lock on a node, instead of reading the node '
+                        'and its ports from the database. The cache may '
+                        'serve objects changed by other services until '
+                        'the next refresh, or longer if the clocks of the '
+                        'hosts are not synchronized. It is disabled by '
+                        'default, or when set to 0.'),
+        cfg.IntOpt('object_cache_ttl',
+                   default=60,
+                   help='Maximum time, in seconds, an object is kept in the '
+                        'conductor\'s object cache.'),
+        cfg.IntOpt('object_cache_refresh_interval',
+                   default=10,
+                   help='Interval, in seconds, between two checks for the '
+                        'nodes and ports changed in the database by other '
+                        'services, which are then dropped from the '
+                        'conductor\'s object cache.'),
+        cfg.IntOpt('object_cache_refresh_margin',
+                   default=30,
+                   help='Time, in seconds, before the latest change seen by '
+                        'the previous check from which the conductor looks '
+                        'for changed nodes and ports, to tolerate clock '
+                        'skew between hosts and transactions committed out '
+                        'of the order of their timestamps.'),
 ]
 
 CONF = cfg.CONF
@@ -162,7 +326,7 @@ class ConductorManager(periodic_task.PeriodicTasks):
     """Ironic Conductor manager main class."""
 
     # NOTE(rloo): This must be in sync with rpcapi.ConductorAPI's.
-    RPC_API_VERSION = '1.21'
+    RPC_API_VERSION = '1.23'
 
     target = messaging.Target(version=RPC_API_VERSION)
 
@@ -173,6 +337,25 @@ class ConductorManager(periodic_task.PeriodicTasks):
         self.host = host
         self.topic = topic
         self.power_state_sync_count = collections.defaultdict(int)
+        self._power_poll_scheduler = None
+        if (CONF.conductor.sync_power_state_max_interval >
+                CONF.conductor.sync_power_state_interval):
+            self._power_poll_scheduler = poll_scheduler.PowerPollScheduler(
+                    CONF.conductor.sync_power_state_interval,
+                    CONF.conductor.sync_power_state_max_interval)
+        self._sensor_data_cache = sensor_cache.SensorDataCache(
+                CONF.conductor.send_sensor_data_change_threshold,
+                CONF.conductor.send_sensor_data_snapshot_every)
+        self._deploy_deadlines = deadline_tracker.DeadlineTracker()
+        self._deploy_timeout_timer = None
+        self._deploy_timeout_at = None
+        # The hash key ranges, by driver, of the nodes which may have to be
+        # taken over, as returned by HashRingManager.refresh(). None means
+        # all the nodes mapped to this conductor.
+        self._pending_takeovers = None
+        # The uuids of the nodes whose deployment environment was prepared
+        # by this conductor, as one of their replicas.
+        self._prepared_replicas = set()
         self.notifier = rpc.get_notifier()
 
     def _get_driver(self, driver_name):
@@ -204,21 +387,31 @@ class ConductorManager(periodic_task.PeriodicTasks):
             LOG.error(msg, self.host)
             raise exception.NoDriversLoaded(conductor=self.host)
 
+        if CONF.conductor.hash_ring_weight <= 0:
+            msg = (_("Conductor %(host)s cannot be started because its "
+                     "hash_ring_weight is %(weight)s; it must be greater "
+                     "than zero.") %
+                   {'host': self.host,
+                    'weight': CONF.conductor.hash_ring_weight})
+            LOG.error(msg)
+            raise exception.ConfigInvalid(error_msg=msg)
+
         # clear all locks held by this conductor before registering
         self.dbapi.clear_node_reservations_for_conductor(self.host)
+        values = {'hostname': self.host,
+                  'drivers': self.drivers,
+                  'weight': CONF.conductor.hash_ring_weight}
         try:
             # Register this conductor with the cluster
-            cdr = self.dbapi.register_conductor({'hostname': self.host,
-                                                 'drivers': self.drivers})
+            cdr = self.dbapi.register_conductor(values)
         except exception.ConductorAlreadyRegistered:
             # This conductor was already registered and did not shut down
             # properly, so log a warning and update the record.
             LOG.warn(_LW("A conductor with hostname %(hostname)s "
                          "was previously registered. Updating registration"),
                      {'hostname': self.host})
-            cdr = self.dbapi.register_conductor({'hostname': self.host,
-                                                 'drivers': self.drivers},
-                                                 update_existing=True)
+            cdr = self.dbapi.register_conductor(values,
+                                                update_existing=True)
         self.conductor = cdr
 
         self.ring_manager = hash.HashRingManager()
@@ -228,6 +421,18 @@ class ConductorManager(periodic_task.PeriodicTasks):
                                 size=CONF.conductor.workers_pool_size)
         """GreenPool of background workers for performing tasks async."""
 
+        self._worker_queue = worker_queue.WorkerQueue(
+                self._worker_pool,
+                size=CONF.conductor.workers_queue_size,
+                timeout=CONF.conductor.workers_queue_timeout)
+        """Queue of the work waiting for a free worker."""
+
+        self._load_deploy_deadlines()
+
+        obj_cache.enable(CONF.conductor.object_cache_size,
+                         CONF.conductor.object_cache_ttl,
+                         CONF.conductor.object_cache_refresh_margin)
+
         # Spawn a dedicated greenthread for the keepalive
         try:
             self._keepalive_evt = threading.Event()
@@ -254,7 +459,12 @@ class ConductorManager(periodic_task.PeriodicTasks):
         # Waiting here to give workers the chance to finish. This has the
         # benefit of releasing locks workers placed on nodes, as well as
         # having work complete normally.
+        self._worker_queue.waitall()
         self._worker_pool.waitall()
+        if self._deploy_timeout_timer is not None:
+            self._deploy_timeout_timer.cancel()
+            self._deploy_timeout_timer = None
+        obj_cache.disable()
 
     def periodic_tasks(self, context, raise_on_error=False):
         """Periodic tasks are run at pre-specified interval."""
@@ -265,17 +475,34 @@ class ConductorManager(periodic_task.PeriodicTasks):
 
         """Create a greenthread to run func(*args, **kwargs).
 
-        Spawns a greenthread if there are free slots in pool, otherwise raises
-        exception. Execution control returns immediately to the caller.
+        Spawns a greenthread if there are free slots in pool, otherwise
+        queues the work, ahead of any background work, or raises exception
+        if the queue is full too. Execution control returns immediately to
+        the caller.
 
         :returns: GreenThread object.
-        :raises: NoFreeConductorWorker if worker pool is currently full.
+        :raises: NoFreeConductorWorker if worker pool and queue are currently
+                 full.
 
         """
-        if self._worker_pool.free():
-            return self._worker_pool.spawn(func, *args, **kwargs)
-        else:
-            raise exception.NoFreeConductorWorker()
+        return self._worker_queue.spawn(worker_queue.PRIORITY_USER,
+                                        func, *args, **kwargs)
+
+    @lockutils.synchronized(WORKER_SPAWN_lOCK, 'ironic-')
+    def _spawn_background_worker(self, func, *args, **kwargs):
+        """Create a greenthread to run func(*args, **kwargs) in background.
+
+        Same as :meth:`_spawn_worker`, for the work the conductor starts by
+        itself. If it has to be queued, it is only started once there is no
+        queued work requested through the API left.
+
+        :returns: GreenThread object.
+        :raises: NoFreeConductorWorker if worker pool and queue are currently
+                 full.
+
+        """
+        return self._worker_queue.spawn(worker_queue.PRIORITY_BACKGROUND,
+                                        func, *args, **kwargs)
 
     def _conductor_service_record_keepalive(self):
         while not self._keepalive_evt.is_set():
@@ -344,7 +571,33 @@ class ConductorManager(periodic_task.PeriodicTasks):
         LOG.debug("RPC change_node_power_state called for node %(node)s. "
                   "The desired new state is %(state)s."
                   % {'node': node_id, 'state': new_state})
+        self._change_node_power_state(context, node_id, new_state)
 
+    def change_nodes_power_state(self, context, node_ids, new_state):
+        """RPC method to change the power state of many nodes.
+
+        Does what :meth:`change_node_power_state` does for each node, for
+        up to bulk_action_workers nodes concurrently. The nodes which are
+        not handled within bulk_action_reply_timeout seconds are handled
+        after replying.
+
+        :param context: an admin context.
+        :param node_ids: a list of node ids or uuids.
+        :param new_state: the desired power state of the nodes.
+        :returns: a dict mapping each of the node_ids to None if the
+                  change of its power state was started or is still to be
+                  handled, or else to the message of the error which
+                  prevented it.
+
+        """
+        LOG.debug("RPC change_nodes_power_state called for %(count)d "
+                  "nodes. The desired new state is %(state)s."
+                  % {'count': len(node_ids), 'state': new_state})
+        return self._do_bulk_action(context, node_ids,
+                                    self._change_node_power_state,
+                                    new_state)
+
+    def _change_node_power_state(self, context, node_id, new_state):
         with task_manager.acquire(context, node_id, shared=False) as task:
             task.driver.power.validate(task)
             # Set the target_power_state and clear any last_error, since we're
@@ -361,6 +614,56 @@ class ConductorManager(periodic_task.PeriodicTasks):
             task.spawn_after(self._spawn_worker, utils.node_power_action,
                              task, new_state)
 
+    def _do_bulk_action(self, context, node_ids, func, *args):
+        """Run func(context, node_id, *args) for many nodes concurrently.
+
+        Returns after bulk_action_reply_timeout seconds at most, so that
+        large requests do not time out; the nodes which have not been
+        handled by then are handled in the background.
+
+        :param context: an admin context.
+        :param node_ids: a list of node ids or uuids.
+        :param func: the action to run for each node.
+        :returns: a dict mapping each of the node_ids to None if func
+                  succeeded or is still to run, or else to the message of
+                  the error it raised.
+        """
+        results = dict((node_id, None) for node_id in node_ids)
+        replied = []
+
+        def run(node_id):
+            try:
+                func(context, node_id, *args)
+            except exception.IronicException as e:
+                results[node_id] = six.text_type(e)
+                if replied:
+                    LOG.warning(_LW("Failed to run %(func)s for node "
+                                    "%(node)s of a bulk request: %(err)s"),
+                                {'func': getattr(func, '__name__', func),
+                                 'node': node_id, 'err': e})
+            except Exception as e:
+                LOG.exception(_LE("Unexpected error while running %(func)s "
+                                  "for node %(node)s."),
+                              {'func': getattr(func, '__name__', func),
+                               'node': node_id})
+                results[node_id] = six.text_type(e)
+
+        def dispatch():
+            pool = greenpool.GreenPool(
+                    size=CONF.conductor.bulk_action_workers)
+            for node_id in node_ids:
+                pool.spawn_n(run, node_id)
+            pool.waitall()
+
+        # The dispatcher keeps running after the timeout, only the reply
+        # stops waiting for it.
+        dispatcher = eventlet.spawn(dispatch)
+        with eventlet.Timeout(CONF.conductor.bulk_action_reply_timeout or None,
+                              False):
+            dispatcher.wait()
+        replied.append(True)
+        return dict(results)
+
     @messaging.expected_exceptions(exception.NoFreeConductorWorker,
                                    exception.NodeLocked,
                                    exception.InvalidParameterValue,
@@ -613,7 +916,30 @@ class ConductorManager(periodic_task.PeriodicTasks):
 
         """
         LOG.debug("RPC do_node_deploy called for node %s." % node_id)
+        self._deploy_node(context, node_id, rebuild)
+
+    def do_nodes_deploy(self, context, node_ids, rebuild=False):
+        """RPC method to initiate deployment to many nodes.
+
+        Does what :meth:`do_node_deploy` does for each node, for up to
+        bulk_action_workers nodes concurrently. The deployments which
+        cannot start right away because the workers pool is full are
+        queued. The nodes which are not handled within
+        bulk_action_reply_timeout seconds are handled after replying.
+
+        :param context: an admin context.
+        :param node_ids: a list of node ids or uuids.
+        :param rebuild: True if this is a rebuild request.
+        :returns: a dict mapping each of the node_ids to None if its
+                  deployment was started or is still to be handled, or
+                  else to the message of the error which prevented it.
+
+        """
+        LOG.debug("RPC do_nodes_deploy called for %d nodes." % len(node_ids))
+        return self._do_bulk_action(context, node_ids, self._deploy_node,
+                                    rebuild)
 
+    def _deploy_node(self, context, node_id, rebuild):
         # NOTE(comstud): If the _sync_power_states() periodic task happens
         # to have locked this node, we'll fail to acquire the lock. The
         # client should perhaps retry in this case unless we decide we
@@ -648,8 +974,7 @@ class ConductorManager(periodic_task.PeriodicTasks):
             try:
                 task.process_event(event,
                                    callback=self._spawn_worker,
-                                   call_args=(do_node_deploy, task,
-                                              self.conductor.id),
+                                   call_args=(self._do_node_deploy, task),
                                    err_handler=provisioning_error_handler)
             except exception.InvalidState:
                 raise exception.InstanceDeployFailure(_(
@@ -659,6 +984,12 @@ class ConductorManager(periodic_task.PeriodicTasks):
                                         'node': node.uuid,
                                         'state': node.provision_state})
 
+    def _do_node_deploy(self, task):
+        """Deploy a node and track its callback timeout if it waits."""
+        do_node_deploy(task, self.conductor.id)
+        if task.node.provision_state == states.DEPLOYWAIT:
+            self._track_deploy_timeout(task.node.uuid, timeutils.utcnow())
+
     @messaging.expected_exceptions(exception.NoFreeConductorWorker,
                                    exception.NodeLocked,
                                    exception.InstanceDeployFailure,
@@ -678,7 +1009,28 @@ class ConductorManager(periodic_task.PeriodicTasks):
 
         """
         LOG.debug("RPC do_node_tear_down called for node %s." % node_id)
+        self._tear_down_node(context, node_id)
+
+    def do_nodes_tear_down(self, context, node_ids):
+        """RPC method to tear down the deployments of many nodes.
 
+        Does what :meth:`do_node_tear_down` does for each node, for up to
+        bulk_action_workers nodes concurrently. The nodes which are not
+        handled within bulk_action_reply_timeout seconds are handled after
+        replying.
+
+        :param context: an admin context.
+        :param node_ids: a list of node ids or uuids.
+        :returns: a dict mapping each of the node_ids to None if its tear
+                  down was started or is still to be handled, or else to
+                  the message of the error which prevented it.
+
+        """
+        LOG.debug("RPC do_nodes_tear_down called for %d nodes."
+                  % len(node_ids))
+        return self._do_bulk_action(context, node_ids, self._tear_down_node)
+
+    def _tear_down_node(self, context, node_id):
         with task_manager.acquire(context, node_id, shared=False) as task:
             node = task.node
             try:
@@ -715,6 +1067,8 @@ class ConductorManager(periodic_task.PeriodicTasks):
         2) Node is not in maintenance mode.
         3) Node is not in DEPLOYWAIT provision state.
         4) Node doesn't have a reservation
+        5) Node is due a power state query; see
+           CONF.conductor.sync_power_state_max_interval.
 
         NOTE: Grabbing a lock here can cause other methods to fail to
         grab it. We want to avoid trying to grab a lock while a
@@ -723,104 +1077,274 @@ class ConductorManager(periodic_task.PeriodicTasks):
         here to avoid failing a brand new deploy to a node that we've
         locked here, though.
         """
-        # FIXME(comstud): Since our initial state checks are outside
-        # of the lock (to try to avoid the lock), some checks are
-        # repeated after grabbing the lock so we can unlock quickly.
+        # The state checks made by the query below are repeated by the
+        # reservation itself, in the same UPDATE that takes the lock, so a
+        # node that changed in between is skipped without being locked.
         # The node mapping is not re-checked because it doesn't much
-        # matter if things happened to re-balance.
-        #
-        # This is inefficient and racey. We end up with calling DB API's
-        # get_node() twice (once here, and once in acquire(). Ideally we
-        # add a way to pass constraints to task_manager.acquire()
-        # (through to its DB API call) so that we can eliminate our call
-        # and first set of checks below.
-
-        filters = {'reserved': False, 'maintenance': False}
+        # matter if things happened to re-balance. For the same reasons, the
+        # query may be answered by a lagging slave database.
+        filters = {'reserved': False,
+                   'maintenance': False,
+                   'provision_state_not_in': [states.DEPLOYWAIT]}
+        filters.update(self._mapped_node_filters())
         columns = ['id', 'uuid', 'driver']
         node_list = self.dbapi.get_nodeinfo_list(columns=columns,
-                                                 filters=filters)
-        for (node_id, node_uuid, driver) in node_list:
+                                                 filters=filters,
+                                                 use_slave=True)
+
+        # Power state queries block on the BMC for seconds at a time, so
+        # they are run on a dedicated, size-limited pool rather than one
+        # after the other. A worker is only spawned for a node when its
+        # driver is below its limit; otherwise the node waits in the
+        # backlog of its driver, which the workers of that driver work
+        # through, so that a slow driver does not hold up the others.
+        pool = greenpool.GreenPool(
+                size=CONF.conductor.sync_power_state_workers)
+        limiters = {}
+        backlogs = collections.defaultdict(collections.deque)
+        deadline = (CONF.conductor.sync_power_state_pass_timeout or
+                    CONF.conductor.sync_power_state_interval)
+        start = time.time()
+        # Nodes whose power state has been stable are not queried on every
+        # pass if sync_power_state_max_interval is set, see poll_scheduler.
+        scheduler = self._power_poll_scheduler
+        due = scheduler.pop_due() if scheduler else set()
+
+        def is_due(node_uuid):
+            return scheduler is None or scheduler.is_due(node_uuid)
+
+        dispatched = 0
+        remaining = 0
+        for index, (node_id, node_uuid, driver) in enumerate(node_list):
             try:
                 if not self._mapped_to_this_conductor(node_uuid, driver):
                     continue
-                # NOTE(deva): we should not acquire a lock on a node in
-                #             DEPLOYWAIT, as this could cause an error within
-                #             a deploy ramdisk POSTing back at the same time.
-                # TODO(deva): refactor this check, because it needs to be done
-                #             in every periodic task, not just this one.
-                node = objects.Node.get_by_id(context, node_id)
-                if (node.provision_state == states.DEPLOYWAIT or
-                        node.maintenance or node.reservation is not None):
+                if not is_due(node_uuid):
                     continue
-
-                with task_manager.acquire(context, node_id) as task:
-                    if (task.node.provision_state == states.DEPLOYWAIT or
-                            task.node.maintenance):
-                        continue
-                    count = do_sync_power_state(
-                            task, self.power_state_sync_count[node_uuid])
-                    if count:
-                        self.power_state_sync_count[node_uuid] = count
-                    else:
-                        # don't bloat the dict with non-failing nodes
-                        del self.power_state_sync_count[node_uuid]
-            except exception.NodeNotFound:
-                LOG.info(_LI("During sync_power_state, node %(node)s was not "
-                             "found and presumed deleted by another process."),
-                         {'node': node_uuid})
-            except exception.NodeLocked:
-                LOG.info(_LI("During sync_power_state, node %(node)s was "
-                             "already locked by another process. Skip."),
-                         {'node': node_uuid})
+                if time.time() - start > deadline:
+                    remaining = len([n for n in node_list[index:]
+                                     if is_due(n[1])])
+                    break
+                if driver not in limiters:
+                    limiters[driver] = semaphore.Semaphore(
+                            _get_driver_sync_limit(driver))
+                dispatched += 1
+                if not limiters[driver].acquire(blocking=False):
+                    backlogs[driver].append((node_id, node_uuid))
+                    continue
+                pool.spawn_n(self._sync_power_states_worker, context,
+                             node_id, node_uuid, limiters[driver],
+                             backlogs[driver], start + deadline)
             finally:
                 # Yield on every iteration
                 eventlet.sleep(0)
+        pool.waitall()
+        # The nodes left in the backlogs when the deadline passed
+        left = sum(len(backlog) for backlog in backlogs.values())
+        dispatched -= left
+        remaining += left
+        # Forget about the nodes which were due, but which this conductor
+        # no longer has to poll.
+        if scheduler:
+            scheduler.forget(due - set(n[1] for n in node_list))
+
+        elapsed = time.time() - start
+        if remaining or elapsed > CONF.conductor.sync_power_state_interval:
+            LOG.warning(_LW("sync_power_state pass overran: it took "
+                            "%(elapsed).1f seconds to query %(count)d nodes "
+                            "(interval is %(interval)d seconds, pass "
+                            "deadline is %(deadline)d seconds); "
+                            "%(remaining)d nodes were left for the next "
+                            "pass."),
+                        {'elapsed': elapsed, 'count': dispatched,
+                         'interval': CONF.conductor.sync_power_state_interval,
+                         'deadline': deadline, 'remaining': remaining})
+
+    def _sync_power_states_worker(self, context, node_id, node_uuid,
+                                  limiter, backlog, deadline):
+        """Sync the power state of a node, then of its driver's backlog.
+
+        Runs in the sync_power_state pool, holding a slot of the limiter
+        of the driver of the node, which it releases when it is done.
+
+        :param context: an admin context.
+        :param node_id: the id of the node.
+        :param node_uuid: the uuid of the node.
+        :param limiter: a semaphore shared by all nodes of the same driver,
+                        already acquired for this worker.
+        :param backlog: a deque of the (id, uuid) tuples of the nodes of the
+                        same driver waiting for a worker.
+        :param deadline: the time after which the nodes of the backlog are
+                         left for the next pass.
+
+        """
+        try:
+            while True:
+                self._sync_power_state_for_node(context, node_id, node_uuid)
+                if not backlog or time.time() > deadline:
+                    break
+                node_id, node_uuid = backlog.popleft()
+        finally:
+            limiter.release()
+
+    def _sync_power_state_for_node(self, context, node_id, node_uuid):
+        """Sync the power state of a single node.
+
+        :param context: an admin context.
+        :param node_id: the id of the node.
+        :param node_uuid: the uuid of the node.
+
+        """
+        try:
+            # NOTE(deva): we should not acquire a lock on a node in
+            #             DEPLOYWAIT, as this could cause an error within
+            #             a deploy ramdisk POSTing back at the same time.
+            filters = {'maintenance': False,
+                       'provision_state_not_in': [states.DEPLOYWAIT]}
+            with task_manager.acquire(context, node_id,
+                                      filters=filters) as task:
+                count = do_sync_power_state(
+                        task, self.power_state_sync_count[node_uuid])
+                if self._power_poll_scheduler:
+                    self._power_poll_scheduler.record(
+                            node_uuid, task.node.power_state,
+                            failed=bool(count))
+                if count:
+                    self.power_state_sync_count[node_uuid] = count
+                else:
+                    # don't bloat the dict with non-failing nodes
+                    del self.power_state_sync_count[node_uuid]
+        except exception.NodeNotFound:
+            LOG.info(_LI("During sync_power_state, node %(node)s was not "
+                         "found and presumed deleted by another process."),
+                     {'node': node_uuid})
+        except exception.NodeLocked:
+            LOG.info(_LI("During sync_power_state, node %(node)s was "
+                         "already locked by another process. Skip."),
+                     {'node': node_uuid})
+        except exception.NodeConstraintsNotMet:
+            # The node went into maintenance or DEPLOYWAIT after it was
+            # listed; there is nothing to sync.
+            pass
+        except Exception:
+            # This runs in its own greenthread, so log anything unexpected
+            # rather than losing it.
+            LOG.exception(_LE("Unexpected error during sync_power_state of "
+                              "node %(node)s."), {'node': node_uuid})
 
-    @periodic_task.periodic_task(
-            spacing=CONF.conductor.check_provision_state_interval)
     def _check_deploy_timeouts(self, context):
+        """Fail the deploys whose callback timeout expired.
+
+        Only looks at the nodes whose deadline is due in the deploy
+        deadline tracker; nodes which can not be handled now are tracked
+        again to be checked after check_provision_state_interval.
+        """
         callback_timeout = CONF.conductor.deploy_callback_timeout
         if not callback_timeout:
             return
 
-        filters = {'reserved': False,
-                   'provision_state': states.DEPLOYWAIT,
-                   'maintenance': False,
-                   'provisioned_before': callback_timeout}
-        columns = ['uuid', 'driver']
-        node_list = self.dbapi.get_nodeinfo_list(
-                                    columns=columns,
-                                    filters=filters,
-                                    sort_key='provision_updated_at',
-                                    sort_dir='asc')
-
-        workers_count = 0
-        for node_uuid, driver in node_list:
-            if not self._mapped_to_this_conductor(node_uuid, driver):
-                continue
+        now = timeutils.utcnow()
+        retry_at = now + datetime.timedelta(
+                seconds=CONF.conductor.check_provision_state_interval)
+        expired = self._deploy_deadlines.pop_expired(
+                now, limit=CONF.conductor.periodic_max_workers)
+        lock_filters = {'provision_state': states.DEPLOYWAIT,
+                        'provisioned_before': callback_timeout}
+        for i, node_uuid in enumerate(expired):
             try:
-                with task_manager.acquire(context, node_uuid) as task:
-                    # NOTE(comstud): Recheck maintenance and provision_state
-                    # now that we have the lock. We don't need to re-check
-                    # updated_at unless we expect the state to have flipped
-                    # to something else and then back to DEPLOYWAIT between
-                    # the call to get_nodeinfo_list and now.
-                    if (task.node.maintenance or
-                            task.node.provision_state != states.DEPLOYWAIT):
+                # The node is only locked if it is still in DEPLOYWAIT past
+                # the timeout; the reservation checks this in the same
+                # UPDATE that takes the lock.
+                with task_manager.acquire(context, node_uuid,
+                                          filters=lock_filters) as task:
+                    if task.node.maintenance:
+                        # fail it once it is out of maintenance
+                        self._deploy_deadlines.add(node_uuid, retry_at)
                         continue
                     # timeout has been reached - fail the deploy
                     task.process_event('fail',
-                                       callback=self._spawn_worker,
+                                       callback=self._spawn_background_worker,
                                        call_args=(utils.cleanup_after_timeout,
                                                   task),
                                        err_handler=provisioning_error_handler)
             except exception.NoFreeConductorWorker:
+                for remaining in expired[i:]:
+                    self._deploy_deadlines.add(remaining, retry_at)
                 break
-            except (exception.NodeLocked, exception.NodeNotFound):
+            except exception.NodeLocked:
+                self._deploy_deadlines.add(node_uuid, retry_at)
+            except (exception.NodeNotFound, exception.NodeConstraintsNotMet):
+                # The node was deleted, or left DEPLOYWAIT, or went
+                # through it again and is tracked with its new deadline.
                 continue
-            workers_count += 1
-            if workers_count == CONF.conductor.periodic_max_workers:
-                break
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    for remaining in expired[i:]:
+                        self._deploy_deadlines.add(remaining, retry_at)
+
+    def _deploy_timeout_expired(self):
+        """Check the deploy timeouts when the earliest one is due."""
+        self._deploy_timeout_timer = None
+        self._deploy_timeout_at = None
+        try:
+            self._check_deploy_timeouts(ironic_context.get_admin_context())
+        except Exception:
+            LOG.exception(_LE("Unexpected error while checking deploy "
+                              "callback timeouts."))
+        finally:
+            self._schedule_deploy_timeout_check()
+
+    def _schedule_deploy_timeout_check(self):
+        """(Re)arm the timer for the earliest tracked deploy deadline."""
+        deadline = self._deploy_deadlines.next_deadline()
+        if deadline == self._deploy_timeout_at:
+            return
+        if self._deploy_timeout_timer is not None:
+            self._deploy_timeout_timer.cancel()
+            self._deploy_timeout_timer = None
+        self._deploy_timeout_at = deadline
+        if deadline is not None:
+            delay = max(0, timeutils.delta_seconds(timeutils.utcnow(),
+                                                   deadline))
+            self._deploy_timeout_timer = eventlet.spawn_after(
+                    delay, self._deploy_timeout_expired)
+
+    def _track_deploy_timeout(self, node_uuid, provision_updated_at):
+        """Track the deploy callback timeout of a node in DEPLOYWAIT.
+
+        :param node_uuid: the uuid of the node.
+        :param provision_updated_at: when the node entered DEPLOYWAIT.
+        """
+        callback_timeout = CONF.conductor.deploy_callback_timeout
+        if not callback_timeout:
+            return
+        self._deploy_deadlines.add(node_uuid, provision_updated_at +
+                                   datetime.timedelta(
+                                       seconds=callback_timeout))
+        self._schedule_deploy_timeout_check()
+
+    def _load_deploy_deadlines(self):
+        """Rebuild the tracked deploy deadlines from the database.
+
+        Tracks the deploy callback timeout of every node in DEPLOYWAIT
+        which is mapped to this conductor, and only those.
+        """
+        callback_timeout = CONF.conductor.deploy_callback_timeout
+        if not callback_timeout:
+            return
+
+        filters = {'provision_state': states.DEPLOYWAIT}
+        filters.update(self._mapped_node_filters())
+        columns = ['uuid', 'driver', 'provision_updated_at']
+        node_list = self.dbapi.get_nodeinfo_list(columns=columns,
+                                                 filters=filters)
+        timeout = datetime.timedelta(seconds=callback_timeout)
+        self._deploy_deadlines.reset(
+                (node_uuid, updated_at + timeout)
+                for node_uuid, driver, updated_at in node_list
+                if (updated_at is not None and
+                    self._mapped_to_this_conductor(node_uuid, driver)))
+        self._schedule_deploy_timeout_check()
 
     def _do_takeover(self, task):
         LOG.debug(('Conductor %(cdr)s taking over node %(node)s'),
@@ -841,12 +1365,27 @@ class ConductorManager(periodic_task.PeriodicTasks):
         consistent hash ring. If any mappings have changed, this method then
         determines which, if any, nodes need to be "taken over".
         The ensuing actions could include preparing a PXE environment,
-        updating the DHCP server, and so on.
+        updating the DHCP server, and so on. The tracked deploy callback
+        deadlines are also rebuilt when the ring changed.
+
+        Only the nodes whose hash keys moved to different hosts since the
+        last complete check are considered, except on the first run,
+        which checks all the nodes mapped to this conductor.
         """
-        self.ring_manager.reset()
+        moved = self.ring_manager.refresh()
+        if moved:
+            self._load_deploy_deadlines()
+        if self._pending_takeovers is not None:
+            for driver, ranges in moved.items():
+                self._pending_takeovers.setdefault(driver, []).extend(ranges)
+            if not self._pending_takeovers:
+                return
+        pending = self._pending_takeovers
+
         filters = {'reserved': False,
                    'maintenance': False,
                    'provision_state': states.ACTIVE}
+        filters.update(self._mapped_node_filters(pending))
         columns = ['id', 'uuid', 'driver', 'conductor_affinity']
         node_list = self.dbapi.get_nodeinfo_list(
                                     columns=columns,
@@ -854,8 +1393,14 @@ class ConductorManager(periodic_task.PeriodicTasks):
 
         admin_context = None
         workers_count = 0
+        # Unless a node had to be skipped, the moved nodes are all taken
+        # over once the loop ends.
+        complete = True
         for node_id, node_uuid, driver, conductor_affinity in node_list:
-            if not self._mapped_to_this_conductor(node_uuid, driver):
+            # NOTE: the replicas of a node only prepare for it, see
+            # _prepare_replicas(); the primary conductor takes it over.
+            if not self._mapped_to_this_conductor(node_uuid, driver,
+                                                  primary_only=True):
                 continue
             if conductor_affinity == self.conductor.id:
                 continue
@@ -878,31 +1423,193 @@ class ConductorManager(periodic_task.PeriodicTasks):
                             node.provision_state != states.ACTIVE):
                         continue
 
-                    task.spawn_after(self._spawn_worker,
+                    task.spawn_after(self._spawn_background_worker,
                                      self._do_takeover, task)
 
             except exception.NoFreeConductorWorker:
+                complete = False
                 break
-            except (exception.NodeLocked, exception.NodeNotFound):
+            except exception.NodeLocked:
+                complete = False
+                continue
+            except exception.NodeNotFound:
                 continue
             workers_count += 1
             if workers_count == CONF.conductor.periodic_max_workers:
+                complete = False
                 break
 
-    def _mapped_to_this_conductor(self, node_uuid, driver):
+        if complete and self._pending_takeovers is pending:
+            self._pending_takeovers = {}
+
+    @periodic_task.periodic_task(
+            spacing=CONF.conductor.prepare_replicas_interval)
+    def _prepare_replicas(self, context):
+        """Periodic task to prepare the nodes this conductor is a replica of.
+
+        The images of the active nodes which are mapped to this conductor
+        as a replica, and not as their primary conductor, are cached in
+        background workers, once per node, so that taking them over does
+        not have to wait for images to be downloaded. The
+        work is only started when no work requested through the API is
+        waiting for a worker.
+        """
+        if CONF.hash_distribution_replicas <= 1:
+            return
+
+        filters = {'maintenance': False,
+                   'provision_state': states.ACTIVE}
+        filters.update(self._mapped_node_filters())
+        columns = ['id', 'uuid', 'driver']
+        node_list = self.dbapi.get_nodeinfo_list(columns=columns,
+                                                 filters=filters,
+                                                 use_slave=True)
+
+        replicas = set()
+        admin_context = None
+        workers_count = 0
+        for node_id, node_uuid, driver in node_list:
+            if (not self._mapped_to_this_conductor(node_uuid, driver) or
+                    self._mapped_to_this_conductor(node_uuid, driver,
+                                                   primary_only=True)):
+                continue
+            replicas.add(node_uuid)
+            if (node_uuid in self._prepared_replicas or
+                    workers_count >= CONF.conductor.periodic_max_workers):
+                continue
+
+            # NOTE(lucasagomes): The context provided by the periodic task
+            # will make the glance client to fail with an 401 (Unauthorized)
+            # so we have to use the admin_context with an admin auth_token
+            if not admin_context:
+                admin_context = ironic_context.get_admin_context()
+                admin_context.auth_token = keystone.get_admin_auth_token()
+
+            try:
+                self._spawn_background_worker(self._prepare_replica,
+                                              admin_context, node_id,
+                                              node_uuid)
+            except exception.NoFreeConductorWorker:
+                workers_count = CONF.conductor.periodic_max_workers
+                continue
+            self._prepared_replicas.add(node_uuid)
+            workers_count += 1
+
+        # Forget the nodes which are no longer active or mapped here as a
+        # replica, they will be prepared again if they come back.
+        self._prepared_replicas &= replicas
+
+    def _prepare_replica(self, context, node_id, node_uuid):
+        """Cache the images of a node, as its replica.
+
+        The node is left unchanged, see DeployInterface.cache_images();
+        nodes whose driver does not cache images are skipped.
+        """
+        LOG.debug('Conductor %(cdr)s preparing node %(node)s as a replica',
+                  {'cdr': self.host, 'node': node_uuid})
+        try:
+            with task_manager.acquire(context, node_id, shared=True) as task:
+                task.driver.deploy.cache_images(task)
+        except exception.UnsupportedDriverExtension:
+            # Not tried again, since the driver of the node has nothing to
+            # cache.
+            LOG.debug('Driver of node %s does not cache images, not '
+                      'preparing it as a replica', node_uuid)
+        except Exception as e:
+            # Try again on the next run
+            self._prepared_replicas.discard(node_uuid)
+            LOG.warning(_LW('Conductor %(cdr)s failed to prepare node '
+                            '%(node)s as a replica: %(err)s'),
+                        {'cdr': self.host, 'node': node_uuid, 'err': e})
+
+    @periodic_task.periodic_task(
+            spacing=CONF.conductor.heartbeat_interval)
+    def _clear_dead_conductors(self, context):
+        """Periodic task to release the locks held by dead conductors.
+
+        Conductors which have not checked in for heartbeat_timeout seconds
+        are marked offline and the node reservations they hold are cleared,
+        so that their nodes can be used again without waiting for them to
+        restart.
+        """
+        self.dbapi.clear_node_reservations_for_dead_conductors(
+                self.host, CONF.conductor.heartbeat_timeout)
+
+    @periodic_task.periodic_task(
+            spacing=CONF.conductor.object_cache_refresh_interval)
+    def _refresh_object_cache(self, context):
+        """Periodic task to drop the changed objects from the cache.
+
+        The nodes and ports created or updated by other services since the
+        last refresh are dropped from the object cache, so that the next
+        tasks read them again from the database.
+        """
+        obj_cache.refresh()
+        cache = obj_cache.get_cache()
+        if cache is not None:
+            LOG.debug('Object cache of conductor %(cdr)s: %(count)d '
+                      'entries, %(hits)d hits, %(misses)d misses',
+                      {'cdr': self.host, 'count': len(cache),
+                       'hits': cache.hits, 'misses': cache.misses})
+
+    def _mapped_to_this_conductor(self, node_uuid, driver,
+                                  primary_only=False):
         """Check that node is mapped to this conductor.
 
         Note that because mappings are eventually consistent, it is possible
         for two conductors to simultaneously believe that a node is mapped to
         them. Any operation that depends on exclusive control of a node should
         take out a lock.
+
+        :param primary_only: if True, only check that this conductor is the
+                             first of the hosts the node is mapped to, not
+                             one of its replicas.
         """
         try:
             ring = self.ring_manager[driver]
         except exception.DriverNotFound:
             return False
 
-        return self.host in ring.get_hosts(node_uuid)
+        hosts = ring.get_hosts(node_uuid)
+        if primary_only:
+            return hosts[:1] == [self.host]
+        return self.host in hosts
+
+    def _mapped_node_filters(self, key_ranges_by_driver=None):
+        """Get the node filters matching the nodes mapped to this conductor.
+
+        The returned filters restrict a node query to the drivers supported
+        by this conductor and to the hash keys this conductor owns on the
+        ring of each driver, so the database only returns the nodes which
+        this conductor is responsible for. As the ring may have been
+        refreshed in between, callers should still check the mapping of
+        each node with :meth:`_mapped_to_this_conductor`.
+
+        :param key_ranges_by_driver: optionally, a dict mapping driver
+            names to lists of hash key ranges, as returned by
+            HashRingManager.refresh(), to further restrict the query to.
+            The nodes of the drivers which are not in it are left out.
+        :returns: a dict of filters for dbapi.get_nodeinfo_list().
+        """
+        key_ranges = {}
+        for driver in self.drivers:
+            if (key_ranges_by_driver is not None and
+                    driver not in key_ranges_by_driver):
+                continue
+            try:
+                ring = self.ring_manager[driver]
+            except exception.DriverNotFound:
+                continue
+            ranges = ring.get_key_ranges(self.host)
+            if key_ranges_by_driver is not None:
+                ranges = hash.intersect_key_ranges(
+                        ranges, key_ranges_by_driver[driver])
+            if not ranges:
+                continue
+            if len(ranges) > MAX_HASH_KEY_RANGES:
+                ranges = None
+            key_ranges[driver] = ranges
+        return {'hash_key_ranges': key_ranges}
 
     @messaging.expected_exceptions(exception.NodeLocked)
     def validate_driver_interfaces(self, context, node_id):
@@ -1128,57 +1835,145 @@ class ConductorManager(periodic_task.PeriodicTasks):
             return
 
         filters = {'associated': True}
+        filters.update(self._mapped_node_filters())
         columns = ['uuid', 'driver', 'instance_uuid']
         node_list = self.dbapi.get_nodeinfo_list(columns=columns,
-                                                 filters=filters)
+                                                 filters=filters,
+                                                 use_slave=True)
+
+        # only handle the nodes mapped to this conductor
+        node_list = [(context, node_uuid, driver, instance_uuid)
+                     for (node_uuid, driver, instance_uuid) in node_list
+                     if self._mapped_to_this_conductor(node_uuid, driver)]
+
+        # Reading the sensors of a node can keep the BMC busy for many
+        # seconds, so nodes are read in parallel. Messages are sent in the
+        # order the results come in, in batches if configured, so that a
+        # slow node does not hold back the others.
+        pool = greenpool.GreenPool(
+                size=CONF.conductor.send_sensor_data_workers)
+        messages = queue.LightQueue()
+        batch_size = max(1, CONF.conductor.send_sensor_data_batch_size)
+        batch = []
+
+        def send(message):
+            if message is None:
+                return
+            if batch_size == 1:
+                self.notifier.info(context, "hardware.ipmi.metrics", message)
+                return
+            batch.append(message)
+            if len(batch) == batch_size:
+                # the notifier may keep the list, so send a copy
+                self._send_sensor_data_batch(context, list(batch))
+                del batch[:]
+
+        received = 0
+        for args in node_list:
+            # blocks until a worker is free, meanwhile results come in
+            pool.spawn_n(self._collect_sensor_data_message, messages, *args)
+            while not messages.empty():
+                send(messages.get())
+                received += 1
+        for i in range(len(node_list) - received):
+            send(messages.get())
+        if batch:
+            self._send_sensor_data_batch(context, batch)
+        self._sensor_data_cache.retain(n[1] for n in node_list)
+
+    def _collect_sensor_data_message(self, messages, *args):
+        """Put the sensor data message of a node on a queue.
+
+        Runs in the send_sensor_data pool. None is put on the queue when
+        no message is to be sent for the node, so that exactly one item
+        is put on the queue per node.
+
+        :param messages: the queue.
+        :param args: the arguments of _get_sensor_data_message().
+        """
+        message = None
+        try:
+            message = self._get_sensor_data_message(*args)
+        finally:
+            messages.put(message)
 
-        for (node_uuid, driver, instance_uuid) in node_list:
-            # only handle the nodes mapped to this conductor
-            if not self._mapped_to_this_conductor(node_uuid, driver):
-                continue
+    def _get_sensor_data_message(self, context, node_uuid, driver,
+                                 instance_uuid):
+        """Collect the sensor data of a node.
 
-            # populate the message which will be sent to ceilometer
-            message = {'message_id': ironic_utils.generate_uuid(),
-                       'instance_uuid': instance_uuid,
-                       'node_uuid': node_uuid,
-                       'timestamp': datetime.datetime.utcnow(),
-                       'event_type': 'hardware.ipmi.metrics.update'}
+        Runs in the send_sensor_data pool.
 
-            try:
-                with task_manager.acquire(context,
-                                          node_uuid,
-                                          shared=True) as task:
-                    task.driver.management.validate(task)
-                    sensors_data = task.driver.management.get_sensors_data(
-                        task)
-            except NotImplementedError:
-                LOG.warn(_LW('get_sensors_data is not implemented for driver'
-                    ' %(driver)s, node_uuid is %(node)s'),
-                    {'node': node_uuid, 'driver': driver})
-            except exception.FailedToParseSensorData as fps:
-                LOG.warn(_LW("During get_sensors_data, could not parse "
-                    "sensor data for node %(node)s. Error: %(err)s."),
-                    {'node': node_uuid, 'err': str(fps)})
-            except exception.FailedToGetSensorData as fgs:
-                LOG.warn(_LW("During get_sensors_data, could not get "
-                    "sensor data for node %(node)s. Error: %(err)s."),
-                    {'node': node_uuid, 'err': str(fgs)})
-            except exception.NodeNotFound:
-                LOG.warn(_LW("During send_sensor_data, node %(node)s was not "
-                           "found and presumed deleted by another process."),
-                           {'node': node_uuid})
-            except Exception as e:
-                LOG.warn(_LW("Failed to get sensor data for node %(node)s. "
-                    "Error: %(error)s"), {'node': node_uuid, 'error': str(e)})
-            else:
-                message['payload'] = self._filter_out_unsupported_types(
-                                                              sensors_data)
-                if message['payload']:
-                    self.notifier.info(context, "hardware.ipmi.metrics",
-                                       message)
-            finally:
-                # Yield on every iteration
-                eventlet.sleep(0)
+        :returns: the message to send to ceilometer, or None if no sensor
+                  data could be collected.
+        """
+        # populate the message which will be sent to ceilometer
+        message = {'message_id': ironic_utils.generate_uuid(),
+                   'instance_uuid': instance_uuid,
+                   'node_uuid': node_uuid,
+                   'timestamp': datetime.datetime.utcnow(),
+                   'event_type': 'hardware.ipmi.metrics.update'}
+
+        # NOTE: this only interrupts the greenthread; drivers which run a
+        #       command, like ipmitool, also bound the command itself with
+        #       send_sensor_data_wait_timeout so that it does not keep
+        #       running after it times out.
+        timeout = eventlet.Timeout(
+                CONF.conductor.send_sensor_data_wait_timeout or None)
+        try:
+            with task_manager.acquire(context,
+                                      node_uuid,
+                                      shared=True) as task:
+                task.driver.management.validate(task)
+                sensors_data = task.driver.management.get_sensors_data(
+                    task)
+        except eventlet.Timeout as t:
+            if t is not timeout:
+                raise
+            LOG.warn(_LW("During get_sensors_data, timed out after "
+                "%(timeout)s seconds waiting for the sensor data of node "
+                "%(node)s."),
+                {'node': node_uuid,
+                 'timeout': CONF.conductor.send_sensor_data_wait_timeout})
+        except NotImplementedError:
+            LOG.warn(_LW('get_sensors_data is not implemented for driver'
+                ' %(driver)s, node_uuid is %(node)s'),
+                {'node': node_uuid, 'driver': driver})
+        except exception.FailedToParseSensorData as fps:
+            LOG.warn(_LW("During get_sensors_data, could not parse "
+                "sensor data for node %(node)s. Error: %(err)s."),
+                {'node': node_uuid, 'err': str(fps)})
+        except exception.FailedToGetSensorData as fgs:
+            LOG.warn(_LW("During get_sensors_data, could not get "
+                "sensor data for node %(node)s. Error: %(err)s."),
+                {'node': node_uuid, 'err': str(fgs)})
+        except exception.NodeNotFound:
+            LOG.warn(_LW("During send_sensor_data, node %(node)s was not "
+                       "found and presumed deleted by another process."),
+                       {'node': node_uuid})
+        except Exception as e:
+            LOG.warn(_LW("Failed to get sensor data for node %(node)s. "
+                "Error: %(error)s"), {'node': node_uuid, 'error': str(e)})
+        else:
+            payload = self._filter_out_unsupported_types(sensors_data)
+            full = True
+            if self._sensor_data_cache.full_every > 1:
+                full, payload = self._sensor_data_cache.get_changes(
+                        node_uuid, payload)
+            message['payload'] = payload
+            # tells consumers whether the sensors missing from the payload
+            # went away or only did not change
+            message['full_snapshot'] = full
+            if message['payload']:
+                return message
+        finally:
+            timeout.cancel()
+
+    def _send_sensor_data_batch(self, context, messages):
+        payload = {'message_id': ironic_utils.generate_uuid(),
+                   'timestamp': datetime.datetime.utcnow(),
+                   'event_type': 'hardware.ipmi.metrics.update',
+                   'nodes': messages}
+        self.notifier.info(context, "hardware.ipmi.metrics", payload)
 
     def _filter_out_unsupported_types(self, sensors_data):
         # support the CONF.send_sensor_data_types sensor types only
@@ -1285,6 +2080,21 @@ class ConductorManager(periodic_task.PeriodicTasks):
             return task.driver.management.get_supported_boot_devices()
 
 
+def _get_driver_sync_limit(driver):
+    """Return how many power state queries may run at once for a driver."""
+    limit = CONF.conductor.sync_power_state_workers
+    try:
+        driver_limit = int(
+                CONF.conductor.sync_power_state_driver_workers[driver])
+    except KeyError:
+        return limit
+    except ValueError:
+        LOG.warning(_LW("Ignoring invalid sync_power_state_driver_workers "
+                        "value for driver %(driver)s."), {'driver': driver})
+        return limit
+    return max(1, min(driver_limit, limit))
+
+
 def get_vendor_passthru_metadata(route_dict):
     d = {}
     for method, metadata in route_dict.iteritems():
@@ -0,0 +1,123 @@
+# coding=utf-8
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Scheduling of node power state polls.
+
+Nodes whose power state keeps matching what was recorded are polled less
+and less often: every poll that finds nothing new doubles the interval
+until the next one, up to a maximum. A node whose power state changed
+since the previous poll, or which could not be synced, goes back to being
+polled at the minimum interval, which is the spacing of the
+sync_power_state passes.
+
+Polls are scheduled in numbers of passes rather than in seconds, and kept
+in a heap so that each pass only looks at the nodes which are due. A node
+due in N intervals is polled exactly N passes later, however late a pass
+starts or however long its query took within the pass.
+"""
+
+import heapq
+import random
+import threading
+
+# Backed off nodes are scheduled up to this fraction of their interval
+# early, so that nodes enrolled together do not stay in step.
+JITTER = 0.2
+
+
+class PowerPollScheduler(object):
+    """Keep track of when each node's power state is next due a poll.
+
+    Nodes which were never polled, or whose poll did not complete, are
+    always due.
+    """
+
+    def __init__(self, min_interval, max_interval):
+        """Create a new scheduler.
+
+        :param min_interval: the interval between two sync_power_state
+                             passes, in seconds.
+        :param max_interval: the longest interval between two polls of a
+                             node, in seconds. Values lower than
+                             min_interval disable the back off.
+        """
+        self.min_interval = min_interval
+        self.max_interval = max(min_interval, max_interval)
+        # the longest interval between two polls, in passes
+        self._max_passes = (self.max_interval // min_interval
+                            if min_interval > 0 else 1)
+        self._lock = threading.Lock()
+        # heap of (due pass, node uuid); entries are left in place when a
+        # node is rescheduled and skipped if they don't match self._due.
+        self._queue = []
+        # node uuid -> due pass of the nodes waiting for their next poll
+        self._due = {}
+        # node uuid -> (interval in passes, power state) as of the last poll
+        self._history = {}
+        self._pass = 0
+
+    def pop_due(self):
+        """Start a sync_power_state pass.
+
+        :returns: a set of the uuids of the nodes which are due a poll
+                  during this pass, not including nodes which were never
+                  polled.
+        """
+        due = set()
+        with self._lock:
+            self._pass += 1
+            while self._queue and self._queue[0][0] <= self._pass:
+                due_pass, node_uuid = heapq.heappop(self._queue)
+                if self._due.get(node_uuid) == due_pass:
+                    del self._due[node_uuid]
+                    due.add(node_uuid)
+        return due
+
+    def is_due(self, node_uuid):
+        """Whether the node should be polled during the current pass."""
+        return node_uuid not in self._due
+
+    def record(self, node_uuid, power_state, failed=False):
+        """Schedule the next poll of a node which was just polled.
+
+        :param node_uuid: the uuid of the node.
+        :param power_state: the power state recorded for the node once
+                            the poll completed.
+        :param failed: whether the power state did not match the recorded
+                       one or could not be read.
+        """
+        with self._lock:
+            interval, last_state = self._history.get(node_uuid,
+                                                     (None, None))
+            if failed or interval is None or power_state != last_state:
+                interval = delay = 1
+            else:
+                interval = min(interval * 2, self._max_passes)
+                delay = interval - int(random.uniform(0, JITTER) * interval)
+                delay = max(delay, 1)
+            self._history[node_uuid] = (interval, power_state)
+            due_pass = self._pass + delay
+            self._due[node_uuid] = due_pass
+            heapq.heappush(self._queue, (due_pass, node_uuid))
+
+    def forget(self, node_uuids):
+        """Drop the nodes which are no longer polled by this conductor.
+
+        :param node_uuids: an iterable of node uuids.
+        """
+        with self._lock:
+            for node_uuid in node_uuids:
+                self._due.pop(node_uuid, None)
+                self._history.pop(node_uuid, None)
@@ -64,11 +64,13 @@ class ConductorAPI(object):
     |           driver_vendor_passthru
     |    1.21 - Added get_node_vendor_passthru_methods and
     |           get_driver_vendor_passthru_methods
+    |    1.22 - Added change_nodes_power_state.
+    |    1.23 - Added do_nodes_deploy and do_nodes_tear_down.
 
     """
 
     # NOTE(rloo): This must be in sync with manager.ConductorManager's.
-    RPC_API_VERSION = '1.21'
+    RPC_API_VERSION = '1.23'
 
     def __init__(self, topic=None):
         super(ConductorAPI, self).__init__()
@@ -93,7 +95,7 @@ class ConductorAPI(object):
         :raises: NoValidHost
 
         """
-        self.ring_manager.reset()
+        self.ring_manager.refresh()
 
         try:
             ring = self.ring_manager[node.driver]
@@ -104,6 +106,38 @@ class ConductorAPI(object):
                         'driver %s.') % node.driver)
             raise exception.NoValidHost(reason=reason)
 
+    def get_topics_for(self, nodes):
+        """Group nodes by the RPC topic of the conductor they are mapped to.
+
+        Equivalent to calling :meth:`get_topic_for` for each node, but the
+        ring is only refreshed once, and the nodes of each driver are
+        looked up in a single batch.
+
+        :param nodes: a list of node objects.
+        :returns: a dict mapping RPC topic strings to the lists of the
+                  nodes mapped to them. Nodes whose driver is not
+                  supported by any conductor are mapped to None.
+
+        """
+        self.ring_manager.refresh()
+
+        nodes_by_driver = {}
+        for node in nodes:
+            nodes_by_driver.setdefault(node.driver, []).append(node)
+
+        topics = {}
+        for driver_name, driver_nodes in nodes_by_driver.items():
+            try:
+                ring = self.ring_manager[driver_name]
+            except exception.DriverNotFound:
+                topics.setdefault(None, []).extend(driver_nodes)
+                continue
+            hosts = ring.get_hosts_many([node.uuid for node in driver_nodes])
+            for node, node_hosts in zip(driver_nodes, hosts):
+                topic = self.topic + "." + node_hosts[0]
+                topics.setdefault(topic, []).append(node)
+        return topics
+
     def get_topic_for_driver(self, driver_name):
         """Get RPC topic name for a conductor supporting the given driver.
 
@@ -116,7 +150,7 @@ class ConductorAPI(object):
         :raises: DriverNotFound
 
         """
-        self.ring_manager.reset()
+        self.ring_manager.refresh()
 
         hash_ring = self.ring_manager[driver_name]
         host = random.choice(list(hash_ring.hosts))
@@ -161,6 +195,31 @@ class ConductorAPI(object):
         return cctxt.call(context, 'change_node_power_state', node_id=node_id,
                           new_state=new_state)
 
+    def change_nodes_power_state(self, context, node_ids, new_state,
+                                 topic=None):
+        """Change the power state of many nodes.
+
+        Synchronously, for each node, acquire lock and start the conductor
+        background task to change its power state. The conductor handles
+        the nodes concurrently, and replies after its
+        bulk_action_reply_timeout at most, handling the remaining nodes in
+        the background.
+
+        :param context: request context.
+        :param node_ids: a list of node ids or uuids, all mapped to the
+                         conductor of the RPC topic.
+        :param new_state: one of ironic.common.states power state values
+        :param topic: RPC topic. Defaults to self.topic.
+        :returns: a dict mapping each of the node_ids to None if the
+                  change of its power state was started or is still to be
+                  handled, or else to the message of the error which
+                  prevented it.
+
+        """
+        cctxt = self.client.prepare(topic=topic or self.topic, version='1.22')
+        return cctxt.call(context, 'change_nodes_power_state',
+                          node_ids=node_ids, new_state=new_state)
+
     def vendor_passthru(self, context, node_id, driver_method, http_method,
                         info, topic=None):
         """Receive requests for vendor-specific actions.
@@ -300,6 +359,41 @@ class ConductorAPI(object):
         cctxt = self.client.prepare(topic=topic or self.topic, version='1.6')
         return cctxt.call(context, 'do_node_tear_down', node_id=node_id)
 
+    def do_nodes_deploy(self, context, node_ids, rebuild, topic=None):
+        """Signal to conductor service to deploy many nodes.
+
+        The conductor validates the nodes concurrently and starts, or
+        queues, their deployments.
+
+        :param context: request context.
+        :param node_ids: a list of node ids or uuids, all mapped to the
+                         conductor of the RPC topic.
+        :param rebuild: True if this is a rebuild request.
+        :param topic: RPC topic. Defaults to self.topic.
+        :returns: a dict mapping each of the node_ids to None if its
+                  deployment was started or is still to be handled, or
+                  else to the message of the error which prevented it.
+
+        """
+        cctxt = self.client.prepare(topic=topic or self.topic, version='1.23')
+        return cctxt.call(context, 'do_nodes_deploy', node_ids=node_ids,
+                          rebuild=rebuild)
+
+    def do_nodes_tear_down(self, context, node_ids, topic=None):
+        """Signal to conductor service to tear down many deployments.
+
+        :param context: request context.
+        :param node_ids: a list of node ids or uuids, all mapped to the
+                         conductor of the RPC topic.
+        :param topic: RPC topic. Defaults to self.topic.
+        :returns: a dict mapping each of the node_ids to None if its tear
+                  down was started or is still to be handled, or else to
+                  the message of the error which prevented it.
+
+        """
+        cctxt = self.client.prepare(topic=topic or self.topic, version='1.23')
+        return cctxt.call(context, 'do_nodes_tear_down', node_ids=node_ids)
+
     def validate_driver_interfaces(self, context, node_id, topic=None):
         """Validate the `core` and `standardized` interfaces for drivers.
 
@@ -0,0 +1,109 @@
+# coding=utf-8
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Cache of the sensor readings last sent for each node.
+
+Used to only send the sensors whose reading changed since it was last
+sent, with a full snapshot of all the sensors of a node every few passes.
+"""
+
+import re
+
+# The numeric value at the start of a 'Sensor Reading', eg. '42' in
+# '42 (+/- 0) degrees C'.
+READING_VALUE_RE = re.compile(r'^\s*([-+]?\d+(\.\d+)?)')
+
+
+def _reading(sensor):
+    """Get the comparable reading of a sensor.
+
+    :param sensor: the dict of the sensor's details, as returned by
+                   get_sensors_data().
+    :returns: the numeric value of the 'Sensor Reading' if there is one,
+              or else the reading (or all the details) as they are.
+    """
+    if not isinstance(sensor, dict) or 'Sensor Reading' not in sensor:
+        return sensor
+    reading = sensor['Sensor Reading']
+    match = READING_VALUE_RE.match(str(reading))
+    if match:
+        return float(match.group(1))
+    return reading
+
+
+class SensorDataCache(object):
+    """Keep track of the sensor readings sent for each node."""
+
+    def __init__(self, threshold=0.0, full_every=1):
+        """Create a new cache.
+
+        :param threshold: the minimum change of a numeric reading for the
+                          sensor to be sent again.
+        :param full_every: send the readings of all the sensors of a node
+                           every this many passes.
+        """
+        self.threshold = threshold
+        self.full_every = max(1, full_every)
+        # node uuid -> (passes since the last full snapshot,
+        #               {(sensor type, sensor id): reading last sent})
+        self._sent = {}
+
+    def get_changes(self, node_uuid, sensors_data):
+        """Get the sensor data of a node which is worth sending.
+
+        The returned readings are recorded as sent.
+
+        :param node_uuid: the uuid of the node.
+        :param sensors_data: the sensor data of the node, a dict of sensor
+                             types to dicts of sensor ids to sensors.
+        :returns: a tuple (full, changes) where full is True and changes
+                  is all of sensors_data if a full snapshot is due, or
+                  else full is False and changes is the part of
+                  sensors_data whose readings changed since they were last
+                  sent.
+        """
+        passes, sent = self._sent.get(node_uuid, (None, {}))
+        full = passes is None or passes + 1 >= self.full_every
+        if full:
+            # start afresh, dropping the sensors which went away
+            sent = {}
+
+        changes = {}
+        for sensor_type, sensors in sensors_data.items():
+            for sensor_id, sensor in sensors.items():
+                key = (sensor_type, sensor_id)
+                reading = _reading(sensor)
+                if not full and not self._changed(sent.get(key), reading):
+                    continue
+                sent[key] = reading
+                changes.setdefault(sensor_type, {})[sensor_id] = sensor
+
+        self._sent[node_uuid] = (0 if full else passes + 1, sent)
+        return full, changes
+
+    def _changed(self, old, new):
+        if old is None:
+            return True
+        if isinstance(old, float) and isinstance(new, float):
+            return abs(new - old) > self.threshold
+        return old != new
+
+    def retain(self, node_uuids):
+        """Forget about all the nodes but the given ones.
+
+        :param node_uuids: a set of node uuids.
+        """
+        for node_uuid in set(self._sent) - set(node_uuids):
+            del self._sent[node_uuid]
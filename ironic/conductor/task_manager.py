@@ -49,7 +49,12 @@ attributes that you may access:
     task.node
         The Node object
     task.ports
-        Ports belonging to the Node
+        Ports belonging to the Node, loaded from the database the first
+        time they are accessed
+
+With a shared lock, the node and its ports are read from the conductor's
+object cache (see :mod:`ironic.objects.cache`) when they are found there,
+so they may be a few seconds out of date.
     task.driver
         The Driver for the Node, or the Driver based on the
         'driver_name' kwarg of TaskManager().
@@ -78,7 +83,8 @@ spawn handling are re-raised. You can specify a hook to execute custom
 code when such exceptions occur. For example, the hook is a more elegant
 solution than wrapping the "with task_manager.acquire()" with a
 try..exception block. (Note that this hook does not handle exceptions
-raised in the background thread.):
+raised in the background thread, except WorkerQueueTimeout which means
+that the queued work never started.):
 
 ::
 
@@ -95,22 +101,29 @@ raised in the background thread.):
 """
 
 import functools
+import random
 
+import eventlet
+from eventlet import event
 from oslo.config import cfg
 from oslo.utils import excutils
-import retrying
 
 from ironic.common import driver_factory
 from ironic.common import exception
 from ironic.common.i18n import _LW
 from ironic.common import states
 from ironic import objects
+from ironic.objects import cache
 from ironic.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
 CONF = cfg.CONF
 
+# Events fired when this conductor releases the lock of a node, keyed by
+# the node id and uuid, for the tasks of this conductor waiting for it.
+_release_events = {}
+
 
 def require_exclusive_lock(f):
     """Decorator to require an exclusive lock.
@@ -129,7 +142,7 @@ def require_exclusive_lock(f):
     return wrapper
 
 
-def acquire(context, node_id, shared=False, driver_name=None):
+def acquire(context, node_id, shared=False, driver_name=None, filters=None):
     """Shortcut for acquiring a lock on a Node.
 
     :param context: Request context.
@@ -137,11 +150,55 @@ def acquire(context, node_id, shared=False, driver_name=None):
     :param shared: Boolean indicating whether to take a shared or exclusive
                    lock. Default: False.
     :param driver_name: Name of Driver. Default: None.
+    :param filters: Filters the node must match for an exclusive lock to
+                    be taken. Default: None.
     :returns: An instance of :class:`TaskManager`.
 
     """
     return TaskManager(context, node_id, shared=shared,
-                       driver_name=driver_name)
+                       driver_name=driver_name, filters=filters)
+
+
+def _lock_retry_delay(attempt):
+    """Get the time to wait after a failed attempt to lock a node.
+
+    The wait is doubled after each attempt, up to a maximum, and is
+    randomized so that the tasks waiting for the same node do not all
+    retry at the same time.
+
+    :param attempt: the number of the failed attempt, starting at 1.
+    :returns: the time to wait, in seconds.
+    """
+    delay = min(CONF.conductor.node_locked_retry_interval * 2 ** (attempt - 1),
+                CONF.conductor.node_locked_retry_max_interval)
+    return random.uniform(delay / 2.0, delay)
+
+
+def _wait_for_release(node_id, host, timeout):
+    """Wait before trying to lock a node again.
+
+    If the lock is held by this conductor, wait for it to be released, up
+    to timeout seconds, instead of polling the database. Otherwise just
+    sleep for timeout seconds.
+
+    :param node_id: ID or UUID of the node.
+    :param host: the host holding the lock of the node.
+    :param timeout: the maximum time to wait, in seconds.
+    """
+    if host != CONF.host:
+        eventlet.sleep(timeout)
+        return
+    released = _release_events.setdefault(node_id, event.Event())
+    with eventlet.Timeout(timeout, False):
+        released.wait()
+
+
+def _notify_release(node):
+    """Wake the tasks of this conductor waiting for a node's lock."""
+    for key in (node.id, node.uuid):
+        released = _release_events.pop(key, None)
+        if released is not None:
+            released.send()
 
 
 class TaskManager(object):
@@ -152,7 +209,8 @@ class TaskManager(object):
 
     """
 
-    def __init__(self, context, node_id, shared=False, driver_name=None):
+    def __init__(self, context, node_id, shared=False, driver_name=None,
+                 filters=None):
         """Create a new TaskManager.
 
         Acquire a lock on a node. The lock can be either shared or
@@ -166,9 +224,16 @@ class TaskManager(object):
                        lock. Default: False.
         :param driver_name: The name of the driver to load, if different
                             from the Node's current driver.
+        :param filters: Filters the node must match for an exclusive lock
+                        to be taken, as accepted by
+                        dbapi.get_nodeinfo_list(). They are checked in the
+                        same database update that takes the lock, so
+                        callers do not need to fetch the node first. Not
+                        used for shared locks.
         :raises: DriverNotFound
         :raises: NodeNotFound
         :raises: NodeLocked
+        :raises: NodeConstraintsNotMet
 
         """
 
@@ -178,27 +243,38 @@ class TaskManager(object):
         self.context = context
         self.node = None
         self.shared = shared
+        self._ports = None
 
-        self.fsm = states.machine.copy()
+        # NOTE: the provisioning state machine is frozen, so a shallow copy
+        # only adds a cursor over its shared states and transitions.
+        self.fsm = states.machine.copy(shallow=True)
 
         # NodeLocked exceptions can be annoying. Let's try to alleviate
-        # some of that pain by retrying our lock attempts. The retrying
-        # module expects a wait_fixed value in milliseconds.
-        @retrying.retry(
-            retry_on_exception=lambda e: isinstance(e, exception.NodeLocked),
-            stop_max_attempt_number=CONF.conductor.node_locked_retry_attempts,
-            wait_fixed=CONF.conductor.node_locked_retry_interval * 1000)
+        # some of that pain by retrying our lock attempts, backing off
+        # between them.
         def reserve_node():
-            LOG.debug("Attempting to reserve node %(node)s",
-                      {'node': node_id})
-            self.node = objects.Node.reserve(context, CONF.host, node_id)
+            attempts = CONF.conductor.node_locked_retry_attempts
+            for attempt in range(1, attempts + 1):
+                LOG.debug("Attempting to reserve node %(node)s",
+                          {'node': node_id})
+                try:
+                    self.node = objects.Node.reserve(context, CONF.host,
+                                                     node_id, filters=filters)
+                    return
+                except exception.NodeLocked as e:
+                    if attempt >= attempts:
+                        raise
+                    _wait_for_release(node_id, e.kwargs.get('host'),
+                                      _lock_retry_delay(attempt))
 
         try:
             if not self.shared:
                 reserve_node()
             else:
-                self.node = objects.Node.get(context, node_id)
-            self.ports = objects.Port.list_by_node_id(context, self.node.id)
+                self.node = cache.get_node(context, node_id)
+                if self.node is None:
+                    self.node = objects.Node.get(context, node_id)
+                    cache.add_node(self.node)
             self.driver = driver_factory.get_driver(driver_name or
                                                     self.node.driver)
             self.fsm.initialize(self.node.provision_state)
@@ -207,6 +283,27 @@ class TaskManager(object):
             with excutils.save_and_reraise_exception():
                 self.release_resources()
 
+    @property
+    def ports(self):
+        """The ports of the node.
+
+        Many tasks never use the ports, so they are only fetched from the
+        database on first access. Tasks holding a shared lock get them from
+        the object cache if they are there.
+        """
+        if self._ports is None and self.node is not None:
+            if self.shared:
+                self._ports = cache.get_ports(self.context, self.node.id)
+            if self._ports is None:
+                self._ports = objects.Port.list_by_node_id(self.context,
+                                                           self.node.id)
+                cache.add_ports(self.node.id, self._ports)
+        return self._ports
+
+    @ports.setter
+    def ports(self, ports):
+        self._ports = ports
+
     def spawn_after(self, _spawn_method, *args, **kwargs):
         """Call this to spawn a thread to complete the task.
 
@@ -254,6 +351,8 @@ class TaskManager(object):
                 # squelch the exception if the node was deleted
                 # within the task's context.
                 pass
+            if self.node:
+                _notify_release(self.node)
         self.node = None
         self.driver = None
         self.ports = None
@@ -261,8 +360,30 @@ class TaskManager(object):
 
     def _thread_release_resources(self, t):
         """Thread.link() callback to release resources."""
+        try:
+            t.wait()
+        except exception.WorkerQueueTimeout as e:
+            # The work was queued and never started, so handle it as if
+            # spawning the thread had failed.
+            self._call_spawn_error_hook(e)
+        except Exception:
+            # Anything else was raised by the work itself, which is
+            # reported by eventlet when the thread dies.
+            pass
         self.release_resources()
 
+    def _call_spawn_error_hook(self, e):
+        """Execute the on_error hook, if set."""
+        try:
+            if self._on_error_method:
+                self._on_error_method(e, *self._on_error_args,
+                                      **self._on_error_kwargs)
+        except Exception:
+            LOG.warning(_LW("Task's on_error hook failed to "
+                            "call %(method)s on node %(node)s"),
+                        {'method': self._on_error_method.__name__,
+                        'node': self.node.uuid})
+
     def process_event(self, event, callback=None, call_args=None,
                       call_kwargs=None, err_handler=None):
         """Process the given event for the task's current state.
@@ -335,16 +456,7 @@ class TaskManager(object):
                 return
             except Exception as e:
                 with excutils.save_and_reraise_exception():
-                    try:
-                        # Execute the on_error hook if set
-                        if self._on_error_method:
-                            self._on_error_method(e, *self._on_error_args,
-                                                  **self._on_error_kwargs)
-                    except Exception:
-                        LOG.warning(_LW("Task's on_error hook failed to "
-                                        "call %(method)s on node %(node)s"),
-                                    {'method': self._on_error_method.__name__,
-                                    'node': self.node.uuid})
+                    self._call_spawn_error_hook(e)
 
                     if thread is not None:
                         # This means the link() failed for some
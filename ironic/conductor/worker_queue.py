@@ -0,0 +1,154 @@
+# coding=utf-8
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Admission queue in front of the conductor's pool of workers.
+
+When the pool is full, work is queued instead of being rejected, up to a
+maximum number of queued items, and is started as soon as a worker is
+free, the work with the highest priority first. Queued work is given a
+greenthread of its own which waits for the work to be started and then
+for it to complete, so the callers can link to it exactly as they would
+to a worker. Work which is not started within the queue timeout is
+dropped: its greenthread raises WorkerQueueTimeout.
+"""
+
+import heapq
+import itertools
+import time
+
+import eventlet
+from eventlet import event
+from eventlet import greenpool
+
+from ironic.common import exception
+from ironic.common.i18n import _LW
+from ironic.openstack.common import log
+
+LOG = log.getLogger(__name__)
+
+# Priority classes, lower values are started first.
+PRIORITY_USER = 0
+"""Work requested through the API, eg. deploys and power actions."""
+PRIORITY_BACKGROUND = 1
+"""Work started by the conductor itself, eg. takeovers and timeouts."""
+
+
+class WorkerQueue(object):
+    """Spawn workers in a pool, queueing the work while it is full."""
+
+    def __init__(self, pool, size=0, timeout=0):
+        """Create a new queue.
+
+        :param pool: the GreenPool of workers.
+        :param size: the maximum number of queued items. 0 disables the
+                     queue: work is rejected when the pool is full.
+        :param timeout: the maximum time, in seconds, an item may wait
+                        for a worker. 0 means no limit.
+        """
+        self._pool = pool
+        self.size = size
+        self.timeout = timeout
+        # heap of [priority, sequence number, event, func, args, kwargs]
+        self._waiters = []
+        self._counter = itertools.count()
+        # Each waiting greenthread is either queued, or waiting for the
+        # worker it was given, so the pool of waiters never blocks.
+        self._waiter_pool = greenpool.GreenPool(size=size + pool.size)
+        self._stats = {'queued': 0, 'started': 0, 'rejected': 0,
+                       'timed_out': 0, 'max_depth': 0, 'total_wait': 0.0,
+                       'max_wait': 0.0}
+
+    def spawn(self, priority, func, *args, **kwargs):
+        """Run func(*args, **kwargs) in a worker.
+
+        :param priority: the priority of the work, eg. PRIORITY_USER.
+        :returns: a GreenThread object, either the worker or the
+                  greenthread waiting for it.
+        :raises: NoFreeConductorWorker if the pool and the queue are full.
+        """
+        if not self._waiters and self._pool.free():
+            return self._spawn_worker(func, args, kwargs)
+        if len(self._waiters) >= self.size:
+            self._stats['rejected'] += 1
+            raise exception.NoFreeConductorWorker()
+
+        entry = [priority, next(self._counter), event.Event(),
+                 func, args, kwargs]
+        heapq.heappush(self._waiters, entry)
+        self._stats['queued'] += 1
+        self._stats['max_depth'] = max(self._stats['max_depth'],
+                                       len(self._waiters))
+        return self._waiter_pool.spawn(self._wait_for_worker, entry,
+                                       time.time())
+
+    def _spawn_worker(self, func, args, kwargs):
+        thread = self._pool.spawn(func, *args, **kwargs)
+        thread.link(self._start_queued)
+        return thread
+
+    def _start_queued(self, thread):
+        """Thread.link() callback starting queued work in free workers."""
+        while self._waiters and self._pool.free():
+            entry = heapq.heappop(self._waiters)
+            waiter, func, args, kwargs = entry[2:]
+            waiter.send(self._spawn_worker(func, args, kwargs))
+
+    def _wait_for_worker(self, entry, queued_at):
+        waiter = entry[2]
+        try:
+            with eventlet.Timeout(self.timeout or None):
+                thread = waiter.wait()
+        except eventlet.Timeout:
+            if not waiter.ready():
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._stats['timed_out'] += 1
+                LOG.warning(_LW('No worker became free within %(timeout)s '
+                                'seconds for %(func)s, dropping it. Worker '
+                                'queue statistics: %(stats)s'),
+                            {'timeout': self.timeout,
+                             'func': getattr(entry[3], '__name__', entry[3]),
+                             'stats': self.stats()})
+                raise exception.WorkerQueueTimeout(timeout=self.timeout)
+            # started just as the timeout expired
+            thread = waiter.wait()
+        wait = time.time() - queued_at
+        self._stats['started'] += 1
+        self._stats['total_wait'] += wait
+        self._stats['max_wait'] = max(self._stats['max_wait'], wait)
+        return thread.wait()
+
+    def depth(self):
+        """Get the number of items waiting for a worker."""
+        return len(self._waiters)
+
+    def stats(self):
+        """Get the statistics of the queue.
+
+        :returns: a dict with the current depth of the queue, its maximum
+                  depth, the numbers of items which were queued, started
+                  after waiting, rejected and timed out, and the average
+                  and maximum wait of the items which were started, in
+                  seconds.
+        """
+        stats = dict(self._stats, depth=len(self._waiters))
+        total_wait = stats.pop('total_wait')
+        stats['average_wait'] = (total_wait / stats['started']
+                                 if stats['started'] else 0.0)
+        return stats
+
+    def waitall(self):
+        """Wait until all the queued work has completed."""
+        self._waiter_pool.waitall()
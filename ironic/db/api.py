@@ -44,7 +44,8 @@ class Connection(object):
 
     @abc.abstractmethod
     def get_nodeinfo_list(self, columns=None, filters=None, limit=None,
-                          marker=None, sort_key=None, sort_dir=None):
+                          marker=None, sort_key=None, sort_dir=None,
+                          use_slave=False):
         """Get specific columns for matching nodes.
 
         Return a list of the specified columns for all nodes that match the
@@ -60,15 +61,32 @@ class Connection(object):
                         :chassis_uuid: uuid of chassis
                         :driver: driver's name
                         :provision_state: provision state of node
+                        :provision_state_not_in:
+                            list of provision states the node must not be in
                         :provisioned_before:
                             nodes with provision_updated_at field before this
                             interval in seconds
+                        :uuid_in: list of uuids the node's uuid must be in
+                        :instance_uuid_in:
+                            list of instance uuids the node's instance uuid
+                            must be in
+                        :hash_key_ranges:
+                            dict mapping driver names to lists of
+                            (start, end) hash key ranges, as returned by
+                            HashRing.get_key_ranges(); only nodes of those
+                            drivers whose hash key falls in one of the
+                            ranges are returned. A driver mapped to None
+                            matches all of its nodes.
         :param limit: Maximum number of nodes to return.
         :param marker: the last item of the previous page; we return the next
                        result set.
         :param sort_key: Attribute by which results should be sorted.
         :param sort_dir: direction in which results should be sorted.
                          (asc, desc)
+        :param use_slave: whether the query may be sent to the slave
+                          database. Only callers which tolerate missing the
+                          latest writes, like periodic tasks which will see
+                          them on their next run, should set it.
         :returns: A list of tuples of the specified columns.
         """
 
@@ -88,6 +106,10 @@ class Connection(object):
                         :provisioned_before:
                             nodes with provision_updated_at field before this
                             interval in seconds
+                        :uuid_in: list of uuids the node's uuid must be in
+                        :instance_uuid_in:
+                            list of instance uuids the node's instance uuid
+                            must be in
         :param limit: Maximum number of nodes to return.
         :param marker: the last item of the previous page; we return the next
                        result set.
@@ -97,7 +119,15 @@ class Connection(object):
         """
 
     @abc.abstractmethod
-    def reserve_node(self, tag, node_id):
+    def get_nodes_changed_since(self, since):
+        """Find the nodes created or updated since a given time.
+
+        :param since: A datetime.
+        :returns: A list of (node id, time of the latest change) tuples.
+        """
+
+    @abc.abstractmethod
+    def reserve_node(self, tag, node_id, filters=None):
         """Reserve a node.
 
         To prevent other ManagerServices from manipulating the given
@@ -105,9 +135,15 @@ class Connection(object):
 
         :param tag: A string uniquely identifying the reservation holder.
         :param node_id: A node id or uuid.
+        :param filters: Filters the node must match for the reservation
+                        to be taken, checked in the same statement that
+                        takes it. Accepts the same filters as
+                        get_nodeinfo_list(). Defaults to None.
         :returns: A Node object.
         :raises: NodeNotFound if the node is not found.
         :raises: NodeLocked if the node is already reserved.
+        :raises: NodeConstraintsNotMet if the node does not match the
+                 filters.
         """
 
     @abc.abstractmethod
@@ -145,6 +181,20 @@ class Connection(object):
         :returns: A node.
         """
 
+    @abc.abstractmethod
+    def create_nodes(self, values_list):
+        """Create several new nodes in a single transaction.
+
+        Either all the nodes are created, or none is.
+
+        :param values_list: A list of dicts of values, as accepted by
+                            create_node().
+        :returns: A list of the new nodes, in the same order.
+        :raises: NodeAlreadyExists if a node with one of the uuids exists.
+        :raises: InstanceAssociated if a node is already associated with
+                 one of the instance uuids.
+        """
+
     @abc.abstractmethod
     def get_node_by_id(self, node_id):
         """Return a node.
@@ -225,9 +275,15 @@ class Connection(object):
 
     @abc.abstractmethod
     def get_port_list(self, limit=None, marker=None,
-                      sort_key=None, sort_dir=None):
+                      sort_key=None, sort_dir=None, filters=None):
         """Return a list of ports.
 
+        :param filters: Filters to apply. Defaults to None.
+
+                        :uuid_in: list of uuids the port's uuid must be in
+                        :address_in:
+                            list of MAC addresses the port's address must
+                            be in
         :param limit: Maximum number of ports to return.
         :param marker: the last item of the previous page; we return the next
                        result set.
@@ -251,6 +307,15 @@ class Connection(object):
         :returns: A list of ports.
         """
 
+    @abc.abstractmethod
+    def get_ports_changed_since(self, since):
+        """Find the ports created or updated since a given time.
+
+        :param since: A datetime.
+        :returns: A list of (node id, time of the latest change) tuples,
+                  one for each port, with the id of the node of the port.
+        """
+
     @abc.abstractmethod
     def create_port(self, values):
         """Create a new port.
@@ -258,6 +323,20 @@ class Connection(object):
         :param values: Dict of values.
         """
 
+    @abc.abstractmethod
+    def create_ports(self, values_list):
+        """Create several new ports in a single transaction.
+
+        Either all the ports are created, or none is.
+
+        :param values_list: A list of dicts of values, as accepted by
+                            create_port().
+        :returns: A list of the new ports, in the same order.
+        :raises: PortAlreadyExists if a port with one of the uuids exists.
+        :raises: MACAlreadyExists if a port with one of the MAC addresses
+                 exists.
+        """
+
     @abc.abstractmethod
     def update_port(self, port_id, values):
         """Update properties of an port.
@@ -372,6 +451,25 @@ class Connection(object):
         :raises: ConductorNotFound
         """
 
+    @abc.abstractmethod
+    def clear_node_reservations_for_dead_conductors(self, hostname,
+                                                    interval):
+        """Release the node reservations held by dead conductors.
+
+        Conductors which have not checked in for interval seconds are
+        marked offline, one at a time, and the reservations they hold are
+        cleared in the same transaction. Only the caller which manages to
+        mark a conductor offline clears its reservations, so when several
+        conductors call this concurrently, each dead conductor is handled
+        exactly once.
+
+        :param hostname: The hostname of the calling conductor service,
+                         which is never considered dead.
+        :param interval: Seconds since last check-in of a conductor.
+        :returns: A list of the hostnames of the conductors which were
+                  marked offline by this call.
+        """
+
     @abc.abstractmethod
     def get_active_driver_dict(self, interval):
         """Retrieve drivers for the registered and active conductors.
@@ -385,3 +483,16 @@ class Connection(object):
                     {driverA: set([host1, host2]),
                      driverB: set([host2, host3])}
         """
+
+    @abc.abstractmethod
+    def get_active_conductor_weights(self, interval):
+        """Retrieve the capacity weights of the active conductors.
+
+        :param interval: Seconds since last check-in of a conductor.
+        :returns: A dict which maps the hostnames of the registered and
+                  active conductors to their weight. For example:
+
+                  ::
+
+                    {host1: 1.0, host2: 2.0}
+        """
@@ -0,0 +1,41 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Add indexes for the node and port filters
+
+Revision ID: 1e1d5ace7dc6
+Revises: 4f4b5ad19f9b
+Create Date: 2015-03-09 10:41:22.873614
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '1e1d5ace7dc6'
+down_revision = '4f4b5ad19f9b'
+
+from alembic import op
+
+
+def upgrade():
+    op.create_index('nodes_reservation_maintenance_provision_state_idx',
+                    'nodes', ['reservation', 'maintenance',
+                              'provision_state'])
+    op.create_index('nodes_provision_state_provision_updated_at_idx',
+                    'nodes', ['provision_state', 'provision_updated_at'])
+    op.create_index('ports_node_id_idx', 'ports', ['node_id'])
+
+
+def downgrade():
+    op.drop_index('ports_node_id_idx', 'ports')
+    op.drop_index('nodes_provision_state_provision_updated_at_idx', 'nodes')
+    op.drop_index('nodes_reservation_maintenance_provision_state_idx',
+                  'nodes')
@@ -0,0 +1,39 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Add indexes on the creation and update times of nodes and ports
+
+Revision ID: 2b7e4c91d5f3
+Revises: 1e1d5ace7dc6
+Create Date: 2015-03-16 14:02:37.518309
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '2b7e4c91d5f3'
+down_revision = '1e1d5ace7dc6'
+
+from alembic import op
+
+
+def upgrade():
+    op.create_index('nodes_created_at_idx', 'nodes', ['created_at'])
+    op.create_index('nodes_updated_at_idx', 'nodes', ['updated_at'])
+    op.create_index('ports_created_at_idx', 'ports', ['created_at'])
+    op.create_index('ports_updated_at_idx', 'ports', ['updated_at'])
+
+
+def downgrade():
+    op.drop_index('ports_updated_at_idx', 'ports')
+    op.drop_index('ports_created_at_idx', 'ports')
+    op.drop_index('nodes_updated_at_idx', 'nodes')
+    op.drop_index('nodes_created_at_idx', 'nodes')
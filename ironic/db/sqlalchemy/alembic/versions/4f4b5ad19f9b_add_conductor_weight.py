@@ -0,0 +1,36 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Add Conductor.weight
+
+Revision ID: 4f4b5ad19f9b
+Revises: c97b55b47310
+Create Date: 2015-03-02 14:27:09.153741
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = '4f4b5ad19f9b'
+down_revision = 'c97b55b47310'
+
+from alembic import op
+import sqlalchemy as sa
+
+
+def upgrade():
+    op.add_column('conductors', sa.Column('weight', sa.Float(),
+                                          nullable=False,
+                                          server_default='1.0'))
+
+
+def downgrade():
+    op.drop_column('conductors', 'weight')
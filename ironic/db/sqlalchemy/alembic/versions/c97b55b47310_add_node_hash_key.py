@@ -0,0 +1,53 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Add Node.hash_key
+
+Revision ID: c97b55b47310
+Revises: 242cc6a923b3
+Create Date: 2015-02-16 11:12:41.517292
+
+"""
+
+# revision identifiers, used by Alembic.
+revision = 'c97b55b47310'
+down_revision = '242cc6a923b3'
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import sql
+
+from ironic.common import hash_ring
+
+
+def upgrade():
+    op.add_column('nodes', sa.Column('hash_key', sa.String(length=32),
+                                     nullable=True))
+    op.create_index('nodes_driver_hash_key_idx', 'nodes',
+                    ['driver', 'hash_key'])
+
+    nodes = sql.table('nodes',
+                      sql.column('id', sa.Integer),
+                      sql.column('uuid', sa.String),
+                      sql.column('hash_key', sa.String))
+    connection = op.get_bind()
+    for node_id, node_uuid in connection.execute(
+            sql.select([nodes.c.id, nodes.c.uuid])).fetchall():
+        connection.execute(
+            nodes.update().
+            where(nodes.c.id == node_id).
+            values(hash_key=hash_ring.get_hash_key(node_uuid)))
+
+
+def downgrade():
+    op.drop_index('nodes_driver_hash_key_idx', 'nodes')
+    op.drop_column('nodes', 'hash_key')
@@ -18,15 +18,19 @@
 
 import collections
 import datetime
+import time
 
 from oslo.config import cfg
 from oslo.db import exception as db_exc
 from oslo.db.sqlalchemy import session as db_session
 from oslo.db.sqlalchemy import utils as db_utils
 from oslo.utils import timeutils
+from sqlalchemy import event
 from sqlalchemy.orm.exc import NoResultFound
+from sqlalchemy import sql
 
 from ironic.common import exception
+from ironic.common import hash_ring
 from ironic.common.i18n import _
 from ironic.common.i18n import _LW
 from ironic.common import states
@@ -44,12 +48,20 @@ LOG = log.getLogger(__name__)
 
 
 _FACADE = None
+# time.time() of the latest commit of this process to the master database
+_last_write = 0
+
+
+def _record_write(conn):
+    global _last_write
+    _last_write = time.time()
 
 
 def _create_facade_lazily():
     global _FACADE
     if _FACADE is None:
         _FACADE = db_session.EngineFacade.from_config(CONF)
+        event.listen(_FACADE.get_engine(), 'commit', _record_write)
     return _FACADE
 
 
@@ -68,13 +80,31 @@ def get_backend():
     return Connection()
 
 
+def _can_use_slave():
+    """Whether read-only queries may be sent to the slave database.
+
+    They may not for [database]max_slave_lag seconds after a write of this
+    process, which the slave database may not have replicated yet. Writes
+    of other processes are not known of, so callers asking for the slave
+    database must tolerate missing them.
+    """
+    return time.time() - _last_write >= CONF.database.max_slave_lag
+
+
 def model_query(model, *args, **kwargs):
     """Query helper for simpler session usage.
 
     :param session: if present, the session to use
+    :param use_slave: if True and no session is given, the query is sent to
+                      the slave database set by [database]slave_connection,
+                      unless this process wrote to the database recently.
+                      Defaults to False. Only read-only queries which may
+                      tolerate some replication lag, including missing the
+                      latest writes of other processes, should use it.
     """
 
-    session = kwargs.get('session') or get_session()
+    use_slave = kwargs.get('use_slave', False) and _can_use_slave()
+    session = kwargs.get('session') or get_session(use_slave=use_slave)
     query = session.query(model, *args)
     return query
 
@@ -142,6 +172,83 @@ def _check_port_change_forbidden(port, session):
                                        host=node_ref['reservation'])
 
 
+def _hash_key_range_filter(start, end):
+    if start is None and end is None:
+        return sql.true()
+    if start is None:
+        return models.Node.hash_key < end
+    if end is None:
+        return models.Node.hash_key >= start
+    return sql.and_(models.Node.hash_key >= start,
+                    models.Node.hash_key < end)
+
+
+def _hash_key_ranges_filter(key_ranges):
+    mapped = []
+    for driver, ranges in key_ranges.items():
+        clause = models.Node.driver == driver
+        if ranges is not None:
+            clause = sql.and_(clause, sql.or_(
+                *[_hash_key_range_filter(*r) for r in ranges]))
+        mapped.append(clause)
+    return sql.or_(*mapped) if mapped else sql.false()
+
+
+def _provision_state_not_in_filter(excluded):
+    states = [state for state in excluded if state is not None]
+    clause = models.Node.provision_state != None
+    if states:
+        clause = sql.and_(clause, ~models.Node.provision_state.in_(states))
+    if None not in excluded:
+        # NOT IN never matches NULL, so nodes without a provision
+        # state have to be let through explicitly.
+        clause = sql.or_(models.Node.provision_state == None, clause)
+    return clause
+
+
+def _keyset_filter(model, sort_key, sort_dir, marker):
+    """Get the filter of the rows following the marker in the sort order.
+
+    Rows are sorted by sort_key, then by id. The filter starts with a
+    range condition on the sort key, so that the database only scans the
+    rows of the page instead of all the rows before it; the condition on
+    the id only matters for the rows with the same sort key value.
+
+    :param model: the model of the table.
+    :param sort_key: the column the rows are sorted by, or None.
+    :param sort_dir: 'asc' or 'desc'.
+    :param marker: an object or a dict with the values of the sort key and
+                   the id of the last row of the previous page.
+    :returns: a filter for query.filter().
+    """
+    ascending = sort_dir != 'desc'
+    id_column = model.id
+    id_filter = (id_column > marker['id'] if ascending
+                 else id_column < marker['id'])
+    if not sort_key or sort_key == 'id':
+        return id_filter
+
+    column = getattr(model, sort_key)
+    value = marker[sort_key]
+    # NULLs sort before any value, except on PostgreSQL
+    nulls_first = get_engine().dialect.name != 'postgresql'
+    if value is None:
+        after_nulls = column.isnot(None)
+        nulls = sql.and_(column.is_(None), id_filter)
+        if ascending == nulls_first:
+            return sql.or_(nulls, after_nulls)
+        return nulls
+    if ascending:
+        range_filter = sql.and_(column >= value,
+                                sql.or_(column > value, id_filter))
+    else:
+        range_filter = sql.and_(column <= value,
+                                sql.or_(column < value, id_filter))
+    if ascending != nulls_first:
+        return sql.or_(range_filter, column.is_(None))
+    return range_filter
+
+
 def _paginate_query(model, limit=None, marker=None, sort_key=None,
                     sort_dir=None, query=None):
     if not query:
@@ -149,11 +256,69 @@ def _paginate_query(model, limit=None, marker=None, sort_key=None,
     sort_keys = ['id']
     if sort_key and sort_key not in sort_keys:
         sort_keys.insert(0, sort_key)
+    if marker is not None:
+        if sort_key and not hasattr(model, sort_key):
+            raise exception.InvalidParameterValue(
+                _("Invalid sort key: %s") % sort_key)
+        query = query.filter(_keyset_filter(model, sort_key, sort_dir,
+                                            marker))
     query = db_utils.paginate_query(query, model, limit, sort_keys,
-                                    marker=marker, sort_dir=sort_dir)
+                                    sort_dir=sort_dir)
     return query.all()
 
 
+def _get_changed_since(model, column, since):
+    """Find the rows of a table created or updated since a given time.
+
+    :param model: the model of the table.
+    :param column: the column to return for each row.
+    :param since: a datetime.
+    :returns: a list of (column value, time of the latest change) tuples.
+    """
+    query = (model_query(column, model.created_at, model.updated_at,
+                         base_model=model)
+             .filter(sql.or_(model.created_at >= since,
+                             model.updated_at >= since)))
+    return [(value, max(t for t in (created_at, updated_at) if t))
+            for value, created_at, updated_at in query]
+
+
+def _insert_rows(session, model, rows):
+    """Insert rows in a table with as few statements as possible.
+
+    The rows which have values for the same columns are inserted by a
+    single executemany() call, which the database drivers send as
+    multi-row INSERTs or as a batch of INSERTs in one round trip.
+
+    :param session: the session of the transaction.
+    :param model: the model of the table.
+    :param rows: a list of dicts of column values.
+    """
+    batches = collections.OrderedDict()
+    for row in rows:
+        batches.setdefault(tuple(sorted(row)), []).append(row)
+    for batch in batches.values():
+        session.execute(model.__table__.insert(), batch)
+
+
+def _get_by_uuids(session, model, uuids):
+    """Get the rows of a table with the given uuids, in the same order."""
+    query = model_query(model, session=session).filter(model.uuid.in_(uuids))
+    rows = dict((row.uuid, row) for row in query)
+    return [rows[uuid] for uuid in uuids]
+
+
+def _set_node_defaults(values):
+    """Add the defaults of a new node to its values."""
+    if not values.get('uuid'):
+        values['uuid'] = utils.generate_uuid()
+    if not values.get('power_state'):
+        values['power_state'] = states.NOSTATE
+    if not values.get('provision_state'):
+        values['provision_state'] = states.NOSTATE
+    values['hash_key'] = hash_ring.get_hash_key(values['uuid'])
+
+
 class Connection(api.Connection):
     """SqlAlchemy connection."""
 
@@ -185,15 +350,27 @@ class Connection(api.Connection):
             query = query.filter_by(driver=filters['driver'])
         if 'provision_state' in filters:
             query = query.filter_by(provision_state=filters['provision_state'])
+        if 'provision_state_not_in' in filters:
+            query = query.filter(_provision_state_not_in_filter(
+                                    filters['provision_state_not_in']))
         if 'provisioned_before' in filters:
             limit = timeutils.utcnow() - datetime.timedelta(
                                          seconds=filters['provisioned_before'])
             query = query.filter(models.Node.provision_updated_at < limit)
+        if 'uuid_in' in filters:
+            query = query.filter(models.Node.uuid.in_(filters['uuid_in']))
+        if 'instance_uuid_in' in filters:
+            query = query.filter(models.Node.instance_uuid.in_(
+                                    filters['instance_uuid_in']))
+        if 'hash_key_ranges' in filters:
+            query = query.filter(_hash_key_ranges_filter(
+                                    filters['hash_key_ranges']))
 
         return query
 
     def get_nodeinfo_list(self, columns=None, filters=None, limit=None,
-                          marker=None, sort_key=None, sort_dir=None):
+                          marker=None, sort_key=None, sort_dir=None,
+                          use_slave=False):
         # list-ify columns default values because it is bad form
         # to include a mutable list in function definitions.
         if columns is None:
@@ -201,7 +378,8 @@ class Connection(api.Connection):
         else:
             columns = [getattr(models.Node, c) for c in columns]
 
-        query = model_query(*columns, base_model=models.Node)
+        query = model_query(*columns, base_model=models.Node,
+                            use_slave=use_slave)
         query = self._add_nodes_filters(query, filters)
         return _paginate_query(models.Node, limit, marker,
                                sort_key, sort_dir, query)
@@ -213,17 +391,26 @@ class Connection(api.Connection):
         return _paginate_query(models.Node, limit, marker,
                                sort_key, sort_dir, query)
 
-    def reserve_node(self, tag, node_id):
+    def get_nodes_changed_since(self, since):
+        return _get_changed_since(models.Node, models.Node.id, since)
+
+    def reserve_node(self, tag, node_id, filters=None):
         session = get_session()
         with session.begin():
             query = model_query(models.Node, session=session)
             query = add_identity_filter(query, node_id)
             # be optimistic and assume we usually create a reservation
-            count = query.filter_by(reservation=None).update(
+            count = self._add_nodes_filters(
+                        query.filter_by(reservation=None), filters).update(
                         {'reservation': tag}, synchronize_session=False)
             try:
                 node = query.one()
                 if count != 1:
+                    if node['reservation'] is None:
+                        # Not locked, so the node must have failed one
+                        # of the given filters.
+                        raise exception.NodeConstraintsNotMet(
+                            node=node_id, constraints=filters)
                     # Nothing updated and node exists. Must already be
                     # locked.
                     raise exception.NodeLocked(node=node_id,
@@ -253,12 +440,7 @@ class Connection(api.Connection):
 
     def create_node(self, values):
         # ensure defaults are present for new nodes
-        if not values.get('uuid'):
-            values['uuid'] = utils.generate_uuid()
-        if not values.get('power_state'):
-            values['power_state'] = states.NOSTATE
-        if not values.get('provision_state'):
-            values['provision_state'] = states.NOSTATE
+        _set_node_defaults(values)
 
         node = models.Node()
         node.update(values)
@@ -272,6 +454,24 @@ class Connection(api.Connection):
             raise exception.NodeAlreadyExists(uuid=values['uuid'])
         return node
 
+    def create_nodes(self, values_list):
+        for values in values_list:
+            _set_node_defaults(values)
+
+        session = get_session()
+        try:
+            with session.begin():
+                _insert_rows(session, models.Node, values_list)
+                return _get_by_uuids(session, models.Node,
+                                     [v['uuid'] for v in values_list])
+        except db_exc.DBDuplicateEntry as exc:
+            if 'instance_uuid' in exc.columns:
+                node = [v['uuid'] for v in values_list
+                        if v.get('instance_uuid') == exc.value]
+                raise exception.InstanceAssociated(
+                    instance_uuid=exc.value, node=node[0] if node else None)
+            raise exception.NodeAlreadyExists(uuid=exc.value)
+
     def get_node_by_id(self, node_id):
         query = model_query(models.Node).filter_by(id=node_id)
         try:
@@ -377,10 +577,24 @@ class Connection(api.Connection):
         except NoResultFound:
             raise exception.PortNotFound(port=address)
 
+    def _add_ports_filters(self, query, filters):
+        if filters is None:
+            filters = []
+
+        if 'uuid_in' in filters:
+            query = query.filter(models.Port.uuid.in_(filters['uuid_in']))
+        if 'address_in' in filters:
+            query = query.filter(models.Port.address.in_(
+                                    filters['address_in']))
+
+        return query
+
     def get_port_list(self, limit=None, marker=None,
-                      sort_key=None, sort_dir=None):
+                      sort_key=None, sort_dir=None, filters=None):
+        query = model_query(models.Port)
+        query = self._add_ports_filters(query, filters)
         return _paginate_query(models.Port, limit, marker,
-                               sort_key, sort_dir)
+                               sort_key, sort_dir, query)
 
     def get_ports_by_node_id(self, node_id, limit=None, marker=None,
                              sort_key=None, sort_dir=None):
@@ -389,6 +603,9 @@ class Connection(api.Connection):
         return _paginate_query(models.Port, limit, marker,
                                sort_key, sort_dir, query)
 
+    def get_ports_changed_since(self, since):
+        return _get_changed_since(models.Port, models.Port.node_id, since)
+
     def create_port(self, values):
         if not values.get('uuid'):
             values['uuid'] = utils.generate_uuid()
@@ -402,6 +619,22 @@ class Connection(api.Connection):
             raise exception.PortAlreadyExists(uuid=values['uuid'])
         return port
 
+    def create_ports(self, values_list):
+        for values in values_list:
+            if not values.get('uuid'):
+                values['uuid'] = utils.generate_uuid()
+
+        session = get_session()
+        try:
+            with session.begin():
+                _insert_rows(session, models.Port, values_list)
+                return _get_by_uuids(session, models.Port,
+                                     [v['uuid'] for v in values_list])
+        except db_exc.DBDuplicateEntry as exc:
+            if 'address' in exc.columns:
+                raise exception.MACAlreadyExists(mac=exc.value)
+            raise exception.PortAlreadyExists(uuid=exc.value)
+
     def update_port(self, port_id, values):
         # NOTE(dtantsur): this can lead to very strange errors
         if 'uuid' in values:
@@ -566,15 +799,58 @@ class Connection(api.Connection):
             LOG.warn(_LW('Cleared reservations held by %(hostname)s: '
                          '%(nodes)s'), {'hostname': hostname, 'nodes': nodes})
 
-    def get_active_driver_dict(self, interval=None):
+    def clear_node_reservations_for_dead_conductors(self, hostname,
+                                                    interval=None):
         if interval is None:
             interval = CONF.conductor.heartbeat_timeout
 
         limit = timeutils.utcnow() - datetime.timedelta(seconds=interval)
-        result = (model_query(models.Conductor)
-                  .filter_by(online=True)
-                  .filter(models.Conductor.updated_at >= limit)
-                  .all())
+        dead = (model_query(models.Conductor)
+                .filter_by(online=True)
+                .filter(models.Conductor.updated_at < limit)
+                .filter(models.Conductor.hostname != hostname)
+                .all())
+
+        cleared = []
+        for dead_hostname in [row['hostname'] for row in dead]:
+            session = get_session()
+            with session.begin():
+                # NOTE: only one of the conductors racing to handle a dead
+                # one manages to mark it offline, the others match nothing
+                # and move on.
+                count = (model_query(models.Conductor, session=session)
+                         .filter_by(hostname=dead_hostname, online=True)
+                         .filter(models.Conductor.updated_at < limit)
+                         .update({'online': False},
+                                 synchronize_session=False))
+                if count != 1:
+                    continue
+                query = model_query(models.Node, session=session).filter_by(
+                        reservation=dead_hostname)
+                nodes = [node['uuid'] for node in query]
+                query.update({'reservation': None},
+                             synchronize_session=False)
+            cleared.append(dead_hostname)
+
+            LOG.warn(_LW('Conductor %(hostname)s has not checked in for '
+                         '%(interval)s seconds and was marked offline. '
+                         'Cleared its reservations: %(nodes)s'),
+                     {'hostname': dead_hostname, 'interval': interval,
+                      'nodes': ', '.join(nodes)})
+        return cleared
+
+    def _get_active_conductors(self, interval=None):
+        if interval is None:
+            interval = CONF.conductor.heartbeat_timeout
+
+        limit = timeutils.utcnow() - datetime.timedelta(seconds=interval)
+        return (model_query(models.Conductor)
+                .filter_by(online=True)
+                .filter(models.Conductor.updated_at >= limit)
+                .all())
+
+    def get_active_driver_dict(self, interval=None):
+        result = self._get_active_conductors(interval)
 
         # build mapping of drivers to the set of hosts which support them
         d2c = collections.defaultdict(set)
@@ -582,3 +858,7 @@ class Connection(api.Connection):
             for driver in row['drivers']:
                 d2c[driver].add(row['hostname'])
         return d2c
+
+    def get_active_conductor_weights(self, interval=None):
+        result = self._get_active_conductors(interval)
+        return dict((row['hostname'], row['weight']) for row in result)
@@ -24,8 +24,8 @@ from oslo.config import cfg
 from oslo.db import options as db_options
 from oslo.db.sqlalchemy import models
 import six.moves.urllib.parse as urlparse
-from sqlalchemy import Boolean, Column, DateTime
-from sqlalchemy import ForeignKey, Integer
+from sqlalchemy import Boolean, Column, DateTime, Float
+from sqlalchemy import ForeignKey, Index, Integer
 from sqlalchemy import schema, String, Text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.types import TypeDecorator, TEXT
@@ -36,7 +36,16 @@ from ironic.common import paths
 sql_opts = [
     cfg.StrOpt('mysql_engine',
                default='InnoDB',
-               help='MySQL engine to use.')
+               help='MySQL engine to use.'),
+    cfg.IntOpt('max_slave_lag',
+               default=5,
+               help='Maximum replication lag of the slave database set '
+                    'by the slave_connection option, in seconds. The node '
+                    'queries of the periodic tasks which tolerate missing '
+                    'the latest changes are sent to the slave database, '
+                    'except for this long after a write to the database '
+                    'by the same conductor, so that it reads its own '
+                    'writes.'),
 ]
 
 _DEFAULT_SQL_CONNECTION = 'sqlite:///' + paths.state_path_def('ironic.sqlite')
@@ -136,6 +145,7 @@ class Conductor(Base):
     hostname = Column(String(255), nullable=False)
     drivers = Column(JSONEncodedList)
     online = Column(Boolean, default=True)
+    weight = Column(Float, nullable=False, default=1.0)
 
 
 class Node(Base):
@@ -146,6 +156,16 @@ class Node(Base):
         schema.UniqueConstraint('uuid', name='uniq_nodes0uuid'),
         schema.UniqueConstraint('instance_uuid',
                                 name='uniq_nodes0instance_uuid'),
+        # NOTE: these indexes match the filters of the periodic tasks of
+        #       the conductors, see
+        #       ironic.tests.db.sqlalchemy.test_query_plans.
+        Index('nodes_driver_hash_key_idx', 'driver', 'hash_key'),
+        Index('nodes_reservation_maintenance_provision_state_idx',
+              'reservation', 'maintenance', 'provision_state'),
+        Index('nodes_provision_state_provision_updated_at_idx',
+              'provision_state', 'provision_updated_at'),
+        Index('nodes_created_at_idx', 'created_at'),
+        Index('nodes_updated_at_idx', 'updated_at'),
         table_args())
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36))
@@ -179,6 +199,11 @@ class Node(Base):
                              name='nodes_conductor_affinity_fk'),
                          nullable=True)
 
+    # The position of the node's uuid on the conductors' hash ring (see
+    # ironic.common.hash_ring.get_hash_key). It lets each conductor ask the
+    # database for only the nodes which are mapped to it.
+    hash_key = Column(String(32), nullable=True)
+
     maintenance = Column(Boolean, default=False)
     maintenance_reason = Column(Text, nullable=True)
     console_enabled = Column(Boolean, default=False)
@@ -192,6 +217,9 @@ class Port(Base):
     __table_args__ = (
         schema.UniqueConstraint('address', name='uniq_ports0address'),
         schema.UniqueConstraint('uuid', name='uniq_ports0uuid'),
+        Index('ports_node_id_idx', 'node_id'),
+        Index('ports_created_at_idx', 'created_at'),
+        Index('ports_updated_at_idx', 'updated_at'),
         table_args())
     id = Column(Integer, primary_key=True)
     uuid = Column(String(36))
@@ -196,6 +196,24 @@ class DeployInterface(object):
         :param task: a TaskManager instance containing the node to act on.
         """
 
+    def cache_images(self, task):
+        """Fetch the images of the task's node into the local image cache.
+
+        Conductors call this method on the active nodes they are a replica
+        of, so that taking them over does not have to wait for images to
+        be downloaded. Unlike `prepare`, it must not change the node, its
+        boot configuration or the settings of its BMC, since it is called
+        under a shared lock on nodes managed by another conductor.
+
+        Drivers which do not cache images need not implement it.
+
+        :param task: a TaskManager instance containing the node to act on.
+        :raises: UnsupportedDriverExtension if the driver does not cache
+                 images.
+        """
+        raise exception.UnsupportedDriverExtension(
+            driver=task.node.driver, extension='cache_images')
+
     @abc.abstractmethod
     def take_over(self, task):
         """Take over management of this task's node from a dead conductor.
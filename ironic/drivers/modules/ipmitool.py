@@ -61,6 +61,9 @@ CONF.import_opt('retry_timeout',
 CONF.import_opt('min_command_interval',
                 'ironic.drivers.modules.ipminative',
                 group='ipmi')
+CONF.import_opt('send_sensor_data_wait_timeout',
+                'ironic.conductor.manager',
+                group='conductor')
 
 LOG = logging.getLogger(__name__)
 
@@ -294,13 +297,15 @@ def _parse_driver_info(node):
             }
 
 
-def _exec_ipmitool(driver_info, command):
+def _exec_ipmitool(driver_info, command, timeout=None):
     """Execute the ipmitool command.
 
     This uses the lanplus interface to communicate with the BMC device driver.
 
     :param driver_info: the ipmitool parameters for accessing a node.
     :param command: the ipmitool command to be executed.
+    :param timeout: if set, the number of seconds after which the ipmitool
+                    process is killed, which raises ProcessExecutionError.
     :returns: (stdout, stderr) from executing the command.
     :raises: PasswordFileFailedToCreate from creating or writing to the
              temporary file.
@@ -345,6 +350,10 @@ def _exec_ipmitool(driver_info, command):
                 time.time() - LAST_CMD_TIME.get(driver_info['address'], 0))
         if time_till_next_poll > 0:
             time.sleep(time_till_next_poll)
+        if timeout:
+            # The process would otherwise keep running after the caller,
+            # interrupted by an eventlet timeout, gave up on it.
+            args = ['timeout', '-s', 'KILL', str(timeout)] + args
         try:
             out, err = utils.execute(*args)
         finally:
@@ -810,7 +819,9 @@ class IPMIManagement(base.ManagementInterface):
         # extended sensor informations
         cmd = "sdr -v"
         try:
-            out, err = _exec_ipmitool(driver_info, cmd)
+            out, err = _exec_ipmitool(
+                driver_info, cmd,
+                timeout=CONF.conductor.send_sensor_data_wait_timeout)
         except (exception.PasswordFileFailedToCreate,
                 processutils.ProcessExecutionError) as e:
             raise exception.FailedToGetSensorData(node=task.node.uuid,
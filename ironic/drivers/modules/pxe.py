@@ -420,6 +420,25 @@ class PXEDeploy(base.DeployInterface):
         iscsi_deploy.destroy_images(node.uuid)
         _destroy_token_file(node)
 
+    def cache_images(self, task):
+        """Fetch the deploy and instance kernels and ramdisks of the node.
+
+        Only the image cache and the TFTP root directory of the node are
+        filled, the node and its PXE configuration are left unchanged.
+
+        :param task: a TaskManager instance containing the node to act on.
+        """
+        node = task.node
+        i_info = node.instance_info
+        if i_info.get('kernel') and i_info.get('ramdisk'):
+            pxe_info = _get_image_info(node, task.context)
+        else:
+            # _get_image_info() would look the instance kernel and ramdisk
+            # up and save them in the node, only fetch the deploy ones.
+            pxe_info = pxe_utils.get_deploy_kr_info(node.uuid,
+                                                    _parse_deploy_info(node))
+        _cache_ramdisk_kernel(task.context, node, pxe_info)
+
     def take_over(self, task):
         dhcp_opts = pxe_utils.dhcp_options_for_instance(task)
         provider = dhcp_factory.DHCPFactory()
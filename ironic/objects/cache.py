@@ -0,0 +1,241 @@
+# coding=utf-8
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""A process-local cache of Node objects and of the Ports of nodes.
+
+The cache is only enabled in the conductor service, see :func:`enable`;
+in other processes all the functions of this module do nothing and
+nothing is ever found in the cache.
+
+Entries are dropped when they expire, when the cache is full and they
+are the least recently used, when the object is saved by this process,
+and when :func:`refresh` finds that the object was created or updated
+in the database since the previous refresh. Rows deleted by another
+process are only dropped when they expire.
+
+Changes are found by their created_at and updated_at timestamps, which
+are set by the clock of the service which made them. To tolerate clock
+skew between hosts and transactions committed out of timestamp order,
+each refresh looks back a margin before the latest change seen so far.
+
+Callers always get a copy of the cached objects, so changing them does
+not change the cache.
+"""
+
+import collections
+import datetime
+import time
+
+from oslo.utils import timeutils
+
+from ironic.common import utils
+from ironic.db import api as db_api
+
+
+class ObjectCache(object):
+    """A size-bounded LRU cache whose entries expire.
+
+    An entry may also be found with any of the aliases it was added with,
+    e.g. a node may be looked up by its id or by its uuid.
+    """
+
+    def __init__(self, size, ttl):
+        """Create a new cache.
+
+        :param size: the maximum number of entries.
+        :param ttl: the number of seconds after which an entry expires.
+        """
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # key -> (expiry time, value, aliases), least recently used first
+        self._entries = collections.OrderedDict()
+        self._aliases = {}
+
+    def get(self, key):
+        """Get the value of an entry, or None if it is not cached."""
+        key = self._aliases.get(key, key)
+        entry = self._entries.pop(key, None)
+        if entry is not None and entry[0] <= time.time():
+            self._drop_aliases(entry)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries[key] = entry
+        self.hits += 1
+        return entry[1]
+
+    def put(self, key, value, aliases=()):
+        """Add or replace an entry, evicting the least recently used ones."""
+        self.invalidate(key)
+        self._entries[key] = (time.time() + self.ttl, value, tuple(aliases))
+        for alias in aliases:
+            self._aliases[alias] = key
+        while len(self._entries) > self.size:
+            self.invalidate(next(iter(self._entries)))
+
+    def invalidate(self, key):
+        """Drop an entry, found by its key or any of its aliases."""
+        key = self._aliases.get(key, key)
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._drop_aliases(entry)
+
+    def invalidate_if(self, predicate):
+        """Drop the entries whose key matches a predicate."""
+        for key in [k for k in self._entries if predicate(k)]:
+            self.invalidate(key)
+
+    def _drop_aliases(self, entry):
+        for alias in entry[2]:
+            self._aliases.pop(alias, None)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+_cache = None
+_high_water_mark = None
+_refresh_margin = datetime.timedelta()
+
+
+def enable(size, ttl, refresh_margin=0):
+    """Enable the cache of this process, dropping any previous one.
+
+    :param size: the maximum number of nodes, and of lists of node ports,
+                 to cache. The cache is disabled if it is not positive.
+    :param ttl: the number of seconds after which an entry expires.
+    :param refresh_margin: the number of seconds before the latest change
+                           seen by the previous refresh from which
+                           :func:`refresh` looks for changes.
+    """
+    global _cache, _high_water_mark, _refresh_margin
+    _cache = ObjectCache(size, ttl) if size > 0 else None
+    _high_water_mark = timeutils.utcnow()
+    _refresh_margin = datetime.timedelta(seconds=refresh_margin)
+
+
+def disable():
+    """Disable the cache of this process."""
+    global _cache
+    _cache = None
+
+
+def get_cache():
+    """Get the cache of this process, or None if it is disabled."""
+    return _cache
+
+
+def _node_key(node_id):
+    if utils.is_int_like(node_id):
+        return ('node', int(node_id))
+    return ('node', node_id)
+
+
+def _copy(obj, context):
+    obj = obj.obj_clone()
+    obj._context = context
+    return obj
+
+
+def get_node(context, node_id):
+    """Get a copy of a cached node.
+
+    :param context: the security context of the copy.
+    :param node_id: the id or uuid of the node.
+    :returns: a :class:`ironic.objects.node.Node` object, or None if the
+              node is not cached.
+    """
+    if _cache is None:
+        return None
+    node = _cache.get(_node_key(node_id))
+    return _copy(node, context) if node is not None else None
+
+
+def add_node(node):
+    """Add a node, as read from the database, to the cache."""
+    if _cache is not None:
+        _cache.put(_node_key(node.id), _copy(node, None),
+                   aliases=[_node_key(node.uuid)])
+
+
+def invalidate_node(node_id):
+    """Drop a node from the cache.
+
+    :param node_id: the id or uuid of the node.
+    """
+    if _cache is not None:
+        _cache.invalidate(_node_key(node_id))
+
+
+def get_ports(context, node_id):
+    """Get copies of the cached ports of a node.
+
+    :param context: the security context of the copies.
+    :param node_id: the id of the node.
+    :returns: a list of :class:`ironic.objects.port.Port` objects, or None
+              if the ports of the node are not cached.
+    """
+    if _cache is None:
+        return None
+    ports = _cache.get(('ports', node_id))
+    if ports is None:
+        return None
+    return [_copy(port, context) for port in ports]
+
+
+def add_ports(node_id, ports):
+    """Add the ports of a node, as read from the database, to the cache."""
+    if _cache is not None:
+        _cache.put(('ports', node_id), [_copy(port, None) for port in ports])
+
+
+def invalidate_ports(node_id=None):
+    """Drop the ports of a node from the cache.
+
+    :param node_id: the id of the node, or None to drop the ports of all
+                    the nodes.
+    """
+    if _cache is None:
+        return
+    if node_id is None:
+        _cache.invalidate_if(lambda key: key[0] == 'ports')
+    else:
+        _cache.invalidate(('ports', node_id))
+
+
+def refresh():
+    """Drop the objects changed in the database since the last refresh.
+
+    Only the ids and timestamps of the nodes and ports created or updated
+    since the latest change seen by the previous refresh, minus the refresh
+    margin, are read. The latest change is capped by the current time of
+    this host, so that a change timestamped in the future by a host whose
+    clock is ahead does not hide the changes made before it.
+    """
+    global _high_water_mark
+    if _cache is None:
+        return
+    dbapi = db_api.get_instance()
+    mark = _high_water_mark
+    since = mark - _refresh_margin
+    for node_id, changed_at in dbapi.get_nodes_changed_since(since):
+        _cache.invalidate(_node_key(node_id))
+        mark = max(mark, changed_at)
+    for node_id, changed_at in dbapi.get_ports_changed_since(since):
+        _cache.invalidate(('ports', node_id))
+        mark = max(mark, changed_at)
+    _high_water_mark = min(mark, timeutils.utcnow())
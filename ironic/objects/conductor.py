@@ -21,6 +21,9 @@ from ironic.objects import utils
 
 
 class Conductor(base.IronicObject):
+    # Version 1.0: Initial version
+    # Version 1.1: Add weight field
+    VERSION = '1.1'
 
     dbapi = db_api.get_instance()
 
@@ -28,6 +31,7 @@ class Conductor(base.IronicObject):
             'id': int,
             'drivers': utils.list_or_none,
             'hostname': str,
+            'weight': float,
             }
 
     @staticmethod
@@ -17,6 +17,7 @@ from ironic.common import exception
 from ironic.common import utils
 from ironic.db import api as db_api
 from ironic.objects import base
+from ironic.objects import cache
 from ironic.objects import utils as obj_utils
 
 
@@ -31,7 +32,9 @@ class Node(base.IronicObject):
     # Version 1.6: Add reserve() and release()
     # Version 1.7: Add conductor_affinity
     # Version 1.8: Add maintenance_reason
-    VERSION = '1.8'
+    # Version 1.9: Add filters to reserve()
+    # Version 1.10: Add create_list()
+    VERSION = '1.10'
 
     dbapi = db_api.get_instance()
 
@@ -151,7 +154,7 @@ class Node(base.IronicObject):
         return [Node._from_db_object(cls(context), obj) for obj in db_nodes]
 
     @base.remotable_classmethod
-    def reserve(cls, context, tag, node_id):
+    def reserve(cls, context, tag, node_id, filters=None):
         """Get and reserve a node.
 
         To prevent other ManagerServices from manipulating the given
@@ -160,11 +163,16 @@ class Node(base.IronicObject):
         :param context: Security context.
         :param tag: A string uniquely identifying the reservation holder.
         :param node_id: A node id or uuid.
+        :param filters: Filters the node must match to be reserved, as
+                        accepted by dbapi.get_nodeinfo_list().
         :raises: NodeNotFound if the node is not found.
+        :raises: NodeConstraintsNotMet if the node does not match the
+                 filters.
         :returns: a :class:`Node` object.
 
         """
-        db_node = cls.dbapi.reserve_node(tag, node_id)
+        db_node = cls.dbapi.reserve_node(tag, node_id, filters=filters)
+        cache.invalidate_node(db_node['id'])
         node = Node._from_db_object(cls(context), db_node)
         return node
 
@@ -179,6 +187,22 @@ class Node(base.IronicObject):
 
         """
         cls.dbapi.release_node(tag, node_id)
+        cache.invalidate_node(node_id)
+
+    @base.remotable_classmethod
+    def create_list(cls, context, nodes):
+        """Create the DB records of several nodes in a single transaction.
+
+        :param context: Security context.
+        :param nodes: a list of :class:`Node` objects to create.
+        :raises: NodeAlreadyExists, InstanceAssociated; no node is created
+                 then.
+        :returns: a list of the created :class:`Node` objects, in the same
+                  order.
+        """
+        db_nodes = cls.dbapi.create_nodes([node.obj_get_changes()
+                                           for node in nodes])
+        return [Node._from_db_object(cls(context), obj) for obj in db_nodes]
 
     @base.remotable
     def create(self, context=None):
@@ -213,6 +237,8 @@ class Node(base.IronicObject):
                         object, e.g.: Node(context)
         """
         self.dbapi.destroy_node(self.uuid)
+        cache.invalidate_node(self.uuid)
+        cache.invalidate_ports(self.id)
         self.obj_reset_changes()
 
     @base.remotable
@@ -233,6 +259,7 @@ class Node(base.IronicObject):
         """
         updates = self.obj_get_changes()
         self.dbapi.update_node(self.uuid, updates)
+        cache.invalidate_node(self.uuid)
         self.obj_reset_changes()
 
     @base.remotable
@@ -17,6 +17,7 @@ from ironic.common import exception
 from ironic.common import utils
 from ironic.db import api as dbapi
 from ironic.objects import base
+from ironic.objects import cache
 from ironic.objects import utils as obj_utils
 
 
@@ -27,7 +28,8 @@ class Port(base.IronicObject):
     # Version 1.2: Add create() and destroy()
     # Version 1.3: Add list()
     # Version 1.4: Add list_by_node_id()
-    VERSION = '1.4'
+    # Version 1.5: Add create_list()
+    VERSION = '1.5'
 
     dbapi = dbapi.get_instance()
 
@@ -143,6 +145,23 @@ class Port(base.IronicObject):
                                                   sort_dir=sort_dir)
         return Port._from_db_object_list(db_ports, cls, context)
 
+    @base.remotable_classmethod
+    def create_list(cls, context, ports):
+        """Create the DB records of several ports in a single transaction.
+
+        :param context: Security context.
+        :param ports: a list of :class:`Port` objects to create.
+        :raises: PortAlreadyExists, MACAlreadyExists; no port is created
+                 then.
+        :returns: a list of the created :class:`Port` objects, in the same
+                  order.
+        """
+        db_ports = cls.dbapi.create_ports([port.obj_get_changes()
+                                           for port in ports])
+        for node_id in set(port['node_id'] for port in db_ports):
+            cache.invalidate_ports(node_id)
+        return Port._from_db_object_list(db_ports, cls, context)
+
     @base.remotable
     def create(self, context=None):
         """Create a Port record in the DB.
@@ -158,6 +177,7 @@ class Port(base.IronicObject):
         values = self.obj_get_changes()
         db_port = self.dbapi.create_port(values)
         self._from_db_object(self, db_port)
+        cache.invalidate_ports(self.node_id)
 
     @base.remotable
     def destroy(self, context=None):
@@ -171,6 +191,7 @@ class Port(base.IronicObject):
                         object, e.g.: Port(context)
         """
         self.dbapi.destroy_port(self.uuid)
+        cache.invalidate_ports(self.node_id)
         self.obj_reset_changes()
 
     @base.remotable
@@ -189,6 +210,9 @@ class Port(base.IronicObject):
         """
         updates = self.obj_get_changes()
         self.dbapi.update_port(self.uuid, updates)
+        # the port may have moved from a node whose id we do not know
+        cache.invalidate_ports(None if 'node_id' in updates
+                               else self.node_id)
 
         self.obj_reset_changes()
 
@@ -24,6 +24,7 @@ from six.moves.urllib import parse as urlparse
 from wsme import types as wtypes
 
 from ironic.api.controllers.v1 import chassis as api_chassis
+from ironic.api.controllers.v1 import utils as api_utils
 from ironic.common import utils
 from ironic.tests.api import base as api_base
 from ironic.tests.api import utils as apiutils
@@ -31,6 +32,12 @@ from ironic.tests import base
 from ironic.tests.objects import utils as obj_utils
 
 
+def _next_marker(data):
+    """Get the marker of the next link of a collection."""
+    query = urlparse.urlparse(data['next']).query
+    return urlparse.parse_qs(query)['marker'][0]
+
+
 class TestChassisObject(base.TestCase):
 
     def test_chassis_init(self):
@@ -102,8 +109,9 @@ class TestListChassis(api_base.FunctionalTest):
         data = self.get_json('/chassis/?limit=3')
         self.assertEqual(3, len(data['chassis']))
 
-        next_marker = data['chassis'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        last = self.dbapi.get_chassis_by_uuid(data['chassis'][-1]['uuid'])
+        self.assertEqual({'id': last.id},
+                         api_utils.decode_marker(_next_marker(data), 'id'))
 
     def test_collection_links_default_limit(self):
         cfg.CONF.set_override('max_limit', 3, 'api')
@@ -113,8 +121,9 @@ class TestListChassis(api_base.FunctionalTest):
         data = self.get_json('/chassis')
         self.assertEqual(3, len(data['chassis']))
 
-        next_marker = data['chassis'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        last = self.dbapi.get_chassis_by_uuid(data['chassis'][-1]['uuid'])
+        self.assertEqual({'id': last.id},
+                         api_utils.decode_marker(_next_marker(data), 'id'))
 
     def test_nodes_subresource_link(self):
         chassis = obj_utils.create_test_chassis(self.context)
@@ -17,15 +17,18 @@ Tests for the API /nodes/ methods.
 
 import datetime
 import json
+import threading
 
 import mock
 from oslo.config import cfg
+from oslo import messaging
 from oslo.utils import timeutils
 from six.moves.urllib import parse as urlparse
 from testtools.matchers import HasLength
 from wsme import types as wtypes
 
 from ironic.api.controllers.v1 import node as api_node
+from ironic.api.controllers.v1 import utils as api_utils
 from ironic.common import boot_devices
 from ironic.common import exception
 from ironic.common import states
@@ -39,6 +42,12 @@ from ironic.tests.db import utils as dbutils
 from ironic.tests.objects import utils as obj_utils
 
 
+def _next_marker(data):
+    """Get the marker of the next link of a collection."""
+    query = urlparse.urlparse(data['next']).query
+    return urlparse.parse_qs(query)['marker'][0]
+
+
 # NOTE(lucasagomes): When creating a node via API (POST)
 #                    we have to use chassis_uuid
 def post_get_test_node(**kw):
@@ -113,6 +122,32 @@ class TestListNodes(api_base.FunctionalTest):
         # never expose the chassis_id
         self.assertNotIn('chassis_id', data['nodes'][0])
 
+    @mock.patch.object(objects.Node, 'list')
+    def test_one_reads_listed_columns_only(self, mock_list):
+        instance_uuid = utils.generate_uuid()
+        node = obj_utils.create_test_node(self.context,
+                                          instance_uuid=instance_uuid,
+                                          chassis_id=self.chassis.id)
+        with mock.patch.object(objects.Chassis, 'get') as mock_get_chassis:
+            data = self.get_json('/nodes')
+            self.assertFalse(mock_get_chassis.called)
+        self.assertFalse(mock_list.called)
+        self.assertEqual({'uuid': node.uuid,
+                          'instance_uuid': instance_uuid,
+                          'maintenance': False,
+                          'power_state': node.power_state,
+                          'provision_state': node.provision_state},
+                         dict((k, v) for k, v in data['nodes'][0].items()
+                              if k != 'links'))
+
+    @mock.patch.object(objects.Node, 'list')
+    def test_detail_reads_full_nodes(self, mock_list):
+        node = obj_utils.create_test_node(self.context)
+        mock_list.return_value = [node]
+        data = self.get_json('/nodes/detail')
+        self.assertTrue(mock_list.called)
+        self.assertEqual(node.uuid, data['nodes'][0]['uuid'])
+
     def test_get_one(self):
         node = obj_utils.create_test_node(self.context)
         data = self.get_json('/nodes/%s' % node['uuid'])
@@ -183,8 +218,9 @@ class TestListNodes(api_base.FunctionalTest):
         data = self.get_json('/nodes/?limit=3')
         self.assertEqual(3, len(data['nodes']))
 
-        next_marker = data['nodes'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        last = self.dbapi.get_node_by_uuid(data['nodes'][-1]['uuid'])
+        self.assertEqual({'id': last.id},
+                         api_utils.decode_marker(_next_marker(data), 'id'))
 
     def test_collection_links_default_limit(self):
         cfg.CONF.set_override('max_limit', 3, 'api')
@@ -196,8 +232,68 @@ class TestListNodes(api_base.FunctionalTest):
         data = self.get_json('/nodes')
         self.assertEqual(3, len(data['nodes']))
 
-        next_marker = data['nodes'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        last = self.dbapi.get_node_by_uuid(data['nodes'][-1]['uuid'])
+        self.assertEqual({'id': last.id},
+                         api_utils.decode_marker(_next_marker(data), 'id'))
+
+    def test_collection_pages(self):
+        uuids = [obj_utils.create_test_node(self.context, id=id_,
+                                            uuid=utils.generate_uuid()).uuid
+                 for id_ in range(5)]
+        found = []
+        data = self.get_json('/nodes?limit=2')
+        while 'next' in data:
+            found.extend(n['uuid'] for n in data['nodes'])
+            data = self.get_json('/nodes?limit=2&marker=%s'
+                                 % _next_marker(data))
+        found.extend(n['uuid'] for n in data['nodes'])
+        self.assertEqual(uuids, found)
+
+    def test_collection_pages_sort_key_with_nulls(self):
+        uuids = []
+        for id_ in range(6):
+            instance_uuid = utils.generate_uuid() if id_ % 2 else None
+            node = obj_utils.create_test_node(self.context, id=id_,
+                                              uuid=utils.generate_uuid(),
+                                              instance_uuid=instance_uuid)
+            uuids.append(node.uuid)
+        for sort_dir in ('asc', 'desc'):
+            expected = [n['uuid'] for n in self.get_json(
+                '/nodes?sort_key=instance_uuid&sort_dir=%s' % sort_dir)[
+                    'nodes']]
+            self.assertEqual(sorted(uuids), sorted(expected))
+            found = []
+            url = '/nodes?sort_key=instance_uuid&sort_dir=%s&limit=2' % (
+                sort_dir)
+            data = self.get_json(url)
+            while 'next' in data:
+                found.extend(n['uuid'] for n in data['nodes'])
+                data = self.get_json('%s&marker=%s' % (url,
+                                                       _next_marker(data)))
+            found.extend(n['uuid'] for n in data['nodes'])
+            self.assertEqual(expected, found)
+
+    def test_collection_uuid_marker(self):
+        uuids = [obj_utils.create_test_node(self.context, id=id_,
+                                            uuid=utils.generate_uuid()).uuid
+                 for id_ in range(3)]
+        data = self.get_json('/nodes?marker=%s' % uuids[0])
+        self.assertEqual(uuids[1:], [n['uuid'] for n in data['nodes']])
+
+    def test_collection_invalid_marker(self):
+        response = self.get_json('/nodes?marker=foo', expect_errors=True)
+        self.assertEqual(400, response.status_int)
+        self.assertEqual('application/json', response.content_type)
+        self.assertTrue(response.json['error_message'])
+
+    def test_collection_marker_other_sort_key(self):
+        for id_ in range(3):
+            obj_utils.create_test_node(self.context, id=id_,
+                                       uuid=utils.generate_uuid())
+        data = self.get_json('/nodes?limit=2')
+        response = self.get_json('/nodes?sort_key=uuid&marker=%s'
+                                 % _next_marker(data), expect_errors=True)
+        self.assertEqual(400, response.status_int)
 
     def test_ports_subresource_link(self):
         node = obj_utils.create_test_node(self.context)
@@ -1011,6 +1107,82 @@ class TestPost(api_base.FunctionalTest):
         # Assert RPC method wasn't called this time
         self.assertFalse(get_methods_mock.called)
 
+    @mock.patch.object(rpcapi.ConductorAPI, 'get_topics_for')
+    def test_bulk_create_nodes(self, mock_gtf):
+        mock_gtf.side_effect = lambda nodes: {'test-topic': nodes}
+        ndicts = [post_get_test_node(uuid=utils.generate_uuid())
+                  for i in range(3)]
+        del ndicts[2]['uuid']
+        response = self.post_json('/nodes/bulk', ndicts)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(3, len(response.json))
+        self.assertEqual([None] * 3, list(response.json.values()))
+        for node_uuid in response.json:
+            result = self.get_json('/nodes/%s' % node_uuid)
+            self.assertEqual(self.chassis.uuid, result['chassis_uuid'])
+        self.assertEqual(1, mock_gtf.call_count)
+        self.assertFalse(self.mock_gtf.called)
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'get_topics_for')
+    def test_bulk_create_nodes_errors(self, mock_gtf):
+        mock_gtf.side_effect = lambda nodes: {
+                'test-topic': [n for n in nodes if n.driver == 'fake'],
+                None: [n for n in nodes if n.driver == 'unknown']}
+        existing = obj_utils.create_test_node(
+                self.context, instance_uuid=utils.generate_uuid())
+        valid = post_get_test_node(uuid=utils.generate_uuid())
+        duplicate = post_get_test_node(uuid=existing.uuid)
+        associated = post_get_test_node(uuid=utils.generate_uuid(),
+                                        instance_uuid=existing.instance_uuid)
+        no_chassis = post_get_test_node(uuid=utils.generate_uuid(),
+                                        chassis_uuid=utils.generate_uuid())
+        no_driver = post_get_test_node(uuid=utils.generate_uuid(),
+                                       driver='unknown')
+
+        response = self.post_json('/nodes/bulk',
+                                  [valid, duplicate, associated, no_chassis,
+                                   no_driver])
+
+        self.assertEqual(200, response.status_int)
+        self.assertIsNone(response.json[valid['uuid']])
+        self.assertIn('already exists', response.json[duplicate['uuid']])
+        self.assertIn('already associated',
+                      response.json[associated['uuid']])
+        self.assertIn('could not be found', response.json[no_chassis['uuid']])
+        self.assertIn('No conductor service',
+                      response.json[no_driver['uuid']])
+        self.get_json('/nodes/%s' % valid['uuid'])
+        for ndict in (associated, no_chassis, no_driver):
+            response = self.get_json('/nodes/%s' % ndict['uuid'],
+                                     expect_errors=True)
+            self.assertEqual(404, response.status_int)
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'get_topics_for')
+    def test_bulk_create_nodes_duplicates_in_request(self, mock_gtf):
+        mock_gtf.side_effect = lambda nodes: {'test-topic': nodes}
+        instance_uuid = utils.generate_uuid()
+        first = post_get_test_node(uuid=utils.generate_uuid(),
+                                   instance_uuid=instance_uuid)
+        second = post_get_test_node(uuid=utils.generate_uuid(),
+                                    instance_uuid=instance_uuid)
+        response = self.post_json('/nodes/bulk', [first, second, first])
+        self.assertIn('already exists', response.json[first['uuid']])
+        self.assertIn('already associated', response.json[second['uuid']])
+        self.assertEqual([], self.get_json('/nodes')['nodes'])
+
+    def test_bulk_create_too_many_nodes(self):
+        cfg.CONF.set_override('max_limit', 1, 'api')
+        response = self.post_json('/nodes/bulk',
+                                  [post_get_test_node(),
+                                   post_get_test_node(
+                                       uuid=utils.generate_uuid())],
+                                  expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
+    def test_bulk_create_no_nodes(self):
+        response = self.post_json('/nodes/bulk', [], expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
 
 class TestDelete(api_base.FunctionalTest):
 
@@ -1113,6 +1285,163 @@ class TestPut(api_base.FunctionalTest):
                             {'target': 'not-supported'}, expect_errors=True)
         self.assertEqual(400, ret.status_code)
 
+    @mock.patch.object(rpcapi.ConductorAPI, 'change_nodes_power_state')
+    @mock.patch.object(rpcapi.ConductorAPI, 'get_topics_for')
+    def test_bulk_power_state(self, mock_gtf, mock_cnps):
+        node2 = obj_utils.create_test_node(self.context, id=2,
+                                           uuid=utils.generate_uuid())
+        node3 = obj_utils.create_test_node(self.context, id=3,
+                                           uuid=utils.generate_uuid(),
+                                           driver='unknown')
+        unknown_uuid = utils.generate_uuid()
+        mock_gtf.side_effect = lambda nodes: {
+                'test-topic': [n for n in nodes if n.driver == 'fake'],
+                None: [n for n in nodes if n.driver == 'unknown']}
+        mock_cnps.return_value = {self.node.uuid: None,
+                                  node2.uuid: 'Node is locked'}
+
+        response = self.put_json('/nodes/power',
+                                 {'node_uuids': [self.node.uuid, node2.uuid,
+                                                 node3.uuid, unknown_uuid,
+                                                 self.node.uuid],
+                                  'target': states.REBOOT})
+
+        self.assertEqual(202, response.status_code)
+        mock_cnps.assert_called_once_with(mock.ANY, mock.ANY, states.REBOOT,
+                                          'test-topic')
+        self.assertEqual(set([self.node.uuid, node2.uuid]),
+                         set(mock_cnps.call_args[0][1]))
+        self.assertIsNone(response.json[self.node.uuid])
+        self.assertEqual('Node is locked', response.json[node2.uuid])
+        self.assertIn('No conductor service', response.json[node3.uuid])
+        self.assertIn('could not be found', response.json[unknown_uuid])
+        self.assertFalse(self.mock_cnps.called)
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'change_nodes_power_state')
+    @mock.patch.object(rpcapi.ConductorAPI, 'get_topics_for')
+    def test_bulk_power_state_rpc_error(self, mock_gtf, mock_cnps):
+        mock_gtf.side_effect = lambda nodes: {'test-topic': nodes}
+        mock_cnps.side_effect = exception.NoFreeConductorWorker()
+
+        response = self.put_json('/nodes/power',
+                                 {'node_uuids': [self.node.uuid],
+                                  'target': states.POWER_OFF})
+
+        self.assertEqual(202, response.status_code)
+        self.assertIn('free conductor workers', response.json[self.node.uuid])
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'change_nodes_power_state')
+    @mock.patch.object(rpcapi.ConductorAPI, 'get_topics_for')
+    def test_bulk_power_state_conductors_called_in_parallel(self, mock_gtf,
+                                                             mock_cnps):
+        node2 = obj_utils.create_test_node(self.context, id=2,
+                                           uuid=utils.generate_uuid())
+        mock_gtf.side_effect = lambda nodes: dict(
+                ('topic-%d' % n.id, [n]) for n in nodes)
+        called = []
+        all_called = threading.Event()
+
+        def change_nodes_power_state(context, node_uuids, target, topic):
+            called.append(topic)
+            if len(called) == 2:
+                all_called.set()
+            # only returns once both conductors were called
+            all_called.wait(5)
+            if not all_called.is_set():
+                return dict((uuid, 'called sequentially')
+                            for uuid in node_uuids)
+            if topic == 'topic-2':
+                raise messaging.MessagingTimeout('timed out')
+            return dict((uuid, None) for uuid in node_uuids)
+
+        mock_cnps.side_effect = change_nodes_power_state
+
+        response = self.put_json('/nodes/power',
+                                 {'node_uuids': [self.node.uuid, node2.uuid],
+                                  'target': states.POWER_ON})
+
+        self.assertEqual(202, response.status_code)
+        self.assertEqual(set(['topic-1', 'topic-2']), set(called))
+        self.assertIsNone(response.json[self.node.uuid])
+        self.assertEqual('timed out', response.json[node2.uuid])
+
+    def test_bulk_power_invalid_state_request(self):
+        ret = self.put_json('/nodes/power',
+                            {'node_uuids': [self.node.uuid],
+                             'target': 'not-supported'}, expect_errors=True)
+        self.assertEqual(400, ret.status_code)
+
+    def test_bulk_power_too_many_nodes(self):
+        cfg.CONF.set_override('max_limit', 1, 'api')
+        ret = self.put_json('/nodes/power',
+                            {'node_uuids': [self.node.uuid,
+                                            utils.generate_uuid()],
+                             'target': states.POWER_ON}, expect_errors=True)
+        self.assertEqual(400, ret.status_code)
+
+    def test_bulk_power_no_nodes(self):
+        ret = self.put_json('/nodes/power',
+                            {'node_uuids': [], 'target': states.POWER_ON},
+                            expect_errors=True)
+        self.assertEqual(400, ret.status_code)
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'do_nodes_deploy')
+    @mock.patch.object(rpcapi.ConductorAPI, 'get_topics_for')
+    def test_bulk_provision_with_deploy(self, mock_gtf, mock_dnd):
+        node2 = obj_utils.create_test_node(self.context, id=2,
+                                           uuid=utils.generate_uuid())
+        mock_gtf.side_effect = lambda nodes: {'test-topic': nodes}
+        mock_dnd.return_value = {self.node.uuid: None,
+                                 node2.uuid: 'Node is locked'}
+
+        response = self.put_json('/nodes/provision',
+                                 {'node_uuids': [self.node.uuid, node2.uuid],
+                                  'target': states.ACTIVE})
+
+        self.assertEqual(202, response.status_code)
+        mock_dnd.assert_called_once_with(mock.ANY, mock.ANY, False,
+                                         'test-topic')
+        self.assertEqual(set([self.node.uuid, node2.uuid]),
+                         set(mock_dnd.call_args[0][1]))
+        self.assertEqual({self.node.uuid: None, node2.uuid: 'Node is locked'},
+                         response.json)
+        self.assertFalse(self.mock_dnd.called)
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'do_nodes_deploy')
+    @mock.patch.object(rpcapi.ConductorAPI, 'get_topics_for')
+    def test_bulk_provision_with_rebuild(self, mock_gtf, mock_dnd):
+        mock_gtf.side_effect = lambda nodes: {'test-topic': nodes}
+        mock_dnd.return_value = {self.node.uuid: None}
+
+        response = self.put_json('/nodes/provision',
+                                 {'node_uuids': [self.node.uuid],
+                                  'target': states.REBUILD})
+
+        self.assertEqual(202, response.status_code)
+        mock_dnd.assert_called_once_with(mock.ANY, [self.node.uuid], True,
+                                         'test-topic')
+
+    @mock.patch.object(rpcapi.ConductorAPI, 'do_nodes_tear_down')
+    @mock.patch.object(rpcapi.ConductorAPI, 'get_topics_for')
+    def test_bulk_provision_with_tear_down(self, mock_gtf, mock_dntd):
+        mock_gtf.side_effect = lambda nodes: {'test-topic': nodes}
+        mock_dntd.return_value = {self.node.uuid: None}
+
+        response = self.put_json('/nodes/provision',
+                                 {'node_uuids': [self.node.uuid],
+                                  'target': states.DELETED})
+
+        self.assertEqual(202, response.status_code)
+        self.assertEqual({self.node.uuid: None}, response.json)
+        mock_dntd.assert_called_once_with(mock.ANY, [self.node.uuid],
+                                          'test-topic')
+
+    def test_bulk_provision_invalid_state_request(self):
+        ret = self.put_json('/nodes/provision',
+                            {'node_uuids': [self.node.uuid],
+                             'target': 'not-supported'}, expect_errors=True)
+        self.assertEqual(400, ret.status_code)
+
     def test_provision_with_deploy(self):
         ret = self.put_json('/nodes/%s/states/provision' % self.node.uuid,
                             {'target': states.ACTIVE})
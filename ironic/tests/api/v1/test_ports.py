@@ -25,9 +25,11 @@ from testtools.matchers import HasLength
 from wsme import types as wtypes
 
 from ironic.api.controllers.v1 import port as api_port
+from ironic.api.controllers.v1 import utils as api_utils
 from ironic.common import exception
 from ironic.common import utils
 from ironic.conductor import rpcapi
+from ironic.db.sqlalchemy import api as sqla_api
 from ironic.tests.api import base as api_base
 from ironic.tests.api import utils as apiutils
 from ironic.tests import base
@@ -35,6 +37,12 @@ from ironic.tests.db import utils as dbutils
 from ironic.tests.objects import utils as obj_utils
 
 
+def _next_marker(data):
+    """Get the marker of the next link of a collection."""
+    query = urlparse.urlparse(data['next']).query
+    return urlparse.parse_qs(query)['marker'][0]
+
+
 # NOTE(lucasagomes): When creating a port via API (POST)
 #                    we have to use node_uuid
 def post_get_test_port(**kw):
@@ -135,8 +143,9 @@ class TestListPorts(api_base.FunctionalTest):
         data = self.get_json('/ports/?limit=3')
         self.assertEqual(3, len(data['ports']))
 
-        next_marker = data['ports'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        last = self.dbapi.get_port_by_uuid(data['ports'][-1]['uuid'])
+        self.assertEqual({'id': last.id},
+                         api_utils.decode_marker(_next_marker(data), 'id'))
 
     def test_collection_links_default_limit(self):
         cfg.CONF.set_override('max_limit', 3, 'api')
@@ -150,8 +159,9 @@ class TestListPorts(api_base.FunctionalTest):
         data = self.get_json('/ports')
         self.assertEqual(3, len(data['ports']))
 
-        next_marker = data['ports'][-1]['uuid']
-        self.assertIn(next_marker, data['next'])
+        last = self.dbapi.get_port_by_uuid(data['ports'][-1]['uuid'])
+        self.assertEqual({'id': last.id},
+                         api_utils.decode_marker(_next_marker(data), 'id'))
 
     def test_port_by_address(self):
         address_template = "aa:bb:cc:dd:ee:f%d"
@@ -609,6 +619,74 @@ class TestPost(api_base.FunctionalTest):
         self.assertTrue(error_msg)
         self.assertIn(address, error_msg.upper())
 
+    def test_bulk_create_ports(self):
+        pdicts = [post_get_test_port(uuid=utils.generate_uuid(),
+                                     address='52:54:00:cf:2d:3%s' % i)
+                  for i in range(3)]
+        del pdicts[2]['uuid']
+        response = self.post_json('/ports/bulk', pdicts)
+        self.assertEqual(200, response.status_int)
+        self.assertEqual(3, len(response.json))
+        self.assertEqual([None] * 3, list(response.json.values()))
+        for port_uuid in response.json:
+            result = self.get_json('/ports/%s' % port_uuid)
+            self.assertEqual(self.node.uuid, result['node_uuid'])
+
+    def test_bulk_create_ports_errors(self):
+        existing = obj_utils.create_test_port(self.context,
+                                              node_id=self.node.id)
+        valid = post_get_test_port(uuid=utils.generate_uuid(),
+                                   address='52:54:00:cf:2d:30')
+        duplicate = post_get_test_port(uuid=existing.uuid,
+                                       address='52:54:00:cf:2d:31')
+        same_mac = post_get_test_port(uuid=utils.generate_uuid(),
+                                      address=existing.address.upper())
+        no_node = post_get_test_port(uuid=utils.generate_uuid(),
+                                     address='52:54:00:cf:2d:32',
+                                     node_uuid=utils.generate_uuid())
+
+        response = self.post_json('/ports/bulk',
+                                  [valid, duplicate, same_mac, no_node])
+
+        self.assertEqual(200, response.status_int)
+        self.assertIsNone(response.json[valid['uuid']])
+        self.assertIn('already exists', response.json[duplicate['uuid']])
+        self.assertIn(existing.address, response.json[same_mac['uuid']])
+        self.assertIn('could not be found', response.json[no_node['uuid']])
+        self.get_json('/ports/%s' % valid['uuid'])
+        for pdict in (same_mac, no_node):
+            response = self.get_json('/ports/%s' % pdict['uuid'],
+                                     expect_errors=True)
+            self.assertEqual(404, response.status_int)
+
+    def test_bulk_create_ports_duplicates_in_request(self):
+        first = post_get_test_port(uuid=utils.generate_uuid(),
+                                   address='52:54:00:cf:2d:30')
+        second = post_get_test_port(uuid=utils.generate_uuid(),
+                                    address='52:54:00:cf:2d:30')
+        response = self.post_json('/ports/bulk', [first, second, first])
+        self.assertIn('already exists', response.json[first['uuid']])
+        self.assertIn('52:54:00:cf:2d:30', response.json[second['uuid']])
+        self.assertEqual([], self.get_json('/ports')['ports'])
+
+    @mock.patch.object(sqla_api, 'get_session', wraps=sqla_api.get_session)
+    def test_bulk_create_ports_reads_master(self, mock_get_session):
+        # as if the latest write was long ago
+        sqla_api._last_write = 0
+        self.post_json('/ports/bulk', [post_get_test_port()])
+        self.assertNotIn(mock.call(use_slave=True),
+                         mock_get_session.call_args_list)
+
+    def test_bulk_create_too_many_ports(self):
+        cfg.CONF.set_override('max_limit', 1, 'api')
+        response = self.post_json('/ports/bulk',
+                                  [post_get_test_port(),
+                                   post_get_test_port(
+                                       uuid=utils.generate_uuid(),
+                                       address='52:54:00:cf:2d:30')],
+                                  expect_errors=True)
+        self.assertEqual(400, response.status_int)
+
 
 class TestDelete(api_base.FunctionalTest):
 
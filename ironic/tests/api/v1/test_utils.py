@@ -13,9 +13,12 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import datetime
+
 import wsme
 
 from ironic.api.controllers.v1 import utils
+from ironic.common import exception
 from ironic.tests import base
 
 from oslo.config import cfg
@@ -47,3 +50,36 @@ class TestApiUtils(base.TestCase):
         self.assertRaises(wsme.exc.ClientSideError,
                           utils.validate_sort_dir,
                           'fake-sort')
+
+    def test_encode_decode_marker(self):
+        obj = {'id': 42, 'uuid': 'fake-uuid'}
+        marker = utils.encode_marker(obj, None)
+        self.assertNotIn('=', marker)
+        self.assertEqual({'id': 42}, utils.decode_marker(marker, None))
+        self.assertEqual({'id': 42}, utils.decode_marker(marker, 'id'))
+
+    def test_encode_decode_marker_sort_key(self):
+        created_at = datetime.datetime(2014, 6, 1, 12, 30, 5, 123)
+        for value in ('foo', 3, None, created_at):
+            obj = {'id': 42, 'key': value}
+            marker = utils.encode_marker(obj, 'key')
+            self.assertEqual({'key': value, 'id': 42},
+                             utils.decode_marker(marker, 'key'))
+
+    def test_decode_marker_invalid(self):
+        for marker in ('foo', 'Zm9v', utils.encode_marker({'id': 'x'}, None)):
+            self.assertRaises(wsme.exc.ClientSideError,
+                              utils.decode_marker, marker, None)
+
+    def test_decode_marker_other_sort_key(self):
+        marker = utils.encode_marker({'id': 42, 'key': 'foo'}, 'key')
+        self.assertRaises(wsme.exc.ClientSideError,
+                          utils.decode_marker, marker, 'id')
+
+    def test_bulk_fail(self):
+        results = {'a': None, 'b': None}
+        utils.bulk_fail(results, 'a', exception.NodeNotFound(node='x'))
+        utils.bulk_fail(results, 'a', exception.NodeLocked(node='x',
+                                                           host='y'))
+        self.assertIn('could not be found', results['a'])
+        self.assertIsNone(results['b'])
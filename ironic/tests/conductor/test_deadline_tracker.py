@@ -0,0 +1,72 @@
+# coding=utf-8
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the node deadline tracker."""
+
+from ironic.conductor import deadline_tracker
+from ironic.tests import base
+
+
+class DeadlineTrackerTestCase(base.TestCase):
+
+    def setUp(self):
+        super(DeadlineTrackerTestCase, self).setUp()
+        self.tracker = deadline_tracker.DeadlineTracker()
+
+    def test_empty(self):
+        self.assertIsNone(self.tracker.next_deadline())
+        self.assertEqual([], self.tracker.pop_expired(100))
+
+    def test_pop_expired(self):
+        self.tracker.add('a', 20)
+        self.tracker.add('b', 10)
+        self.tracker.add('c', 30)
+        self.assertEqual(10, self.tracker.next_deadline())
+        self.assertEqual([], self.tracker.pop_expired(5))
+        self.assertEqual(['b', 'a'], self.tracker.pop_expired(20))
+        self.assertEqual(30, self.tracker.next_deadline())
+        self.assertEqual(1, len(self.tracker))
+
+    def test_pop_expired_limit(self):
+        for i, node in enumerate('abc'):
+            self.tracker.add(node, i)
+        self.assertEqual(['a', 'b'], self.tracker.pop_expired(10, limit=2))
+        self.assertEqual(['c'], self.tracker.pop_expired(10, limit=2))
+
+    def test_add_replaces(self):
+        self.tracker.add('a', 10)
+        self.tracker.add('a', 30)
+        self.assertEqual(30, self.tracker.next_deadline())
+        self.assertEqual([], self.tracker.pop_expired(20))
+        self.assertEqual(['a'], self.tracker.pop_expired(30))
+
+    def test_add_same_deadline_twice(self):
+        self.tracker.add('a', 10)
+        self.tracker.add('a', 10)
+        self.assertEqual(['a'], self.tracker.pop_expired(10))
+        self.assertIsNone(self.tracker.next_deadline())
+
+    def test_discard(self):
+        self.tracker.add('a', 10)
+        self.tracker.add('b', 20)
+        self.tracker.discard('a')
+        self.tracker.discard('unknown')
+        self.assertNotIn('a', self.tracker)
+        self.assertEqual(20, self.tracker.next_deadline())
+
+    def test_reset(self):
+        self.tracker.add('a', 10)
+        self.tracker.reset([('b', 30), ('c', 20)])
+        self.assertNotIn('a', self.tracker)
+        self.assertEqual(['c', 'b'], self.tracker.pop_expired(30))
@@ -18,26 +18,34 @@
 
 """Test class for Ironic ManagerService."""
 
+import collections
 import datetime
+import time
 
 import eventlet
 import mock
 from oslo.config import cfg
 from oslo.db import exception as db_exception
 from oslo import messaging
+from oslo.utils import timeutils
 
 from ironic.common import boot_devices
 from ironic.common import driver_factory
 from ironic.common import exception
+from ironic.common import hash_ring
 from ironic.common import keystone
 from ironic.common import states
 from ironic.common import utils as ironic_utils
 from ironic.conductor import manager
+from ironic.conductor import poll_scheduler
+from ironic.conductor import sensor_cache
 from ironic.conductor import task_manager
 from ironic.conductor import utils as conductor_utils
+from ironic.conductor import worker_queue
 from ironic.db import api as dbapi
 from ironic.drivers import base as drivers_base
 from ironic import objects
+from ironic.objects import cache as obj_cache
 from ironic.openstack.common import context
 from ironic.tests import base as tests_base
 from ironic.tests.conductor import utils as mgr_utils
@@ -72,6 +80,12 @@ class _CommonMixIn(object):
         task.node = node
         return task
 
+    def _mock_mapped_node_filters(self):
+        mapped_filters = {'hash_key_ranges': {'fake': [(None, None)]}}
+        self.service._mapped_node_filters = mock.Mock(
+                return_value=mapped_filters)
+        return mapped_filters
+
     def _get_nodeinfo_list_response(self, nodes=None):
         if nodes is None:
             nodes = [self.node]
@@ -237,6 +251,32 @@ class StartStopTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
                           self.service.init_host)
         self.assertTrue(log_mock.error.called)
 
+    def test_start_registers_weight(self):
+        self.config(hash_ring_weight=2.5, group='conductor')
+        self._start_service()
+        res = objects.Conductor.get_by_hostname(self.context, self.hostname)
+        self.assertEqual(2.5, res['weight'])
+
+    def test_start_enables_object_cache(self):
+        self.config(object_cache_size=5, group='conductor')
+        self.config(object_cache_refresh_margin=20, group='conductor')
+        self._start_service()
+        self.assertEqual(5, obj_cache.get_cache().size)
+        self.assertEqual(20, obj_cache._refresh_margin.seconds)
+        self.service.del_host()
+        self.assertIsNone(obj_cache.get_cache())
+
+    def test_start_object_cache_disabled(self):
+        self._start_service()
+        self.assertIsNone(obj_cache.get_cache())
+
+    def test_start_fails_on_invalid_weight(self):
+        self.config(hash_ring_weight=0, group='conductor')
+        with mock.patch.object(self.dbapi, 'register_conductor') as mock_reg:
+            self.assertRaises(exception.ConfigInvalid,
+                              self.service.init_host)
+            self.assertFalse(mock_reg.called)
+
     @mock.patch.object(eventlet.greenpool.GreenPool, 'waitall')
     def test_del_host_waits_on_workerpool(self, wait_mock):
         self._start_service()
@@ -269,6 +309,21 @@ class KeepAliveTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
                 self.service._conductor_service_record_keepalive()
             self.assertEqual(3, mock_touch.call_count)
 
+    def test__clear_dead_conductors(self):
+        self._start_service()
+        with mock.patch.object(
+                self.dbapi,
+                'clear_node_reservations_for_dead_conductors') as mock_clear:
+            self.service._clear_dead_conductors(self.context)
+        mock_clear.assert_called_once_with(
+                self.hostname, CONF.conductor.heartbeat_timeout)
+
+    @mock.patch.object(obj_cache, 'refresh')
+    def test__refresh_object_cache(self, mock_refresh):
+        self._start_service()
+        self.service._refresh_object_cache(self.context)
+        mock_refresh.assert_called_once_with()
+
 
 @_mock_record_keepalive
 class ChangeNodePowerStateTestCase(_ServiceSetUpMixin,
@@ -420,6 +475,74 @@ class ChangeNodePowerStateTestCase(_ServiceSetUpMixin,
             self.assertIsNone(node.target_power_state)
             self.assertIsNone(node.last_error)
 
+    def test_change_nodes_power_state(self):
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          power_state=states.POWER_OFF)
+        locked = obj_utils.create_test_node(self.context, driver='fake',
+                                            id=2,
+                                            uuid=ironic_utils.generate_uuid(),
+                                            power_state=states.POWER_OFF,
+                                            reservation='fake-reserv')
+        self._start_service()
+
+        with mock.patch.object(self.driver.power,
+                               'get_power_state') as get_power_mock:
+            get_power_mock.return_value = states.POWER_OFF
+
+            result = self.service.change_nodes_power_state(
+                    self.context, [node.uuid, locked.uuid], states.POWER_ON)
+            self.service._worker_pool.waitall()
+
+        self.assertEqual(set([node.uuid, locked.uuid]), set(result))
+        self.assertIsNone(result[node.uuid])
+        self.assertIn('fake-reserv', result[locked.uuid])
+        node.refresh()
+        self.assertEqual(states.POWER_ON, node.power_state)
+        locked.refresh()
+        self.assertEqual(states.POWER_OFF, locked.power_state)
+        self.assertEqual('fake-reserv', locked.reservation)
+
+    @mock.patch.object(manager.ConductorManager, '_change_node_power_state')
+    def test_change_nodes_power_state_unexpected_error(self, change_mock):
+        change_mock.side_effect = [None, ValueError('boom')]
+        self._start_service()
+
+        result = self.service.change_nodes_power_state(
+                self.context, ['node-1', 'node-2'], states.POWER_OFF)
+
+        self.assertEqual({'node-1': None, 'node-2': 'boom'}, result)
+        change_mock.assert_has_calls(
+                [mock.call(self.context, 'node-1', states.POWER_OFF),
+                 mock.call(self.context, 'node-2', states.POWER_OFF)])
+
+    @mock.patch.object(manager.LOG, 'warning')
+    @mock.patch.object(manager.ConductorManager, '_change_node_power_state')
+    def test_change_nodes_power_state_reply_timeout(self, change_mock,
+                                                    log_mock):
+        self.config(bulk_action_reply_timeout=1, group='conductor')
+        done = []
+
+        def change(context, node_id, new_state):
+            if node_id == 'node-2':
+                # still running when the reply is sent
+                eventlet.sleep(2)
+                done.append(node_id)
+                raise exception.NodeLocked(node=node_id, host='fake')
+            done.append(node_id)
+
+        change_mock.side_effect = change
+        self._start_service()
+
+        result = self.service.change_nodes_power_state(
+                self.context, ['node-1', 'node-2'], states.POWER_OFF)
+
+        self.assertEqual({'node-1': None, 'node-2': None}, result)
+        self.assertEqual(['node-1'], done)
+        eventlet.sleep(2)
+        # handled after the reply, the error is logged
+        self.assertEqual(['node-1', 'node-2'], done)
+        self.assertTrue(log_mock.called)
+
 
 @_mock_record_keepalive
 class UpdateNodeTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
@@ -1022,7 +1145,8 @@ class DoNodeDeployTearDownTestCase(_ServiceSetUpMixin,
             self.assertIsNone(node.last_error)
             # Verify reservation has been cleared.
             self.assertIsNone(node.reservation)
-            mock_spawn.assert_called_once_with(mock.ANY, mock.ANY, mock.ANY)
+            mock_spawn.assert_called_once_with(self.service._do_node_deploy,
+                                               mock.ANY)
 
     @mock.patch('ironic.drivers.modules.fake.FakeDeploy.deploy')
     def test_do_node_deploy_rebuild_active_state(self, mock_deploy):
@@ -1143,21 +1267,46 @@ class DoNodeDeployTearDownTestCase(_ServiceSetUpMixin,
         self.assertIsNone(node.reservation)
 
     @mock.patch('ironic.drivers.modules.fake.FakeDeploy.clean_up')
-    def test__check_deploy_timeouts(self, mock_cleanup):
-        self._start_service()
+    @mock.patch.object(eventlet, 'spawn_after')
+    def test__check_deploy_timeouts(self, mock_spawn_after, mock_cleanup):
         CONF.set_override('deploy_callback_timeout', 1, group='conductor')
         node = obj_utils.create_test_node(self.context, driver='fake',
                 provision_state=states.DEPLOYWAIT,
                 target_provision_state=states.ACTIVE,
                 provision_updated_at=datetime.datetime(2000, 1, 1, 0, 0))
+        # the deadlines are loaded at startup
+        self._start_service()
+        mock_spawn_after.assert_called_once_with(
+                0, self.service._deploy_timeout_expired)
 
-        self.service._check_deploy_timeouts(self.context)
+        self.service._deploy_timeout_expired()
         self.service._worker_pool.waitall()
         node.refresh()
         self.assertEqual(states.DEPLOYFAIL, node.provision_state)
         self.assertEqual(states.ACTIVE, node.target_provision_state)
         self.assertIsNotNone(node.last_error)
         mock_cleanup.assert_called_once_with(mock.ANY)
+        self.assertEqual(0, len(self.service._deploy_deadlines))
+
+    @mock.patch.object(eventlet, 'spawn_after')
+    @mock.patch('ironic.drivers.modules.fake.FakeDeploy.deploy')
+    def test__do_node_deploy_tracks_timeout(self, mock_deploy,
+                                            mock_spawn_after):
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self._start_service()
+        mock_deploy.return_value = states.DEPLOYWAIT
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          provision_state=states.DEPLOYING,
+                                          target_provision_state=states.ACTIVE)
+        task = task_manager.TaskManager(self.context, node.uuid)
+
+        self.service._do_node_deploy(task)
+        node.refresh()
+        self.assertEqual(states.DEPLOYWAIT, node.provision_state)
+        self.assertIn(node.uuid, self.service._deploy_deadlines)
+        mock_spawn_after.assert_called_once_with(
+                1800, self.service._deploy_timeout_expired)
 
     def test_do_node_deploy_worker_pool_full(self):
         prv_state = states.NOSTATE
@@ -1313,6 +1462,48 @@ class DoNodeDeployTearDownTestCase(_ServiceSetUpMixin,
         # Verify reservation has been cleared.
         self.assertIsNone(node.reservation)
 
+    @mock.patch('ironic.drivers.modules.fake.FakeDeploy.deploy')
+    def test_do_nodes_deploy(self, mock_deploy):
+        mock_deploy.return_value = states.DEPLOYDONE
+        node = obj_utils.create_test_node(self.context, driver='fake',
+                                          provision_state=states.NOSTATE)
+        active = obj_utils.create_test_node(self.context, driver='fake',
+                                            id=2,
+                                            uuid=ironic_utils.generate_uuid(),
+                                            provision_state=states.ACTIVE)
+        self._start_service()
+
+        result = self.service.do_nodes_deploy(self.context,
+                                              [node.uuid, active.uuid])
+        self.service._worker_pool.waitall()
+
+        self.assertEqual(set([node.uuid, active.uuid]), set(result))
+        self.assertIsNone(result[node.uuid])
+        self.assertIn('not possible in the current state',
+                      result[active.uuid])
+        node.refresh()
+        self.assertEqual(states.ACTIVE, node.provision_state)
+        active.refresh()
+        self.assertEqual(states.ACTIVE, active.provision_state)
+        self.assertIsNone(active.reservation)
+        mock_deploy.assert_called_once_with(mock.ANY)
+
+    @mock.patch.object(manager.ConductorManager, '_tear_down_node')
+    def test_do_nodes_tear_down(self, mock_tear_down):
+        mock_tear_down.side_effect = [
+                None, exception.NodeLocked(node='node-2', host='fake-host')]
+        self._start_service()
+
+        result = self.service.do_nodes_tear_down(self.context,
+                                                 ['node-1', 'node-2'])
+
+        self.assertEqual(['node-1', 'node-2'], sorted(result))
+        self.assertIsNone(result['node-1'])
+        self.assertIn('fake-host', result['node-2'])
+        mock_tear_down.assert_has_calls(
+                [mock.call(self.context, 'node-1'),
+                 mock.call(self.context, 'node-2')])
+
 
 @_mock_record_keepalive
 class MiscTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
@@ -1334,6 +1525,66 @@ class MiscTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
         self.assertFalse(self.service._mapped_to_this_conductor(n['uuid'],
                                                                 'otherdriver'))
 
+    def test__mapped_to_this_conductor_primary_only(self):
+        self._start_service()
+        n = utils.get_test_node()
+        self.service.ring_manager = mock.MagicMock()
+        ring = self.service.ring_manager.__getitem__.return_value
+        ring.get_hosts.return_value = ['other-host', self.hostname]
+        self.assertTrue(self.service._mapped_to_this_conductor(n['uuid'],
+                                                               'fake'))
+        self.assertFalse(self.service._mapped_to_this_conductor(
+                n['uuid'], 'fake', primary_only=True))
+
+        ring.get_hosts.return_value = [self.hostname, 'other-host']
+        self.assertTrue(self.service._mapped_to_this_conductor(
+                n['uuid'], 'fake', primary_only=True))
+
+    def test__mapped_node_filters(self):
+        self._start_service()
+        ring = self.service.ring_manager['fake']
+        filters = self.service._mapped_node_filters()
+        self.assertEqual({'hash_key_ranges': {
+                              'fake': ring.get_key_ranges(self.hostname)}},
+                         filters)
+
+    def test__mapped_node_filters_too_many_ranges(self):
+        self._start_service()
+        with mock.patch.object(manager, 'MAX_HASH_KEY_RANGES', 0):
+            filters = self.service._mapped_node_filters()
+        self.assertEqual({'hash_key_ranges': {'fake': None}}, filters)
+
+    def test__mapped_node_filters_key_ranges_by_driver(self):
+        self._start_service()
+        moved = {'fake': [(None, '8' * 32)], 'otherdriver': [(None, None)]}
+        ring = self.service.ring_manager['fake']
+        filters = self.service._mapped_node_filters(moved)
+        self.assertEqual({'hash_key_ranges': {
+                              'fake': hash_ring.intersect_key_ranges(
+                                  ring.get_key_ranges(self.hostname),
+                                  moved['fake'])}},
+                         filters)
+
+    def test__mapped_node_filters_key_ranges_by_driver_unmoved(self):
+        self._start_service()
+        filters = self.service._mapped_node_filters({})
+        self.assertEqual({'hash_key_ranges': {}}, filters)
+
+    def test__mapped_node_filters_returns_mapped_nodes(self):
+        self._start_service()
+        nodes = [obj_utils.create_test_node(self.context, id=i,
+                                            uuid=ironic_utils.generate_uuid())
+                 for i in range(1, 6)]
+        other = obj_utils.create_test_node(self.context, id=6,
+                                           uuid=ironic_utils.generate_uuid(),
+                                           driver='otherdriver')
+        filters = self.service._mapped_node_filters()
+        node_list = self.dbapi.get_nodeinfo_list(columns=['uuid'],
+                                                 filters=filters)
+        self.assertEqual(sorted(n.uuid for n in nodes),
+                         sorted(uuid for (uuid,) in node_list))
+        self.assertNotIn(other.uuid, [uuid for (uuid,) in node_list])
+
     def test_validate_driver_interfaces(self):
         node = obj_utils.create_test_node(self.context, driver='fake')
         ret = self.service.validate_driver_interfaces(self.context,
@@ -1696,6 +1947,9 @@ class UpdatePortTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
         node = obj_utils.create_test_node(self.context,
                                           driver='fake')
         self._start_service()
+        # forget about the deploy deadlines loaded at startup
+        get_nodeinfo_list_mock.reset_mock()
+        _mapped_to_this_conductor_mock.reset_mock()
         acquire_mock.return_value.__enter__.return_value.driver = self.driver
         with mock.patch.object(self.driver.management,
                                'get_sensors_data') as get_sensors_data_mock:
@@ -1712,6 +1966,167 @@ class UpdatePortTestCase(_ServiceSetUpMixin, tests_db_base.DbTestCase):
                 self.assertFalse(get_sensors_data_mock.called)
                 self.assertFalse(validate_mock.called)
 
+    def _setup_send_sensor_data(self, num_nodes, get_nodeinfo_list_mock,
+                                mapped_mock, acquire_mock):
+        self._start_service()
+        CONF.set_override('send_sensor_data', True, group='conductor')
+        nodes = [obj_utils.create_test_node(self.context, id=i,
+                                            uuid=ironic_utils.generate_uuid(),
+                                            driver='fake')
+                 for i in range(1, num_nodes + 1)]
+        get_nodeinfo_list_mock.return_value = [
+                (n.uuid, n.driver, n.instance_uuid) for n in nodes]
+        mapped_mock.return_value = True
+        acquire_mock.return_value.__enter__.return_value.driver = self.driver
+        self.service.notifier = mock.Mock(spec_set=['info'])
+        return nodes
+
+    @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
+    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+    @mock.patch.object(task_manager, 'acquire')
+    def test___send_sensor_data_parallel(self, acquire_mock,
+                                         get_nodeinfo_list_mock,
+                                         mapped_mock):
+        CONF.set_override('send_sensor_data_workers', 3, group='conductor')
+        nodes = self._setup_send_sensor_data(5, get_nodeinfo_list_mock,
+                                             mapped_mock, acquire_mock)
+        running = [0]
+        peak = [0]
+
+        def _get_sensors_data(task):
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+            eventlet.sleep(0.01)
+            running[0] -= 1
+            return {'t1': {'f1': 'v1'}}
+
+        with mock.patch.object(self.driver.management, 'validate'):
+            with mock.patch.object(self.driver.management,
+                                   'get_sensors_data') as get_sensors_mock:
+                get_sensors_mock.side_effect = _get_sensors_data
+                self.service._send_sensor_data(self.context)
+
+        self.assertEqual(3, peak[0])
+        self.assertEqual(len(nodes), self.service.notifier.info.call_count)
+
+    @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
+    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+    @mock.patch.object(task_manager, 'acquire')
+    def test___send_sensor_data_completion_order(self, acquire_mock,
+                                                 get_nodeinfo_list_mock,
+                                                 mapped_mock):
+        nodes = self._setup_send_sensor_data(3, get_nodeinfo_list_mock,
+                                             mapped_mock, acquire_mock)
+        delays = [0.05, 0, 0]
+
+        def _get_sensors_data(task):
+            # the first node is the slowest to answer
+            eventlet.sleep(delays.pop(0))
+            return {'t1': {'f1': 'v1'}}
+
+        with mock.patch.object(self.driver.management, 'validate'):
+            with mock.patch.object(self.driver.management,
+                                   'get_sensors_data') as get_sensors_mock:
+                get_sensors_mock.side_effect = _get_sensors_data
+                self.service._send_sensor_data(self.context)
+
+        sent = [c[0][2]['node_uuid'] for c in
+                self.service.notifier.info.call_args_list]
+        self.assertEqual([n.uuid for n in nodes[1:] + nodes[:1]], sent)
+
+    @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
+    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+    @mock.patch.object(task_manager, 'acquire')
+    def test___send_sensor_data_timeout(self, acquire_mock,
+                                        get_nodeinfo_list_mock,
+                                        mapped_mock):
+        CONF.set_override('send_sensor_data_wait_timeout', 1,
+                          group='conductor')
+        nodes = self._setup_send_sensor_data(2, get_nodeinfo_list_mock,
+                                             mapped_mock, acquire_mock)
+
+        slept = []
+
+        def _get_sensors_data(task):
+            # the first node never answers in time
+            if not slept:
+                slept.append(task)
+                eventlet.sleep(5)
+            return {'t1': {'f1': 'v1'}}
+
+        with mock.patch.object(self.driver.management, 'validate'):
+            with mock.patch.object(self.driver.management,
+                                   'get_sensors_data') as get_sensors_mock:
+                get_sensors_mock.side_effect = _get_sensors_data
+                self.service._send_sensor_data(self.context)
+
+        # the node which timed out is skipped
+        self.service.notifier.info.assert_called_once_with(
+                self.context, 'hardware.ipmi.metrics', mock.ANY)
+        message = self.service.notifier.info.call_args[0][2]
+        self.assertEqual(nodes[1].uuid, message['node_uuid'])
+
+    @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
+    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+    @mock.patch.object(task_manager, 'acquire')
+    def test___send_sensor_data_batched(self, acquire_mock,
+                                        get_nodeinfo_list_mock,
+                                        mapped_mock):
+        CONF.set_override('send_sensor_data_batch_size', 2,
+                          group='conductor')
+        nodes = self._setup_send_sensor_data(3, get_nodeinfo_list_mock,
+                                             mapped_mock, acquire_mock)
+
+        with mock.patch.object(self.driver.management, 'validate'):
+            with mock.patch.object(self.driver.management,
+                                   'get_sensors_data') as get_sensors_mock:
+                get_sensors_mock.return_value = {'t1': {'f1': 'v1'}}
+                self.service._send_sensor_data(self.context)
+
+        self.assertEqual(2, self.service.notifier.info.call_count)
+        payloads = [c[0][2] for c in
+                    self.service.notifier.info.call_args_list]
+        self.assertEqual([n.uuid for n in nodes],
+                         [m['node_uuid'] for p in payloads
+                          for m in p['nodes']])
+        self.assertEqual([2, 1], [len(p['nodes']) for p in payloads])
+        self.assertEqual({'t1': {'f1': 'v1'}},
+                         payloads[0]['nodes'][0]['payload'])
+        self.assertTrue(payloads[0]['nodes'][0]['full_snapshot'])
+
+    @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
+    @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+    @mock.patch.object(task_manager, 'acquire')
+    def test___send_sensor_data_changes_only(self, acquire_mock,
+                                             get_nodeinfo_list_mock,
+                                             mapped_mock):
+        self._setup_send_sensor_data(1, get_nodeinfo_list_mock,
+                                     mapped_mock, acquire_mock)
+        self.service._sensor_data_cache = sensor_cache.SensorDataCache(
+                full_every=10)
+        readings = [{'t1': {'s1': {'Sensor Reading': '1'},
+                            's2': {'Sensor Reading': '2'}}},
+                    {'t1': {'s1': {'Sensor Reading': '1'},
+                            's2': {'Sensor Reading': '3'}}},
+                    {'t1': {'s1': {'Sensor Reading': '1'},
+                            's2': {'Sensor Reading': '3'}}}]
+
+        with mock.patch.object(self.driver.management, 'validate'):
+            with mock.patch.object(self.driver.management,
+                                   'get_sensors_data') as get_sensors_mock:
+                get_sensors_mock.side_effect = readings
+                for i in range(len(readings)):
+                    self.service._send_sensor_data(self.context)
+
+        # nothing changed in the last pass, so nothing was sent
+        messages = [c[0][2] for c in
+                    self.service.notifier.info.call_args_list]
+        self.assertEqual([readings[0],
+                          {'t1': {'s2': {'Sensor Reading': '3'}}}],
+                         [m['payload'] for m in messages])
+        self.assertEqual([True, False],
+                         [m['full_snapshot'] for m in messages])
+
     def test_set_boot_device(self):
         node = obj_utils.create_test_node(self.context, driver='fake')
         with mock.patch.object(self.driver.management, 'validate') as mock_val:
@@ -1811,26 +2226,37 @@ class ManagerSpawnWorkerTestCase(tests_base.TestCase):
     def setUp(self):
         super(ManagerSpawnWorkerTestCase, self).setUp()
         self.service = manager.ConductorManager('hostname', 'test-topic')
+        self.worker_pool = mock.Mock(spec_set=['free', 'spawn', 'size'])
+        self.worker_pool.size = 1
+        self.service._worker_pool = self.worker_pool
+        self.service._worker_queue = worker_queue.WorkerQueue(
+                self.worker_pool)
 
     def test__spawn_worker(self):
-        worker_pool = mock.Mock(spec_set=['free', 'spawn'])
-        worker_pool.free.return_value = True
-        self.service._worker_pool = worker_pool
+        self.worker_pool.free.return_value = True
 
         self.service._spawn_worker('fake', 1, 2, foo='bar', cat='meow')
 
-        worker_pool.spawn.assert_called_once_with(
+        self.worker_pool.spawn.assert_called_once_with(
                 'fake', 1, 2, foo='bar', cat='meow')
 
     def test__spawn_worker_none_free(self):
-        worker_pool = mock.Mock(spec_set=['free', 'spawn'])
-        worker_pool.free.return_value = False
-        self.service._worker_pool = worker_pool
+        self.worker_pool.free.return_value = False
 
         self.assertRaises(exception.NoFreeConductorWorker,
                           self.service._spawn_worker, 'fake')
 
-        self.assertFalse(worker_pool.spawn.called)
+        self.assertFalse(self.worker_pool.spawn.called)
+
+    @mock.patch.object(worker_queue.WorkerQueue, 'spawn')
+    def test__spawn_worker_priority(self, spawn_mock):
+        self.service._spawn_worker('fake', 1, foo='bar')
+        self.service._spawn_background_worker('fake', 2)
+
+        self.assertEqual(
+                [mock.call(worker_queue.PRIORITY_USER, 'fake', 1, foo='bar'),
+                 mock.call(worker_queue.PRIORITY_BACKGROUND, 'fake', 2)],
+                spawn_mock.call_args_list)
 
 
 @mock.patch.object(conductor_utils, 'node_power_action')
@@ -2031,7 +2457,6 @@ class ManagerDoSyncPowerStateTestCase(tests_db_base.DbTestCase):
 @mock.patch.object(manager, 'do_sync_power_state')
 @mock.patch.object(task_manager, 'acquire')
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
-@mock.patch.object(objects.Node, 'get_by_id')
 @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
 class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
     def setUp(self):
@@ -2039,96 +2464,31 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service = manager.ConductorManager('hostname', 'test-topic')
         self.service.dbapi = self.dbapi
         self.node = self._create_node()
-        self.filters = {'reserved': False, 'maintenance': False}
+        self.filters = {'reserved': False, 'maintenance': False,
+                        'provision_state_not_in': [states.DEPLOYWAIT]}
+        self.filters.update(self._mock_mapped_node_filters())
+        self.lock_filters = {'maintenance': False,
+                             'provision_state_not_in': [states.DEPLOYWAIT]}
         self.columns = ['id', 'uuid', 'driver']
 
-    def test_node_not_mapped(self, get_nodeinfo_mock, get_node_mock,
-                             mapped_mock, acquire_mock, sync_mock):
+    def test_node_not_mapped(self, get_nodeinfo_mock, mapped_mock,
+                             acquire_mock, sync_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        get_node_mock.return_value = self.node
         mapped_mock.return_value = False
 
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
-        mapped_mock.assert_called_once_with(self.node.uuid,
-                                            self.node.driver)
-        self.assertFalse(get_node_mock.called)
-        self.assertFalse(acquire_mock.called)
-        self.assertFalse(sync_mock.called)
-
-    def test_node_disappeared(self, get_nodeinfo_mock, get_node_mock,
-                              mapped_mock, acquire_mock, sync_mock):
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        get_node_mock.return_value = self.node
-        mapped_mock.return_value = True
-        get_node_mock.side_effect = exception.NodeNotFound(node=self.node.uuid)
-
-        self.service._sync_power_states(self.context)
-
-        get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
-        mapped_mock.assert_called_once_with(self.node.uuid,
-                                            self.node.driver)
-        get_node_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(acquire_mock.called)
-        self.assertFalse(sync_mock.called)
-
-    def test_node_in_deploywait(self, get_nodeinfo_mock, get_node_mock,
-                                mapped_mock, acquire_mock, sync_mock):
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        get_node_mock.return_value = self.node
-        self.node.provision_state = states.DEPLOYWAIT
-        self.node.target_provision_state = states.ACTIVE
-        self.node.save()
-
-        self.service._sync_power_states(self.context)
-
-        get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
-        mapped_mock.assert_called_once_with(self.node.uuid,
-                                            self.node.driver)
-        get_node_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(acquire_mock.called)
-        self.assertFalse(sync_mock.called)
-
-    def test_node_in_maintenance(self, get_nodeinfo_mock, get_node_mock,
-                                 mapped_mock, acquire_mock, sync_mock):
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        get_node_mock.return_value = self.node
-        self.node.maintenance = True
-
-        self.service._sync_power_states(self.context)
-
-        get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
-        mapped_mock.assert_called_once_with(self.node.uuid,
-                                            self.node.driver)
-        get_node_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(acquire_mock.called)
-        self.assertFalse(sync_mock.called)
-
-    def test_node_has_reservation(self, get_nodeinfo_mock, get_node_mock,
-                                  mapped_mock, acquire_mock, sync_mock):
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        get_node_mock.return_value = self.node
-        self.node.reservation = 'fake'
-
-        self.service._sync_power_states(self.context)
-
-        get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
-        get_node_mock.assert_called_once_with(self.context, self.node.id)
         self.assertFalse(acquire_mock.called)
         self.assertFalse(sync_mock.called)
 
-    def test_node_locked_on_acquire(self, get_nodeinfo_mock, get_node_mock,
-                                    mapped_mock, acquire_mock, sync_mock):
+    def test_node_locked_on_acquire(self, get_nodeinfo_mock, mapped_mock,
+                                    acquire_mock, sync_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        get_node_mock.return_value = self.node
         mapped_mock.return_value = True
         acquire_mock.side_effect = exception.NodeLocked(node=self.node.uuid,
                                                         host='fake')
@@ -2136,60 +2496,37 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
-        mapped_mock.assert_called_once_with(self.node.uuid,
-                                            self.node.driver)
-        get_node_mock.assert_called_once_with(self.context, self.node.id)
-        acquire_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(sync_mock.called)
-
-    def test_node_in_deploywait_on_acquire(self, get_nodeinfo_mock,
-                                           get_node_mock, mapped_mock,
-                                           acquire_mock, sync_mock):
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        get_node_mock.return_value = self.node
-        mapped_mock.return_value = True
-        task = self._create_task(
-                node_attrs=dict(provision_state=states.DEPLOYWAIT,
-                                target_provision_state=states.ACTIVE,
-                                id=self.node.id))
-        acquire_mock.side_effect = self._get_acquire_side_effect(task)
-
-        self.service._sync_power_states(self.context)
-
-        get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
-        get_node_mock.assert_called_once_with(self.context, self.node.id)
-        acquire_mock.assert_called_once_with(self.context, self.node.id)
+        acquire_mock.assert_called_once_with(self.context, self.node.id,
+                                             filters=self.lock_filters)
         self.assertFalse(sync_mock.called)
 
-    def test_node_in_maintenance_on_acquire(self, get_nodeinfo_mock,
-                                            get_node_mock, mapped_mock,
-                                            acquire_mock, sync_mock):
+    def test_node_constraints_not_met_on_acquire(self, get_nodeinfo_mock,
+                                                  mapped_mock, acquire_mock,
+                                                  sync_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        get_node_mock.return_value = self.node
         mapped_mock.return_value = True
-        task = self._create_task(
-                node_attrs=dict(maintenance=True, id=self.node.id))
-        acquire_mock.side_effect = self._get_acquire_side_effect(task)
+        acquire_mock.side_effect = exception.NodeConstraintsNotMet(
+                node=self.node.uuid, constraints=self.lock_filters)
 
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
-        get_node_mock.assert_called_once_with(self.context, self.node.id)
-        acquire_mock.assert_called_once_with(self.context, self.node.id)
+        acquire_mock.assert_called_once_with(self.context, self.node.id,
+                                             filters=self.lock_filters)
         self.assertFalse(sync_mock.called)
 
     def test_node_disappears_on_acquire(self, get_nodeinfo_mock,
-                                        get_node_mock, mapped_mock,
+                                        mapped_mock,
                                         acquire_mock, sync_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        get_node_mock.return_value = self.node
         mapped_mock.return_value = True
         acquire_mock.side_effect = exception.NodeNotFound(node=self.node.uuid,
                                                           host='fake')
@@ -2197,17 +2534,17 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
-        get_node_mock.assert_called_once_with(self.context, self.node.id)
-        acquire_mock.assert_called_once_with(self.context, self.node.id)
+        acquire_mock.assert_called_once_with(self.context, self.node.id,
+                                             filters=self.lock_filters)
         self.assertFalse(sync_mock.called)
 
-    def test_single_node(self, get_nodeinfo_mock, get_node_mock,
-                         mapped_mock, acquire_mock, sync_mock):
+    def test_single_node(self, get_nodeinfo_mock, mapped_mock,
+                         acquire_mock, sync_mock):
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        get_node_mock.return_value = self.node
         mapped_mock.return_value = True
         task = self._create_task(node_attrs=dict(id=self.node.id))
         acquire_mock.side_effect = self._get_acquire_side_effect(task)
@@ -2215,69 +2552,47 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_power_states(self.context)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_mock.assert_called_once_with(self.node.uuid,
                                             self.node.driver)
-        get_node_mock.assert_called_once_with(self.context, self.node.id)
-        acquire_mock.assert_called_once_with(self.context, self.node.id)
+        acquire_mock.assert_called_once_with(self.context, self.node.id,
+                                             filters=self.lock_filters)
         sync_mock.assert_called_once_with(task, mock.ANY)
 
     def test__sync_power_state_multiple_nodes(self, get_nodeinfo_mock,
-                                              get_node_mock, mapped_mock,
-                                              acquire_mock, sync_mock):
-        # Create 11 nodes:
+                                              mapped_mock, acquire_mock,
+                                              sync_mock):
+        # Create 6 nodes:
         # 1st node: Should acquire and try to sync
         # 2nd node: Not mapped to this conductor
-        # 3rd node: In DEPLOYWAIT provision_state
-        # 4th node: In maintenance mode
-        # 5th node: Has a reservation
-        # 6th node: Disappears after getting nodeinfo list.
-        # 7th node: task_manger.acquire() fails due to lock
-        # 8th node: task_manger.acquire() fails due to node disappearing
-        # 9th node: In DEPLOYWAIT provision_state acquire()
-        # 10th node: In maintenance mode on acquire()
-        # 11th node: Should acquire and try to sync
+        # 3rd node: task_manger.acquire() fails due to lock
+        # 4th node: task_manger.acquire() fails due to node disappearing
+        # 5th node: task_manger.acquire() fails due to the node going into
+        #           maintenance or DEPLOYWAIT
+        # 6th node: Should acquire and try to sync
         nodes = []
-        get_node_map = {}
         mapped_map = {}
-        for i in range(1, 12):
+        for i in range(1, 7):
             attrs = {'id': i,
                      'uuid': ironic_utils.generate_uuid()}
-            if i == 3:
-                attrs['provision_state'] = states.DEPLOYWAIT
-                attrs['target_provision_state'] = states.ACTIVE
-            elif i == 4:
-                attrs['maintenance'] = True
-            elif i == 5:
-                attrs['reservation'] = 'fake'
-
             n = self._create_node(**attrs)
             nodes.append(n)
             mapped_map[n.uuid] = False if i == 2 else True
-            get_node_map[n.uuid] = n
 
         tasks = [self._create_task(node_attrs=dict(id=1)),
-                 exception.NodeLocked(node=7, host='fake'),
-                 exception.NodeNotFound(node=8, host='fake'),
-                 self._create_task(
-                     node_attrs=dict(id=9,
-                                    provision_state=states.DEPLOYWAIT,
-                                    target_provision_state=states.ACTIVE)),
-                 self._create_task(
-                     node_attrs=dict(id=10, maintenance=True)),
-                 self._create_task(node_attrs=dict(id=11))]
-
-        def _get_node_side_effect(ctxt, node_id):
-            if node_id == 6:
-                # Make this node disappear
-                raise exception.NodeNotFound(node=node_id)
-            return nodes[node_id - 1]
+                 exception.NodeLocked(node=3, host='fake'),
+                 exception.NodeNotFound(node=4, host='fake'),
+                 exception.NodeConstraintsNotMet(
+                     node=5, constraints=self.lock_filters),
+                 self._create_task(node_attrs=dict(id=6))]
 
         get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response(
                 nodes)
         mapped_mock.side_effect = lambda x, y: mapped_map[x]
-        get_node_mock.side_effect = _get_node_side_effect
         acquire_mock.side_effect = self._get_acquire_side_effect(tasks)
+        # A single worker keeps the order of the lock attempts predictable
+        self.config(sync_power_state_workers=1, group='conductor')
 
         with mock.patch.object(eventlet, 'sleep') as sleep_mock:
             self.service._sync_power_states(self.context)
@@ -2285,21 +2600,233 @@ class ManagerSyncPowerStatesTestCase(_CommonMixIn, tests_db_base.DbTestCase):
             self.assertEqual(len(nodes), sleep_mock.call_count)
 
         get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters)
+                columns=self.columns, filters=self.filters,
+                use_slave=True)
         mapped_calls = [mock.call(x.uuid, x.driver) for x in nodes]
         self.assertEqual(mapped_calls, mapped_mock.call_args_list)
-        get_node_calls = [mock.call(self.context, x.id)
+        acquire_calls = [mock.call(self.context, x.id,
+                                   filters=self.lock_filters)
                 for x in nodes[:1] + nodes[2:]]
-        self.assertEqual(get_node_calls,
-                         get_node_mock.call_args_list)
-        acquire_calls = [mock.call(self.context, x.id)
-                for x in nodes[:1] + nodes[6:]]
         self.assertEqual(acquire_calls, acquire_mock.call_args_list)
         sync_calls = [mock.call(tasks[0], mock.ANY),
-                      mock.call(tasks[5], mock.ANY)]
+                      mock.call(tasks[4], mock.ANY)]
         self.assertEqual(sync_calls, sync_mock.call_args_list)
 
+    @mock.patch.object(time, 'time')
+    def test_stable_node_not_polled_every_pass(self, time_mock,
+                                               get_nodeinfo_mock,
+                                               mapped_mock, acquire_mock,
+                                               sync_mock):
+        self.service._power_poll_scheduler = (
+                poll_scheduler.PowerPollScheduler(60, 600))
+        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
+        mapped_mock.return_value = True
+        task = self._create_task(node_attrs=dict(id=self.node.id))
+        acquire_mock.side_effect = self._get_acquire_side_effect([task] * 3)
+        sync_mock.return_value = 0
+
+        for start in (0, 60, 120):
+            time_mock.return_value = start
+            self.service._sync_power_states(self.context)
+
+        # polled on the first two passes, then backed off to 2 passes
+        self.assertEqual(2, sync_mock.call_count)
+
+    @mock.patch.object(time, 'time')
+    def test_late_pass_polls_every_node(self, time_mock, get_nodeinfo_mock,
+                                        mapped_mock, acquire_mock,
+                                        sync_mock):
+        self.assertIsNone(self.service._power_poll_scheduler)
+        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
+        mapped_mock.return_value = True
+        task = self._create_task(node_attrs=dict(id=self.node.id))
+        acquire_mock.side_effect = self._get_acquire_side_effect([task] * 3)
+        sync_mock.return_value = 0
+
+        # the first pass started late, the next ones on time
+        for start in (1005, 1061, 1120):
+            time_mock.return_value = start
+            self.service._sync_power_states(self.context)
+
+        self.assertEqual(3, sync_mock.call_count)
+
+    @mock.patch.object(time, 'time')
+    def test_late_pass_backed_off_node_polled(self, time_mock,
+                                              get_nodeinfo_mock,
+                                              mapped_mock, acquire_mock,
+                                              sync_mock):
+        self.service._power_poll_scheduler = (
+                poll_scheduler.PowerPollScheduler(60, 600))
+        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
+        mapped_mock.return_value = True
+        task = self._create_task(node_attrs=dict(id=self.node.id))
+        acquire_mock.side_effect = self._get_acquire_side_effect([task] * 3)
+        sync_mock.return_value = 0
+
+        for start in (1005, 1061, 1120, 1180):
+            time_mock.return_value = start
+            self.service._sync_power_states(self.context)
+
+        # polled on the 1st, 2nd and 4th passes, whatever their start time
+        self.assertEqual(3, sync_mock.call_count)
+
+    def _setup_concurrent_sync(self, get_nodeinfo_mock, mapped_mock,
+                               acquire_mock, sync_mock, drivers):
+        nodes = [self._create_node(id=i, driver=drivers[i - 1],
+                                   uuid=ironic_utils.generate_uuid())
+                 for i in range(1, len(drivers) + 1)]
+        tasks = dict((n.id, self._create_task(node=n)) for n in nodes)
+        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response(
+                nodes)
+        mapped_mock.return_value = True
+
+        class FakeAcquire(object):
+            def __init__(fa_self, context, node_id, *args, **kwargs):
+                fa_self.node_id = node_id
+
+            def __enter__(fa_self):
+                return tasks[fa_self.node_id]
 
+            def __exit__(fa_self, exc_typ, exc_val, exc_tb):
+                pass
+
+        acquire_mock.side_effect = FakeAcquire
+
+        running = collections.defaultdict(int)
+        peak = collections.defaultdict(int)
+
+        def _sync(task, count):
+            driver = task.node.driver
+            running[driver] += 1
+            peak[driver] = max(peak[driver], running[driver])
+            eventlet.sleep(0.01)
+            running[driver] -= 1
+            return 0
+
+        sync_mock.side_effect = _sync
+        return nodes, peak
+
+    def test_nodes_synced_in_parallel(self, get_nodeinfo_mock, mapped_mock,
+                                      acquire_mock, sync_mock):
+        self.config(sync_power_state_workers=3, group='conductor')
+        nodes, peak = self._setup_concurrent_sync(
+                get_nodeinfo_mock, mapped_mock, acquire_mock,
+                sync_mock, ['fake'] * 5)
+
+        self.service._sync_power_states(self.context)
+
+        self.assertEqual(len(nodes), sync_mock.call_count)
+        self.assertEqual(3, peak['fake'])
+
+    def test_per_driver_limit(self, get_nodeinfo_mock, mapped_mock,
+                              acquire_mock, sync_mock):
+        self.config(sync_power_state_workers=8, group='conductor')
+        self.config(sync_power_state_driver_workers={'slow': '1'},
+                    group='conductor')
+        nodes, peak = self._setup_concurrent_sync(
+                get_nodeinfo_mock, mapped_mock, acquire_mock,
+                sync_mock, ['slow', 'fake', 'slow', 'fake', 'slow'])
+
+        self.service._sync_power_states(self.context)
+
+        self.assertEqual(len(nodes), sync_mock.call_count)
+        self.assertEqual(1, peak['slow'])
+        self.assertEqual(2, peak['fake'])
+
+    def test_per_driver_limit_no_head_of_line_blocking(
+            self, get_nodeinfo_mock, mapped_mock, acquire_mock, sync_mock):
+        self.config(sync_power_state_workers=2, group='conductor')
+        self.config(sync_power_state_driver_workers={'slow': '1'},
+                    group='conductor')
+        nodes, peak = self._setup_concurrent_sync(
+                get_nodeinfo_mock, mapped_mock, acquire_mock,
+                sync_mock, ['slow', 'slow', 'slow', 'fake', 'fake'])
+
+        self.service._sync_power_states(self.context)
+
+        drivers = [c[0][0].node.driver for c in sync_mock.call_args_list]
+        # the nodes of the other driver are not queued behind the slow ones
+        self.assertEqual(['slow', 'fake'], drivers[:2])
+        self.assertEqual(len(nodes), sync_mock.call_count)
+        self.assertEqual(1, peak['slow'])
+
+    @mock.patch.object(manager.LOG, 'warning')
+    def test_per_driver_backlog_left_after_deadline(
+            self, log_mock, get_nodeinfo_mock, mapped_mock, acquire_mock,
+            sync_mock):
+        self.config(sync_power_state_pass_timeout=10, group='conductor')
+        self.config(sync_power_state_driver_workers={'slow': '1'},
+                    group='conductor')
+        self._setup_concurrent_sync(
+                get_nodeinfo_mock, mapped_mock, acquire_mock,
+                sync_mock, ['slow'] * 3)
+
+        with mock.patch.object(time, 'time') as time_mock:
+            # start, nodes 1 to 3, past the deadline after the first node
+            time_mock.side_effect = [0, 1, 2, 3, 11, 12]
+            self.service._sync_power_states(self.context)
+
+        self.assertEqual(1, sync_mock.call_count)
+        self.assertEqual(2, log_mock.call_args[0][1]['remaining'])
+        self.assertEqual(1, log_mock.call_args[0][1]['count'])
+
+    @mock.patch.object(manager.LOG, 'warning')
+    @mock.patch.object(time, 'time')
+    def test_pass_deadline(self, time_mock, log_mock, get_nodeinfo_mock,
+                           mapped_mock, acquire_mock,
+                           sync_mock):
+        self.config(sync_power_state_pass_timeout=10, group='conductor')
+        nodes, peak = self._setup_concurrent_sync(
+                get_nodeinfo_mock, mapped_mock, acquire_mock,
+                sync_mock, ['fake'] * 4)
+        # start, node 1, node 2, node 3 (past the deadline), end of pass
+        time_mock.side_effect = [0, 1, 5, 11, 12]
+
+        self.service._sync_power_states(self.context)
+
+        self.assertEqual(2, sync_mock.call_count)
+        self.assertTrue(log_mock.called)
+        self.assertEqual(2, log_mock.call_args[0][1]['remaining'])
+
+    @mock.patch.object(manager.LOG, 'warning')
+    def test_pass_in_time_not_reported(self, log_mock, get_nodeinfo_mock,
+                                       mapped_mock,
+                                       acquire_mock, sync_mock):
+        self._setup_concurrent_sync(
+                get_nodeinfo_mock, mapped_mock, acquire_mock,
+                sync_mock, ['fake'] * 2)
+
+        self.service._sync_power_states(self.context)
+
+        self.assertEqual(2, sync_mock.call_count)
+        self.assertFalse(log_mock.called)
+
+
+class ManagerDriverSyncLimitTestCase(tests_base.TestCase):
+    def setUp(self):
+        super(ManagerDriverSyncLimitTestCase, self).setUp()
+        self.config(sync_power_state_workers=8, group='conductor')
+
+    def test_driver_not_listed(self):
+        self.assertEqual(8, manager._get_driver_sync_limit('fake'))
+
+    def test_driver_listed(self):
+        self.config(sync_power_state_driver_workers={'fake': '2'},
+                    group='conductor')
+        self.assertEqual(2, manager._get_driver_sync_limit('fake'))
+
+    def test_driver_limit_capped_by_pool_size(self):
+        self.config(sync_power_state_driver_workers={'fake': '20'},
+                    group='conductor')
+        self.assertEqual(8, manager._get_driver_sync_limit('fake'))
+
+    def test_driver_limit_invalid(self):
+        self.config(sync_power_state_driver_workers={'fake': 'lots'},
+                    group='conductor')
+        self.assertEqual(8, manager._get_driver_sync_limit('fake'))
+
+
+@mock.patch.object(eventlet, 'spawn_after')
 @mock.patch.object(task_manager, 'acquire')
 @mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
 @mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
@@ -2311,6 +2838,12 @@ class ManagerCheckDeployTimeoutsTestCase(_CommonMixIn,
         self.service = manager.ConductorManager('hostname', 'test-topic')
         self.service.dbapi = self.dbapi
 
+        self.now = datetime.datetime(2000, 1, 1, 0, 0)
+        timeutils.set_time_override(self.now)
+        self.addCleanup(timeutils.clear_time_override)
+        self.past = self.now - datetime.timedelta(seconds=1)
+        self.retry_at = self.now + datetime.timedelta(seconds=60)
+
         self.node = self._create_node(provision_state=states.DEPLOYWAIT,
                                       target_provision_state=states.ACTIVE)
         self.task = self._create_task(node=self.node)
@@ -2319,163 +2852,145 @@ class ManagerCheckDeployTimeoutsTestCase(_CommonMixIn,
                                       target_provision_state=states.ACTIVE)
         self.task2 = self._create_task(node=self.node2)
 
-        self.filters = {'reserved': False, 'maintenance': False,
-                        'provisioned_before': 300,
-                        'provision_state': states.DEPLOYWAIT}
-        self.columns = ['uuid', 'driver']
+        self.lock_filters = {'provisioned_before': 300,
+                             'provision_state': states.DEPLOYWAIT}
+        self.deadlines = self.service._deploy_deadlines
 
-    def _assert_get_nodeinfo_args(self, get_nodeinfo_mock):
-        get_nodeinfo_mock.assert_called_once_with(
-                columns=self.columns, filters=self.filters,
-                sort_key='provision_updated_at', sort_dir='asc')
+    def _track(self, nodes, deadline=None):
+        # the nodes are due in the given order
+        for i, node in enumerate(nodes):
+            self.deadlines.add(node.uuid, (deadline or self.past) +
+                               datetime.timedelta(microseconds=i))
+
+    def _assert_fail_event(self, task):
+        task.process_event.assert_called_with(
+                'fail',
+                callback=self.service._spawn_background_worker,
+                call_args=(conductor_utils.cleanup_after_timeout, task),
+                err_handler=manager.provisioning_error_handler)
 
     def test_disabled(self, get_nodeinfo_mock, mapped_mock,
-                      acquire_mock):
+                      acquire_mock, spawn_after_mock):
         self.config(deploy_callback_timeout=0, group='conductor')
+        self._track([self.node])
 
         self.service._check_deploy_timeouts(self.context)
 
         self.assertFalse(get_nodeinfo_mock.called)
-        self.assertFalse(mapped_mock.called)
         self.assertFalse(acquire_mock.called)
+        self.assertIn(self.node.uuid, self.deadlines)
 
-    def test_not_mapped(self, get_nodeinfo_mock, mapped_mock, acquire_mock):
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        mapped_mock.return_value = False
+    def test_not_due(self, get_nodeinfo_mock, mapped_mock, acquire_mock,
+                     spawn_after_mock):
+        self._track([self.node], self.retry_at)
 
         self.service._check_deploy_timeouts(self.context)
 
-        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
+        self.assertFalse(get_nodeinfo_mock.called)
         self.assertFalse(acquire_mock.called)
+        self.assertIn(self.node.uuid, self.deadlines)
 
-    def test_timeout(self, get_nodeinfo_mock, mapped_mock, acquire_mock):
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        mapped_mock.return_value = True
+    def test_timeout(self, get_nodeinfo_mock, mapped_mock, acquire_mock,
+                     spawn_after_mock):
+        self._track([self.node])
         acquire_mock.side_effect = self._get_acquire_side_effect(self.task)
 
         self.service._check_deploy_timeouts(self.context)
 
-        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
-        acquire_mock.assert_called_once_with(self.context, self.node.uuid)
-        self.task.process_event.assert_called_with(
-                'fail',
-                callback=self.service._spawn_worker,
-                call_args=(conductor_utils.cleanup_after_timeout, self.task),
-                err_handler=manager.provisioning_error_handler)
+        self.assertFalse(get_nodeinfo_mock.called)
+        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
+                                             filters=self.lock_filters)
+        self._assert_fail_event(self.task)
+        self.assertNotIn(self.node.uuid, self.deadlines)
+
+    def test_maintenance(self, get_nodeinfo_mock, mapped_mock, acquire_mock,
+                         spawn_after_mock):
+        self._track([self.node])
+        self.node.maintenance = True
+        acquire_mock.side_effect = self._get_acquire_side_effect(self.task)
+
+        self.service._check_deploy_timeouts(self.context)
+
+        acquire_mock.assert_called_once_with(self.context, self.node.uuid,
+                                             filters=self.lock_filters)
+        self.assertFalse(self.task.process_event.called)
+        # checked again later
+        self.assertEqual(self.retry_at, self.deadlines.next_deadline())
 
     def test_acquire_node_disappears(self, get_nodeinfo_mock, mapped_mock,
-                                     acquire_mock):
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        mapped_mock.return_value = True
+                                     acquire_mock, spawn_after_mock):
+        self._track([self.node])
         acquire_mock.side_effect = exception.NodeNotFound(node='fake')
 
         # Exception eaten
         self.service._check_deploy_timeouts(self.context)
 
-        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-        mapped_mock.assert_called_once_with(
-                self.node.uuid, self.node.driver)
         acquire_mock.assert_called_once_with(self.context,
-                                             self.node.uuid)
-        self.assertFalse(self.task.spawn_after.called)
+                                             self.node.uuid,
+                                             filters=self.lock_filters)
+        self.assertFalse(self.task.process_event.called)
+        self.assertNotIn(self.node.uuid, self.deadlines)
 
     def test_acquire_node_locked(self, get_nodeinfo_mock, mapped_mock,
-                                 acquire_mock):
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        mapped_mock.return_value = True
+                                 acquire_mock, spawn_after_mock):
+        self._track([self.node])
         acquire_mock.side_effect = exception.NodeLocked(node='fake',
                                                         host='fake')
 
         # Exception eaten
         self.service._check_deploy_timeouts(self.context)
 
-        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-        mapped_mock.assert_called_once_with(
-                self.node.uuid, self.node.driver)
-        acquire_mock.assert_called_once_with(self.context,
-                                             self.node.uuid)
-        self.assertFalse(self.task.spawn_after.called)
-
-    def test_no_deploywait_after_lock(self, get_nodeinfo_mock, mapped_mock,
-                                      acquire_mock):
-        task = self._create_task(
-                node_attrs=dict(provision_state=states.NOSTATE,
-                                uuid=self.node.uuid))
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
-        mapped_mock.return_value = True
-        acquire_mock.side_effect = self._get_acquire_side_effect(task)
-
-        self.service._check_deploy_timeouts(self.context)
-
-        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-        mapped_mock.assert_called_once_with(
-                self.node.uuid, self.node.driver)
         acquire_mock.assert_called_once_with(self.context,
-                                             self.node.uuid)
-        self.assertFalse(task.spawn_after.called)
-
-    def test_maintenance_after_lock(self, get_nodeinfo_mock, mapped_mock,
-                                    acquire_mock):
-        task = self._create_task(
-                node_attrs=dict(provision_state=states.DEPLOYWAIT,
-                                target_provision_state=states.ACTIVE,
-                                maintenance=True,
-                                uuid=self.node.uuid))
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response(
-                [task.node, self.node2])
-        mapped_mock.return_value = True
+                                             self.node.uuid,
+                                             filters=self.lock_filters)
+        self.assertFalse(self.task.process_event.called)
+        self.assertEqual(self.retry_at, self.deadlines.next_deadline())
+
+    def test_constraints_not_met_on_lock(self, get_nodeinfo_mock,
+                                         mapped_mock, acquire_mock,
+                                         spawn_after_mock):
+        self._track([self.node, self.node2])
         acquire_mock.side_effect = self._get_acquire_side_effect(
-                [task, self.task2])
+                [exception.NodeConstraintsNotMet(
+                     node=self.node.uuid, constraints=self.lock_filters),
+                 self.task2])
 
         self.service._check_deploy_timeouts(self.context)
 
-        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-        self.assertEqual([mock.call(self.node.uuid, task.node.driver),
-                          mock.call(self.node2.uuid, self.node2.driver)],
-                         mapped_mock.call_args_list)
-        self.assertEqual([mock.call(self.context, self.node.uuid),
-                          mock.call(self.context, self.node2.uuid)],
+        self.assertEqual([mock.call(self.context, self.node.uuid,
+                                    filters=self.lock_filters),
+                          mock.call(self.context, self.node2.uuid,
+                                    filters=self.lock_filters)],
                          acquire_mock.call_args_list)
-        # First node skipped
-        self.assertFalse(task.spawn_after.called)
+        # First node skipped and no longer tracked
+        self.assertFalse(self.task.process_event.called)
+        self.assertEqual(0, len(self.deadlines))
         # Second node spawned
-        self.task2.process_event.assert_called_with(
-                'fail',
-                callback=self.service._spawn_worker,
-                call_args=(conductor_utils.cleanup_after_timeout, self.task2),
-                err_handler=manager.provisioning_error_handler)
+        self._assert_fail_event(self.task2)
 
     def test_exiting_no_worker_avail(self, get_nodeinfo_mock, mapped_mock,
-                                     acquire_mock):
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response(
-                [self.node, self.node2])
-        mapped_mock.return_value = True
+                                     acquire_mock, spawn_after_mock):
+        self._track([self.node, self.node2])
         acquire_mock.side_effect = self._get_acquire_side_effect(
                 [(self.task, exception.NoFreeConductorWorker()), self.task2])
 
         # Exception should be nuked
         self.service._check_deploy_timeouts(self.context)
 
-        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-        # mapped should be only called for the first node as we should
+        # acquire should be only called for the first node as we should
         # have exited the loop early due to NoFreeConductorWorker
-        mapped_mock.assert_called_once_with(
-                self.node.uuid, self.node.driver)
         acquire_mock.assert_called_once_with(self.context,
-                                             self.node.uuid)
-        self.task.process_event.assert_called_with(
-                'fail',
-                callback=self.service._spawn_worker,
-                call_args=(conductor_utils.cleanup_after_timeout, self.task),
-                err_handler=manager.provisioning_error_handler)
+                                             self.node.uuid,
+                                             filters=self.lock_filters)
+        self._assert_fail_event(self.task)
+        # both nodes are checked again later
+        self.assertEqual(2, len(self.deadlines))
+        self.assertEqual(self.retry_at, self.deadlines.next_deadline())
 
     def test_exiting_with_other_exception(self, get_nodeinfo_mock,
-                                          mapped_mock, acquire_mock):
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response(
-                [self.node, self.node2])
-        mapped_mock.return_value = True
+                                          mapped_mock, acquire_mock,
+                                          spawn_after_mock):
+        self._track([self.node, self.node2])
         acquire_mock.side_effect = self._get_acquire_side_effect(
                 [(self.task, exception.IronicException('foo')), self.task2])
 
@@ -2484,50 +2999,98 @@ class ManagerCheckDeployTimeoutsTestCase(_CommonMixIn,
                           self.service._check_deploy_timeouts,
                           self.context)
 
-        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-        # mapped should be only called for the first node as we should
-        # have exited the loop early due to unknown exception
-        mapped_mock.assert_called_once_with(
-                self.node.uuid, self.node.driver)
         acquire_mock.assert_called_once_with(self.context,
-                                             self.node.uuid)
-        self.task.process_event.assert_called_with(
-                'fail',
-                callback=self.service._spawn_worker,
-                call_args=(conductor_utils.cleanup_after_timeout, self.task),
-                err_handler=manager.provisioning_error_handler)
-
-    def test_worker_limit(self, get_nodeinfo_mock, mapped_mock, acquire_mock):
+                                             self.node.uuid,
+                                             filters=self.lock_filters)
+        self._assert_fail_event(self.task)
+        self.assertEqual(2, len(self.deadlines))
+        self.assertEqual(self.retry_at, self.deadlines.next_deadline())
+
+    def test_worker_limit(self, get_nodeinfo_mock, mapped_mock, acquire_mock,
+                          spawn_after_mock):
         self.config(periodic_max_workers=2, group='conductor')
-
-        # Use the same nodes/tasks to make life easier in the tests
-        # here
-
-        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response(
-                [self.node] * 3)
-        mapped_mock.return_value = True
+        node3 = self._create_node(provision_state=states.DEPLOYWAIT)
+        self._track([self.node, self.node2, node3])
         acquire_mock.side_effect = self._get_acquire_side_effect(
-                [self.task] * 3)
+                [self.task, self.task2])
 
         self.service._check_deploy_timeouts(self.context)
 
-        # Should only have ran 2.
-        self.assertEqual([mock.call(self.node.uuid, self.node.driver)] * 2,
-                         mapped_mock.call_args_list)
-        self.assertEqual([mock.call(self.context, self.node.uuid)] * 2,
-                         acquire_mock.call_args_list)
-        process_event_call = mock.call(
-                'fail',
-                callback=self.service._spawn_worker,
-                call_args=(conductor_utils.cleanup_after_timeout, self.task),
-                err_handler=manager.provisioning_error_handler)
-        self.assertEqual([process_event_call] * 2,
-                         self.task.process_event.call_args_list)
+        # Should only have ran 2, the last one is still due.
+        self.assertEqual(2, acquire_mock.call_count)
+        self.assertEqual([node3.uuid], self.deadlines.pop_expired(self.now))
+
+    def test_load_deadlines(self, get_nodeinfo_mock, mapped_mock,
+                            acquire_mock, spawn_after_mock):
+        filters = {'provision_state': states.DEPLOYWAIT}
+        filters.update(self._mock_mapped_node_filters())
+        get_nodeinfo_mock.return_value = [
+                (self.node.uuid, 'fake', self.now),
+                (self.node2.uuid, 'fake', self.now),
+                ('not-mapped', 'fake', self.now)]
+        mapped_mock.side_effect = [True, True, False]
+        self._track([self._create_node()])
+
+        self.service._load_deploy_deadlines()
+
+        get_nodeinfo_mock.assert_called_once_with(
+                columns=['uuid', 'driver', 'provision_updated_at'],
+                filters=filters)
+        deadline = self.now + datetime.timedelta(seconds=300)
+        self.assertEqual(deadline, self.deadlines.next_deadline())
+        self.assertEqual(set([self.node.uuid, self.node2.uuid]),
+                         set(self.deadlines.pop_expired(deadline)))
+        spawn_after_mock.assert_called_once_with(
+                300, self.service._deploy_timeout_expired)
+
+    def test_load_deadlines_disabled(self, get_nodeinfo_mock, mapped_mock,
+                                     acquire_mock, spawn_after_mock):
+        self.config(deploy_callback_timeout=0, group='conductor')
+
+        self.service._load_deploy_deadlines()
+
+        self.assertFalse(get_nodeinfo_mock.called)
+        self.assertFalse(spawn_after_mock.called)
+
+    def test_timer_rearmed(self, get_nodeinfo_mock, mapped_mock,
+                           acquire_mock, spawn_after_mock):
+        timer1 = mock.Mock()
+        spawn_after_mock.return_value = timer1
+        self.service._track_deploy_timeout(self.node.uuid, self.now)
+        spawn_after_mock.assert_called_once_with(
+                300, self.service._deploy_timeout_expired)
+
+        # a later deadline leaves the timer alone
+        self.service._track_deploy_timeout(
+                self.node2.uuid, self.now + datetime.timedelta(seconds=10))
+        self.assertEqual(1, spawn_after_mock.call_count)
+
+        # an earlier one re-arms it
+        spawn_after_mock.reset_mock()
+        self.service._track_deploy_timeout(
+                self._create_node().uuid,
+                self.now - datetime.timedelta(seconds=100))
+        timer1.cancel.assert_called_once_with()
+        spawn_after_mock.assert_called_once_with(
+                200, self.service._deploy_timeout_expired)
+
+    @mock.patch.object(manager.ConductorManager, '_check_deploy_timeouts')
+    def test_timer_expired(self, check_mock, get_nodeinfo_mock, mapped_mock,
+                           acquire_mock, spawn_after_mock):
+        self._track([self.node], self.retry_at)
+        check_mock.side_effect = exception.IronicException('foo')
+
+        # Exception logged, and the timer armed for the next deadline
+        self.service._deploy_timeout_expired()
+
+        self.assertTrue(check_mock.called)
+        spawn_after_mock.assert_called_once_with(
+                60, self.service._deploy_timeout_expired)
 
     @mock.patch.object(dbapi.IMPL, 'update_port')
     @mock.patch('ironic.dhcp.neutron.NeutronDHCPApi.update_port_address')
     def test_update_port_duplicate_mac(self, get_nodeinfo_mock, mapped_mock,
-            acquire_mock, mac_update_mock, mock_up):
+            acquire_mock, mac_update_mock, mock_up, spawn_after_mock):
         node = utils.create_test_node(driver='fake')
         port = obj_utils.create_test_port(self.context, node_id=node.id)
         mock_up.side_effect = exception.MACAlreadyExists(mac=port.address)
@@ -2671,6 +3234,7 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service.conductor = mock.Mock()
         self.service.dbapi = self.dbapi
         self.service.ring_manager = mock.Mock()
+        self.service.ring_manager.refresh.return_value = {}
 
         self.node = self._create_node(provision_state=states.ACTIVE,
                                       target_provision_state=states.NOSTATE)
@@ -2679,6 +3243,7 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.filters = {'reserved': False,
                         'maintenance': False,
                         'provision_state': states.ACTIVE}
+        self.filters.update(self._mock_mapped_node_filters())
         self.columns = ['id', 'uuid', 'driver', 'conductor_affinity']
 
     def _assert_get_nodeinfo_args(self, get_nodeinfo_mock):
@@ -2693,10 +3258,11 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_local_state(self.context)
 
         self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
+        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver,
+                                            primary_only=True)
         self.assertFalse(acquire_mock.called)
         self.assertFalse(get_authtoken_mock.called)
-        self.service.ring_manager.reset.assert_called_once_with()
+        self.service.ring_manager.refresh.assert_called_once_with()
 
     def test_already_mapped(self, get_nodeinfo_mock, mapped_mock,
                              acquire_mock, get_authtoken_mock):
@@ -2710,10 +3276,11 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_local_state(self.context)
 
         self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
+        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver,
+                                            primary_only=True)
         self.assertFalse(acquire_mock.called)
         self.assertFalse(get_authtoken_mock.called)
-        self.service.ring_manager.reset.assert_called_once_with()
+        self.service.ring_manager.refresh.assert_called_once_with()
 
     @mock.patch.object(context, 'get_admin_context')
     def test_good(self, get_ctx_mock, get_nodeinfo_mock, mapped_mock,
@@ -2726,12 +3293,13 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self.service._sync_local_state(self.context)
 
         self._assert_get_nodeinfo_args(get_nodeinfo_mock)
-        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
+        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver,
+                                            primary_only=True)
         get_authtoken_mock.assert_called_once_with()
         acquire_mock.assert_called_once_with(self.context, self.node.id)
         # assert spawn_after has been called
         self.task.spawn_after.assert_called_once_with(
-                self.service._spawn_worker,
+                self.service._spawn_background_worker,
                 self.service._do_takeover, self.task)
 
     @mock.patch.object(context, 'get_admin_context')
@@ -2757,7 +3325,8 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         # assert  _mapped_to_this_conductor() gets called 2 times only
         # instead of 3. When NoFreeConductorWorker is raised the loop
         # should be broken
-        expected = [mock.call(self.node.uuid, self.node.driver)] * 2
+        expected = [mock.call(self.node.uuid, self.node.driver,
+                              primary_only=True)] * 2
         self.assertEqual(expected, mapped_mock.call_args_list)
 
         # assert  acquire() gets called 2 times only instead of 3. When
@@ -2769,7 +3338,7 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         get_authtoken_mock.assert_called_once_with()
 
         # assert spawn_after has been called twice
-        expected = [mock.call(self.service._spawn_worker,
+        expected = [mock.call(self.service._spawn_background_worker,
                     self.service._do_takeover, self.task)] * 2
         self.assertEqual(expected, self.task.spawn_after.call_args_list)
 
@@ -2791,7 +3360,8 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         self._assert_get_nodeinfo_args(get_nodeinfo_mock)
 
         # assert _mapped_to_this_conductor() gets called 3 times
-        expected = [mock.call(self.node.uuid, self.node.driver)] * 3
+        expected = [mock.call(self.node.uuid, self.node.driver,
+                              primary_only=True)] * 3
         self.assertEqual(expected, mapped_mock.call_args_list)
 
         # assert acquire() gets called 3 times
@@ -2802,10 +3372,74 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
         get_authtoken_mock.assert_called_once_with()
 
         # assert spawn_after has been called only 2 times
-        expected = [mock.call(self.service._spawn_worker,
+        expected = [mock.call(self.service._spawn_background_worker,
                     self.service._do_takeover, self.task)] * 2
         self.assertEqual(expected, self.task.spawn_after.call_args_list)
 
+    def test_unchanged_ring(self, get_nodeinfo_mock, mapped_mock,
+                            acquire_mock, get_authtoken_mock):
+        # A complete check was already done
+        self.service._pending_takeovers = {}
+
+        self.service._sync_local_state(self.context)
+
+        self.service.ring_manager.refresh.assert_called_once_with()
+        self.assertFalse(get_nodeinfo_mock.called)
+        self.assertFalse(acquire_mock.called)
+
+    def test_moved_key_ranges(self, get_nodeinfo_mock, mapped_mock,
+                              acquire_mock, get_authtoken_mock):
+        moved = {'fake': [('1' * 32, '2' * 32)]}
+        self.service._pending_takeovers = {}
+        self.service.ring_manager.refresh.return_value = moved
+        get_nodeinfo_mock.return_value = []
+
+        with mock.patch.object(self.service,
+                               '_load_deploy_deadlines') as load_mock:
+            self.service._sync_local_state(self.context)
+
+        load_mock.assert_called_once_with()
+        self.service._mapped_node_filters.assert_called_once_with(moved)
+        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
+        self.assertEqual({}, self.service._pending_takeovers)
+
+    def test_first_run_checks_all_nodes(self, get_nodeinfo_mock, mapped_mock,
+                                        acquire_mock, get_authtoken_mock):
+        get_nodeinfo_mock.return_value = []
+
+        self.service._sync_local_state(self.context)
+
+        self.service._mapped_node_filters.assert_called_once_with(None)
+        self._assert_get_nodeinfo_args(get_nodeinfo_mock)
+        self.assertEqual({}, self.service._pending_takeovers)
+
+    @mock.patch.object(context, 'get_admin_context')
+    def test_node_locked_keeps_pending(self, get_ctx_mock, get_nodeinfo_mock,
+                                       mapped_mock, acquire_mock,
+                                       get_authtoken_mock):
+        moved = {'fake': [('1' * 32, '2' * 32)]}
+        self.service._pending_takeovers = {}
+        self.service.ring_manager.refresh.return_value = moved
+        get_ctx_mock.return_value = self.context
+        mapped_mock.return_value = True
+        acquire_mock.side_effect = self._get_acquire_side_effect(
+                [exception.NodeLocked('error')] * 2)
+        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
+
+        with mock.patch.object(self.service, '_load_deploy_deadlines'):
+            self.service._sync_local_state(self.context)
+
+        self.assertEqual(moved, self.service._pending_takeovers)
+
+        # the next run checks the same nodes again, even though the ring
+        # did not change in between
+        self.service.ring_manager.refresh.return_value = {}
+        self.service._sync_local_state(self.context)
+
+        self.assertEqual([mock.call(moved)] * 2,
+                         self.service._mapped_node_filters.call_args_list)
+        self.assertEqual(2, get_nodeinfo_mock.call_count)
+
     @mock.patch.object(context, 'get_admin_context')
     def test_worker_limit(self, get_ctx_mock, get_nodeinfo_mock, mapped_mock,
                           acquire_mock, get_authtoken_mock):
@@ -2827,7 +3461,8 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
 
         # assert _mapped_to_this_conductor() gets called only once
         # because of the worker limit
-        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver)
+        mapped_mock.assert_called_once_with(self.node.uuid, self.node.driver,
+                                            primary_only=True)
 
         # assert acquire() gets called only once because of the worker limit
         acquire_mock.assert_called_once_with(self.context, self.node.id)
@@ -2837,5 +3472,134 @@ class ManagerSyncLocalStateTestCase(_CommonMixIn, tests_db_base.DbTestCase):
 
         # assert spawn_after has been called
         self.task.spawn_after.assert_called_once_with(
-                self.service._spawn_worker,
+                self.service._spawn_background_worker,
                 self.service._do_takeover, self.task)
+
+
+@mock.patch.object(keystone, 'get_admin_auth_token')
+@mock.patch.object(manager.ConductorManager, '_spawn_background_worker')
+@mock.patch.object(manager.ConductorManager, '_mapped_to_this_conductor')
+@mock.patch.object(dbapi.IMPL, 'get_nodeinfo_list')
+class ManagerPrepareReplicasTestCase(_CommonMixIn, tests_db_base.DbTestCase):
+
+    def setUp(self):
+        super(ManagerPrepareReplicasTestCase, self).setUp()
+        self.config(hash_distribution_replicas=2)
+        self.service = manager.ConductorManager('hostname', 'test-topic')
+        self.service.dbapi = self.dbapi
+        self.node = self._create_node(provision_state=states.ACTIVE)
+        self.filters = {'maintenance': False,
+                        'provision_state': states.ACTIVE}
+        self.filters.update(self._mock_mapped_node_filters())
+        self.columns = ['id', 'uuid', 'driver']
+
+    @staticmethod
+    def _mapped_as_replica(node_uuid, driver, primary_only=False):
+        return not primary_only
+
+    def test_no_replicas(self, get_nodeinfo_mock, mapped_mock, spawn_mock,
+                         get_authtoken_mock):
+        self.config(hash_distribution_replicas=1)
+
+        self.service._prepare_replicas(self.context)
+
+        self.assertFalse(get_nodeinfo_mock.called)
+        self.assertFalse(spawn_mock.called)
+
+    def test_primary(self, get_nodeinfo_mock, mapped_mock, spawn_mock,
+                     get_authtoken_mock):
+        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
+        mapped_mock.return_value = True
+
+        self.service._prepare_replicas(self.context)
+
+        get_nodeinfo_mock.assert_called_once_with(columns=self.columns,
+                                                  filters=self.filters,
+                                                  use_slave=True)
+        self.assertFalse(spawn_mock.called)
+        self.assertEqual(set(), self.service._prepared_replicas)
+
+    @mock.patch.object(context, 'get_admin_context')
+    def test_replica(self, get_ctx_mock, get_nodeinfo_mock, mapped_mock,
+                     spawn_mock, get_authtoken_mock):
+        get_ctx_mock.return_value = self.context
+        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
+        mapped_mock.side_effect = self._mapped_as_replica
+
+        self.service._prepare_replicas(self.context)
+        # prepared only once
+        self.service._prepare_replicas(self.context)
+
+        spawn_mock.assert_called_once_with(self.service._prepare_replica,
+                                           self.context, self.node.id,
+                                           self.node.uuid)
+        get_authtoken_mock.assert_called_once_with()
+        self.assertEqual(set([self.node.uuid]),
+                         self.service._prepared_replicas)
+
+        # forgotten once the node is not active anymore
+        get_nodeinfo_mock.return_value = []
+        self.service._prepare_replicas(self.context)
+        self.assertEqual(set(), self.service._prepared_replicas)
+
+    @mock.patch.object(context, 'get_admin_context')
+    def test_replica_no_free_worker(self, get_ctx_mock, get_nodeinfo_mock,
+                                    mapped_mock, spawn_mock,
+                                    get_authtoken_mock):
+        get_ctx_mock.return_value = self.context
+        get_nodeinfo_mock.return_value = self._get_nodeinfo_list_response()
+        mapped_mock.side_effect = self._mapped_as_replica
+        spawn_mock.side_effect = exception.NoFreeConductorWorker()
+
+        self.service._prepare_replicas(self.context)
+
+        self.assertEqual(1, spawn_mock.call_count)
+        self.assertEqual(set(), self.service._prepared_replicas)
+
+    @mock.patch.object(task_manager, 'acquire')
+    def test__prepare_replica(self, acquire_mock, get_nodeinfo_mock,
+                              mapped_mock, spawn_mock, get_authtoken_mock):
+        task = acquire_mock.return_value.__enter__.return_value
+        self.service._prepared_replicas.add(self.node.uuid)
+
+        self.service._prepare_replica(self.context, self.node.id,
+                                      self.node.uuid)
+
+        acquire_mock.assert_called_once_with(self.context, self.node.id,
+                                             shared=True)
+        task.driver.deploy.cache_images.assert_called_once_with(task)
+        self.assertFalse(task.driver.deploy.prepare.called)
+        self.assertEqual(set([self.node.uuid]),
+                         self.service._prepared_replicas)
+
+    @mock.patch.object(task_manager, 'acquire')
+    def test__prepare_replica_unsupported(self, acquire_mock,
+                                          get_nodeinfo_mock, mapped_mock,
+                                          spawn_mock, get_authtoken_mock):
+        task = acquire_mock.return_value.__enter__.return_value
+        task.driver.deploy.cache_images.side_effect = (
+                exception.UnsupportedDriverExtension(
+                    driver='fake', extension='cache_images'))
+        self.service._prepared_replicas.add(self.node.uuid)
+
+        self.service._prepare_replica(self.context, self.node.id,
+                                      self.node.uuid)
+
+        # not tried again
+        self.assertEqual(set([self.node.uuid]),
+                         self.service._prepared_replicas)
+
+    @mock.patch.object(task_manager, 'acquire')
+    def test__prepare_replica_fails(self, acquire_mock, get_nodeinfo_mock,
+                                    mapped_mock, spawn_mock,
+                                    get_authtoken_mock):
+        task = acquire_mock.return_value.__enter__.return_value
+        task.driver.deploy.cache_images.side_effect = (
+                exception.ImageNotFound(image_id='fake'))
+        self.service._prepared_replicas.add(self.node.uuid)
+
+        self.service._prepare_replica(self.context, self.node.id,
+                                      self.node.uuid)
+
+        # tried again on the next run
+        self.assertEqual(set(), self.service._prepared_replicas)
@@ -0,0 +1,99 @@
+# coding=utf-8
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the power state poll scheduler."""
+
+import random
+
+import mock
+
+from ironic.common import states
+from ironic.conductor import poll_scheduler
+from ironic.tests import base
+
+
+@mock.patch.object(random, 'uniform', lambda a, b: 0)
+class PowerPollSchedulerTestCase(base.TestCase):
+
+    def setUp(self):
+        super(PowerPollSchedulerTestCase, self).setUp()
+        self.scheduler = poll_scheduler.PowerPollScheduler(10, 40)
+
+    def _poll(self, power_state=states.POWER_ON, failed=False):
+        """Run a pass, polling node 'a' if it is due."""
+        self.scheduler.pop_due()
+        if not self.scheduler.is_due('a'):
+            return False
+        self.scheduler.record('a', power_state, failed=failed)
+        return True
+
+    def test_unknown_node_is_due(self):
+        self.scheduler.pop_due()
+        self.assertTrue(self.scheduler.is_due('a'))
+
+    def test_stable_node_backs_off(self):
+        polled = [p for p in range(16) if self._poll()]
+        # 1 pass, then 2, then capped at 4
+        self.assertEqual([0, 1, 3, 7, 11, 15], polled)
+
+    def test_changed_node_polled_again_soon(self):
+        polled = [p for p in range(8)
+                  if self._poll(power_state=(states.POWER_OFF if p == 7
+                                             else states.POWER_ON))]
+        self.assertEqual([0, 1, 3, 7], polled)
+        self.assertTrue(self._poll(power_state=states.POWER_OFF))
+
+    def test_failed_node_polled_again_soon(self):
+        polled = [p for p in range(8) if self._poll(failed=(p == 7))]
+        self.assertEqual([0, 1, 3, 7], polled)
+        self.assertTrue(self._poll())
+
+    def test_no_max_interval(self):
+        self.scheduler = poll_scheduler.PowerPollScheduler(10, 0)
+        polled = [p for p in range(5) if self._poll()]
+        self.assertEqual([0, 1, 2, 3, 4], polled)
+
+    def test_max_interval_rounded_down(self):
+        self.scheduler = poll_scheduler.PowerPollScheduler(10, 25)
+        polled = [p for p in range(10) if self._poll()]
+        # 1 pass, then capped at 2
+        self.assertEqual([0, 1, 3, 5, 7, 9], polled)
+
+    def test_pop_due(self):
+        self.scheduler.pop_due()
+        self.scheduler.record('a', states.POWER_ON)
+        self.scheduler.record('b', states.POWER_ON)
+        self.assertEqual(set(['a', 'b']), self.scheduler.pop_due())
+        self.assertTrue(self.scheduler.is_due('a'))
+        self.scheduler.record('a', states.POWER_ON)
+        self.scheduler.record('b', states.POWER_OFF)
+        self.assertEqual(set(['b']), self.scheduler.pop_due())
+        self.assertFalse(self.scheduler.is_due('a'))
+
+    def test_forget(self):
+        for p in range(2):
+            self._poll()
+        self.scheduler.forget(['a'])
+        # polled again as if it was new
+        self.assertTrue(self._poll())
+        self.assertTrue(self._poll())
+
+    def test_jitter(self):
+        self.scheduler = poll_scheduler.PowerPollScheduler(10, 100)
+        # the class patch would take precedence over a method decorator
+        with mock.patch.object(random, 'uniform', lambda a, b: b):
+            polled = [p for p in range(20) if self._poll()]
+        # 2 and 4 passes are too short to be jittered, then
+        # 8 - int(8 * 0.2) = 7 passes
+        self.assertEqual([0, 1, 3, 7, 14], polled)
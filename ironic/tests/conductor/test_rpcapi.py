@@ -26,6 +26,7 @@ from oslo.config import cfg
 from ironic.common import boot_devices
 from ironic.common import exception
 from ironic.common import states
+from ironic.common import utils
 from ironic.conductor import manager as conductor_manager
 from ironic.conductor import rpcapi as conductor_rpcapi
 from ironic import objects
@@ -92,6 +93,20 @@ class RPCAPITestCase(base.DbTestCase):
         self.assertEqual(expected_topic,
                          rpcapi.get_topic_for(self.fake_node_obj))
 
+    def test_get_topics_for(self):
+        CONF.set_override('host', 'fake-host')
+        self.dbapi.register_conductor({'hostname': 'fake-host',
+                                       'drivers': ['fake-driver']})
+        other_node = objects.Node._from_db_object(
+                objects.Node(self.context),
+                dbutils.get_test_node(id=2, driver='other-driver',
+                                      uuid=utils.generate_uuid()))
+
+        rpcapi = conductor_rpcapi.ConductorAPI(topic='fake-topic')
+        topics = rpcapi.get_topics_for([self.fake_node_obj, other_node])
+        self.assertEqual({'fake-topic.fake-host': [self.fake_node_obj],
+                          None: [other_node]}, topics)
+
     def test_get_topic_for_driver_known_driver(self):
         CONF.set_override('host', 'fake-host')
         self.dbapi.register_conductor({
@@ -181,6 +196,13 @@ class RPCAPITestCase(base.DbTestCase):
                           node_id=self.fake_node['uuid'],
                           new_state=states.POWER_ON)
 
+    def test_change_nodes_power_state(self):
+        self._test_rpcapi('change_nodes_power_state',
+                          'call',
+                          version='1.22',
+                          node_ids=[self.fake_node['uuid']],
+                          new_state=states.POWER_ON)
+
     def test_vendor_passthru(self):
         self._test_rpcapi('vendor_passthru',
                           'call',
@@ -212,6 +234,19 @@ class RPCAPITestCase(base.DbTestCase):
                           version='1.6',
                           node_id=self.fake_node['uuid'])
 
+    def test_do_nodes_deploy(self):
+        self._test_rpcapi('do_nodes_deploy',
+                          'call',
+                          version='1.23',
+                          node_ids=[self.fake_node['uuid']],
+                          rebuild=False)
+
+    def test_do_nodes_tear_down(self):
+        self._test_rpcapi('do_nodes_tear_down',
+                          'call',
+                          version='1.23',
+                          node_ids=[self.fake_node['uuid']])
+
     def test_validate_driver_interfaces(self):
         self._test_rpcapi('validate_driver_interfaces',
                           'call',
@@ -0,0 +1,88 @@
+# coding=utf-8
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the sensor data cache."""
+
+from ironic.conductor import sensor_cache
+from ironic.tests import base
+
+
+def _sensors(temp='42 (+/- 0) degrees C', fan='5400 (+/- 75) RPM',
+             status='0x00'):
+    return {'Temperature': {'Temp (0x1)': {'Sensor ID': 'Temp (0x1)',
+                                           'Sensor Reading': temp}},
+            'Fan': {'Fan 1 (0x30)': {'Sensor ID': 'Fan 1 (0x30)',
+                                     'Sensor Reading': fan}},
+            'Power': {'PSU (0x60)': {'Sensor ID': 'PSU (0x60)',
+                                     'Status': status}}}
+
+
+class SensorDataCacheTestCase(base.TestCase):
+
+    def setUp(self):
+        super(SensorDataCacheTestCase, self).setUp()
+        self.cache = sensor_cache.SensorDataCache(threshold=1.0,
+                                                  full_every=3)
+
+    def test_first_pass_is_full(self):
+        self.assertEqual((True, _sensors()),
+                         self.cache.get_changes('a', _sensors()))
+
+    def test_unchanged_not_sent(self):
+        self.cache.get_changes('a', _sensors())
+        self.assertEqual((False, {}),
+                         self.cache.get_changes('a', _sensors()))
+
+    def test_changes_sent(self):
+        self.cache.get_changes('a', _sensors())
+        full, changes = self.cache.get_changes(
+                'a', _sensors(fan='5000 (+/- 75) RPM', status='0x01'))
+        self.assertFalse(full)
+        self.assertEqual(['Fan', 'Power'], sorted(changes))
+
+    def test_threshold(self):
+        self.cache.get_changes('a', _sensors())
+        self.assertEqual((False, {}), self.cache.get_changes(
+                                'a', _sensors(temp='43 (+/- 0) degrees C')))
+        # compared with the reading last sent, not the last one seen
+        full, changes = self.cache.get_changes(
+                'a', _sensors(temp='43.5 (+/- 0) degrees C'))
+        self.assertEqual(['Temperature'], list(changes))
+
+    def test_full_snapshot(self):
+        results = [self.cache.get_changes('a', _sensors())
+                   for i in range(7)]
+        self.assertEqual([(True, _sensors()), (False, {}), (False, {}),
+                          (True, _sensors()), (False, {}), (False, {}),
+                          (True, _sensors())], results)
+
+    def test_full_every_one(self):
+        cache = sensor_cache.SensorDataCache(full_every=1)
+        cache.get_changes('a', _sensors())
+        self.assertEqual((True, _sensors()),
+                         cache.get_changes('a', _sensors()))
+
+    def test_nodes_are_independent(self):
+        self.cache.get_changes('a', _sensors())
+        self.assertEqual((True, _sensors()),
+                         self.cache.get_changes('b', _sensors()))
+
+    def test_retain(self):
+        self.cache.get_changes('a', _sensors())
+        self.cache.get_changes('b', _sensors())
+        self.cache.retain(['b'])
+        self.assertEqual((True, _sensors()),
+                         self.cache.get_changes('a', _sensors()))
+        self.assertEqual((False, {}),
+                         self.cache.get_changes('b', _sensors()))
@@ -17,6 +17,8 @@
 
 """Tests for :class:`ironic.conductor.task_manager`."""
 
+import random
+
 import eventlet
 from eventlet import greenpool
 import mock
@@ -28,6 +30,7 @@ from ironic.common import states
 from ironic.common import utils
 from ironic.conductor import task_manager
 from ironic import objects
+from ironic.objects import cache
 from ironic.tests import base as tests_base
 from ironic.tests.db import base as tests_db_base
 from ironic.tests.objects import utils as obj_utils
@@ -58,7 +61,7 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
             self.assertFalse(task.shared)
 
         reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
+                                             'fake-node-id', filters=None)
         get_ports_mock.assert_called_once_with(self.context, self.node.id)
         get_driver_mock.assert_called_once_with(self.node.driver)
         release_mock.assert_called_once_with(self.context, self.host,
@@ -78,7 +81,7 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
             self.assertFalse(task.shared)
 
         reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
+                                             'fake-node-id', filters=None)
         get_ports_mock.assert_called_once_with(self.context, self.node.id)
         get_driver_mock.assert_called_once_with('fake-driver')
         release_mock.assert_called_once_with(self.context, self.host,
@@ -93,12 +96,12 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
                                            driver='fake')
 
         reserve_mock.return_value = self.node
-        get_ports_mock.return_value = mock.sentinel.ports1
+        get_ports_mock.side_effect = [mock.sentinel.ports1,
+                                      mock.sentinel.ports2]
         get_driver_mock.return_value = mock.sentinel.driver1
 
         with task_manager.TaskManager(self.context, 'node-id1') as task:
             reserve_mock.return_value = node2
-            get_ports_mock.return_value = mock.sentinel.ports2
             get_driver_mock.return_value = mock.sentinel.driver2
             with task_manager.TaskManager(self.context, 'node-id2') as task2:
                 self.assertEqual(self.context, task.context)
@@ -112,8 +115,10 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
                 self.assertEqual(mock.sentinel.driver2, task2.driver)
                 self.assertFalse(task2.shared)
 
-        self.assertEqual([mock.call(self.context, self.host, 'node-id1'),
-                          mock.call(self.context, self.host, 'node-id2')],
+        self.assertEqual([mock.call(self.context, self.host, 'node-id1',
+                                    filters=None),
+                          mock.call(self.context, self.host, 'node-id2',
+                                    filters=None)],
                          reserve_mock.call_args_list)
         self.assertEqual([mock.call(self.context, self.node.id),
                           mock.call(self.context, node2.id)],
@@ -145,6 +150,44 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
         reserve_mock.assert_called(self.context, self.host, 'fake-node-id')
         self.assertEqual(2, reserve_mock.call_count)
 
+    @mock.patch.object(task_manager, '_lock_retry_delay')
+    @mock.patch.object(task_manager, '_wait_for_release')
+    def test_excl_lock_exception_waits_for_release(self, wait_mock,
+                                                   delay_mock,
+                                                   get_ports_mock,
+                                                   get_driver_mock,
+                                                   reserve_mock,
+                                                   release_mock,
+                                                   node_get_mock):
+        self.config(node_locked_retry_attempts=3, group='conductor')
+        delay_mock.side_effect = [1, 2]
+        reserve_mock.side_effect = [
+                exception.NodeLocked(node='fake-node-id', host=self.host),
+                exception.NodeLocked(node='fake-node-id', host='other-host'),
+                self.node]
+
+        with task_manager.TaskManager(self.context, 'fake-node-id'):
+            pass
+
+        self.assertEqual(3, reserve_mock.call_count)
+        self.assertEqual([mock.call(1), mock.call(2)],
+                         delay_mock.call_args_list)
+        self.assertEqual([mock.call('fake-node-id', self.host, 1),
+                          mock.call('fake-node-id', 'other-host', 2)],
+                         wait_mock.call_args_list)
+
+    @mock.patch.object(task_manager, '_notify_release')
+    def test_excl_lock_release_notifies_waiters(self, notify_mock,
+                                                get_ports_mock,
+                                                get_driver_mock,
+                                                reserve_mock, release_mock,
+                                                node_get_mock):
+        reserve_mock.return_value = self.node
+        with task_manager.TaskManager(self.context, 'fake-node-id'):
+            self.assertFalse(notify_mock.called)
+
+        notify_mock.assert_called_once_with(self.node)
+
     def test_excl_lock_reserve_exception(self, get_ports_mock,
                                          get_driver_mock, reserve_mock,
                                          release_mock, node_get_mock):
@@ -160,31 +203,70 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
                           'fake-node-id')
 
         reserve_mock.assert_called_with(self.context, self.host,
-                                        'fake-node-id')
+                                        'fake-node-id', filters=None)
         self.assertEqual(retry_attempts, reserve_mock.call_count)
         self.assertFalse(get_ports_mock.called)
         self.assertFalse(get_driver_mock.called)
         self.assertFalse(release_mock.called)
         self.assertFalse(node_get_mock.called)
 
+    def test_excl_lock_with_filters(self, get_ports_mock, get_driver_mock,
+                                    reserve_mock, release_mock,
+                                    node_get_mock):
+        reserve_mock.return_value = self.node
+        filters = {'maintenance': False}
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      filters=filters) as task:
+            self.assertEqual(self.node, task.node)
+
+        reserve_mock.assert_called_once_with(self.context, self.host,
+                                             'fake-node-id', filters=filters)
+        release_mock.assert_called_once_with(self.context, self.host,
+                                             self.node.id)
+
+    def test_excl_lock_constraints_not_met(self, get_ports_mock,
+                                           get_driver_mock, reserve_mock,
+                                           release_mock, node_get_mock):
+        self.config(node_locked_retry_attempts=3, group='conductor')
+        filters = {'maintenance': False}
+        reserve_mock.side_effect = exception.NodeConstraintsNotMet(
+                node='fake-node-id', constraints=filters)
+
+        self.assertRaises(exception.NodeConstraintsNotMet,
+                          task_manager.TaskManager,
+                          self.context, 'fake-node-id', filters=filters)
+
+        # not retried, the node won't match any better on a second try
+        reserve_mock.assert_called_once_with(self.context, self.host,
+                                             'fake-node-id', filters=filters)
+        self.assertFalse(get_ports_mock.called)
+        self.assertFalse(release_mock.called)
+
+    def test_excl_lock_ports_loaded_lazily(self, get_ports_mock,
+                                           get_driver_mock, reserve_mock,
+                                           release_mock, node_get_mock):
+        reserve_mock.return_value = self.node
+        with task_manager.TaskManager(self.context, 'fake-node-id') as task:
+            self.assertFalse(get_ports_mock.called)
+            self.assertEqual(get_ports_mock.return_value, task.ports)
+            self.assertEqual(get_ports_mock.return_value, task.ports)
+
+        get_ports_mock.assert_called_once_with(self.context, self.node.id)
+        self.assertIsNone(task.ports)
+
     def test_excl_lock_get_ports_exception(self, get_ports_mock,
                                            get_driver_mock, reserve_mock,
                                            release_mock, node_get_mock):
         reserve_mock.return_value = self.node
         get_ports_mock.side_effect = exception.IronicException('foo')
 
-        self.assertRaises(exception.IronicException,
-                          task_manager.TaskManager,
-                          self.context,
-                          'fake-node-id')
+        with task_manager.TaskManager(self.context, 'fake-node-id') as task:
+            self.assertRaises(exception.IronicException,
+                              getattr, task, 'ports')
 
-        reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
         get_ports_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(get_driver_mock.called)
         release_mock.assert_called_once_with(self.context, self.host,
                                              self.node.id)
-        self.assertFalse(node_get_mock.called)
 
     def test_excl_lock_get_driver_exception(self, get_ports_mock,
                                             get_driver_mock, reserve_mock,
@@ -199,8 +281,8 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
                           'fake-node-id')
 
         reserve_mock.assert_called_once_with(self.context, self.host,
-                                             'fake-node-id')
-        get_ports_mock.assert_called_once_with(self.context, self.node.id)
+                                             'fake-node-id', filters=None)
+        self.assertFalse(get_ports_mock.called)
         get_driver_mock.assert_called_once_with(self.node.driver)
         release_mock.assert_called_once_with(self.context, self.host,
                                              self.node.id)
@@ -260,23 +342,16 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
         self.assertFalse(get_ports_mock.called)
         self.assertFalse(get_driver_mock.called)
 
-    def test_shared_lock_get_ports_exception(self, get_ports_mock,
+    def test_shared_lock_ports_loaded_lazily(self, get_ports_mock,
                                              get_driver_mock, reserve_mock,
                                              release_mock, node_get_mock):
         node_get_mock.return_value = self.node
-        get_ports_mock.side_effect = exception.IronicException('foo')
-
-        self.assertRaises(exception.IronicException,
-                          task_manager.TaskManager,
-                          self.context,
-                          'fake-node-id',
-                          shared=True)
+        with task_manager.TaskManager(self.context, 'fake-node-id',
+                                      shared=True) as task:
+            self.assertFalse(get_ports_mock.called)
+            self.assertEqual(get_ports_mock.return_value, task.ports)
 
-        self.assertFalse(reserve_mock.called)
-        self.assertFalse(release_mock.called)
-        node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
         get_ports_mock.assert_called_once_with(self.context, self.node.id)
-        self.assertFalse(get_driver_mock.called)
 
     def test_shared_lock_get_driver_exception(self, get_ports_mock,
                                               get_driver_mock, reserve_mock,
@@ -294,9 +369,40 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
         self.assertFalse(reserve_mock.called)
         self.assertFalse(release_mock.called)
         node_get_mock.assert_called_once_with(self.context, 'fake-node-id')
-        get_ports_mock.assert_called_once_with(self.context, self.node.id)
+        self.assertFalse(get_ports_mock.called)
         get_driver_mock.assert_called_once_with(self.node.driver)
 
+    def test_shared_lock_uses_cache(self, get_ports_mock, get_driver_mock,
+                                    reserve_mock, release_mock,
+                                    node_get_mock):
+        cache.enable(10, 60)
+        node_get_mock.return_value = self.node
+        port = obj_utils.get_test_port(self.context, node_id=self.node.id)
+        get_ports_mock.return_value = [port]
+        for i in range(2):
+            with task_manager.TaskManager(self.context, self.node.uuid,
+                                          shared=True) as task:
+                self.assertEqual(self.node.uuid, task.node.uuid)
+                self.assertEqual([port.uuid], [p.uuid for p in task.ports])
+
+        node_get_mock.assert_called_once_with(self.context, self.node.uuid)
+        get_ports_mock.assert_called_once_with(self.context, self.node.id)
+
+    def test_excl_lock_does_not_use_cache(self, get_ports_mock,
+                                          get_driver_mock, reserve_mock,
+                                          release_mock, node_get_mock):
+        cache.enable(10, 60)
+        cache.add_node(self.node)
+        cache.add_ports(self.node.id, [])
+        reserve_mock.return_value = self.node
+        with task_manager.TaskManager(self.context, self.node.uuid) as task:
+            self.assertEqual(get_ports_mock.return_value, task.ports)
+
+        reserve_mock.assert_called_once_with(self.context, self.host,
+                                             self.node.uuid, filters=None)
+        get_ports_mock.assert_called_once_with(self.context, self.node.id)
+        self.assertFalse(node_get_mock.called)
+
     def test_spawn_after(self, get_ports_mock, get_driver_mock,
                          reserve_mock, release_mock, node_get_mock):
         thread_mock = mock.Mock(spec_set=['link', 'cancel'])
@@ -422,6 +528,43 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
         on_error_handler.assert_called_once_with(expected_exception,
                                                  'fake-argument')
 
+    def test_thread_release_resources(self, get_ports_mock, get_driver_mock,
+                                      reserve_mock, release_mock,
+                                      node_get_mock):
+        thread_mock = mock.Mock(spec_set=['wait'])
+        thread_mock.wait.side_effect = exception.IronicException('foo')
+        on_error_handler = mock.Mock()
+        reserve_mock.return_value = self.node
+
+        task = task_manager.TaskManager(self.context, 'node-id')
+        task.set_spawn_error_hook(on_error_handler, 'fake-argument')
+        task._thread_release_resources(thread_mock)
+
+        # errors of the thread itself are not handled by the hook
+        self.assertFalse(on_error_handler.called)
+        release_mock.assert_called_once_with(self.context, self.host,
+                                             self.node.id)
+
+    def test_thread_release_resources_queue_timeout(self, get_ports_mock,
+                                                    get_driver_mock,
+                                                    reserve_mock,
+                                                    release_mock,
+                                                    node_get_mock):
+        expected_exception = exception.WorkerQueueTimeout(timeout=60)
+        thread_mock = mock.Mock(spec_set=['wait'])
+        thread_mock.wait.side_effect = expected_exception
+        on_error_handler = mock.Mock()
+        reserve_mock.return_value = self.node
+
+        task = task_manager.TaskManager(self.context, 'node-id')
+        task.set_spawn_error_hook(on_error_handler, 'fake-argument')
+        task._thread_release_resources(thread_mock)
+
+        on_error_handler.assert_called_once_with(expected_exception,
+                                                 'fake-argument')
+        release_mock.assert_called_once_with(self.context, self.host,
+                                             self.node.id)
+
     @mock.patch.object(states.machine, 'copy')
     def test_init_prepares_fsm(self, copy_mock, get_ports_mock,
                   get_driver_mock, reserve_mock, release_mock,
@@ -430,11 +573,52 @@ class TaskManagerTestCase(tests_db_base.DbTestCase):
         reserve_mock.return_value = self.node
         copy_mock.return_value = m
         t = task_manager.TaskManager('fake', 'fake')
-        copy_mock.assert_called_once_with()
+        copy_mock.assert_called_once_with(shallow=True)
         self.assertIs(m, t.fsm)
         m.initialize.assert_called_once_with(self.node.provision_state)
 
 
+class LockRetryTestCase(tests_base.TestCase):
+    def setUp(self):
+        super(LockRetryTestCase, self).setUp()
+        self.config(host='test-host')
+        self.config(node_locked_retry_interval=1,
+                    node_locked_retry_max_interval=5, group='conductor')
+        self.addCleanup(task_manager._release_events.clear)
+
+    @mock.patch.object(random, 'uniform')
+    def test_lock_retry_delay(self, uniform_mock):
+        uniform_mock.side_effect = lambda low, high: high
+
+        self.assertEqual([1, 2, 4, 5, 5],
+                         [task_manager._lock_retry_delay(attempt)
+                          for attempt in range(1, 6)])
+        uniform_mock.assert_called_with(2.5, 5)
+
+    @mock.patch.object(eventlet, 'sleep')
+    def test_wait_for_release_other_host(self, sleep_mock):
+        task_manager._wait_for_release('node-uuid', 'other-host', 3)
+
+        sleep_mock.assert_called_once_with(3)
+        self.assertEqual({}, task_manager._release_events)
+
+    def test_wait_for_release_this_host(self):
+        node = mock.Mock(id=1, uuid='node-uuid')
+        waiter = eventlet.spawn(task_manager._wait_for_release,
+                                'node-uuid', 'test-host', 60)
+        eventlet.sleep(0)
+        self.assertIn('node-uuid', task_manager._release_events)
+
+        task_manager._notify_release(node)
+        with eventlet.Timeout(5):
+            waiter.wait()
+        self.assertEqual({}, task_manager._release_events)
+
+    def test_wait_for_release_this_host_timeout(self):
+        with eventlet.Timeout(5):
+            task_manager._wait_for_release('node-uuid', 'test-host', 0.01)
+
+
 class TaskManagerStateModelTestCases(tests_base.TestCase):
     def setUp(self):
         super(TaskManagerStateModelTestCases, self).setUp()
@@ -0,0 +1,113 @@
+# coding=utf-8
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the conductor worker queue."""
+
+import eventlet
+from eventlet import event
+from eventlet import greenpool
+
+from ironic.common import exception
+from ironic.conductor import worker_queue
+from ironic.tests import base
+
+
+class WorkerQueueTestCase(base.TestCase):
+
+    def setUp(self):
+        super(WorkerQueueTestCase, self).setUp()
+        self.pool = greenpool.GreenPool(size=1)
+        self.queue = worker_queue.WorkerQueue(self.pool, size=2, timeout=0)
+        self.started = []
+
+    def _work(self, name, release=None):
+        self.started.append(name)
+        if release is not None:
+            release.wait()
+        return name
+
+    def _fill_pool(self):
+        release = event.Event()
+        thread = self.queue.spawn(worker_queue.PRIORITY_USER, self._work,
+                                  'busy', release)
+        eventlet.sleep(0)
+        return thread, release
+
+    def test_spawn_free(self):
+        thread = self.queue.spawn(worker_queue.PRIORITY_USER, self._work, 'a')
+        self.assertEqual('a', thread.wait())
+        self.assertEqual(0, self.queue.stats()['queued'])
+
+    def test_queue_disabled(self):
+        self.queue = worker_queue.WorkerQueue(self.pool)
+        thread, release = self._fill_pool()
+        self.assertRaises(exception.NoFreeConductorWorker,
+                          self.queue.spawn, worker_queue.PRIORITY_USER,
+                          self._work, 'a')
+        release.send()
+        thread.wait()
+        self.assertEqual(1, self.queue.stats()['rejected'])
+
+    def test_queued_by_priority(self):
+        thread, release = self._fill_pool()
+        background = self.queue.spawn(worker_queue.PRIORITY_BACKGROUND,
+                                      self._work, 'background')
+        user = self.queue.spawn(worker_queue.PRIORITY_USER,
+                                self._work, 'user')
+        self.assertEqual(2, self.queue.depth())
+
+        release.send()
+        self.assertEqual('background', background.wait())
+        self.assertEqual('user', user.wait())
+        self.assertEqual(['busy', 'user', 'background'], self.started)
+
+        stats = self.queue.stats()
+        self.assertEqual(0, stats['depth'])
+        self.assertEqual(2, stats['max_depth'])
+        self.assertEqual(2, stats['queued'])
+        self.assertEqual(2, stats['started'])
+
+    def test_queue_full(self):
+        thread, release = self._fill_pool()
+        for name in ('a', 'b'):
+            self.queue.spawn(worker_queue.PRIORITY_USER, self._work, name)
+        self.assertRaises(exception.NoFreeConductorWorker,
+                          self.queue.spawn, worker_queue.PRIORITY_USER,
+                          self._work, 'c')
+        release.send()
+        self.queue.waitall()
+        self.assertEqual(['busy', 'a', 'b'], self.started)
+        self.assertEqual(1, self.queue.stats()['rejected'])
+
+    def test_queue_timeout(self):
+        self.queue.timeout = 0.01
+        thread, release = self._fill_pool()
+        queued = self.queue.spawn(worker_queue.PRIORITY_USER,
+                                  self._work, 'a')
+
+        self.assertRaises(exception.WorkerQueueTimeout, queued.wait)
+        self.assertEqual(0, self.queue.depth())
+        release.send()
+        thread.wait()
+        self.assertEqual(['busy'], self.started)
+        self.assertEqual(1, self.queue.stats()['timed_out'])
+
+    def test_work_exception(self):
+        def fail():
+            raise exception.IronicException('foo')
+
+        thread, release = self._fill_pool()
+        queued = self.queue.spawn(worker_queue.PRIORITY_USER, fail)
+        release.send()
+        self.assertRaises(exception.IronicException, queued.wait)
@@ -0,0 +1,72 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the routing of queries to the slave database."""
+
+import time
+
+import mock
+
+from ironic.db.sqlalchemy import api as sqla_api
+from ironic.tests.db import base
+from ironic.tests.db import utils
+
+
+@mock.patch.object(sqla_api, 'get_session', wraps=sqla_api.get_session)
+class DbSlaveTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(DbSlaveTestCase, self).setUp()
+        self.node = utils.create_test_node()
+        self.config(max_slave_lag=5, group='database')
+        # as if the latest write was long ago
+        sqla_api._last_write = 0
+
+    def test_nodeinfo_list_use_slave(self, mock_get_session):
+        self.dbapi.get_nodeinfo_list(use_slave=True)
+        mock_get_session.assert_called_once_with(use_slave=True)
+
+    def test_lists_use_master_by_default(self, mock_get_session):
+        for func in (self.dbapi.get_node_list,
+                     self.dbapi.get_nodeinfo_list,
+                     self.dbapi.get_port_list,
+                     self.dbapi.get_chassis_list):
+            mock_get_session.reset_mock()
+            func()
+            mock_get_session.assert_called_once_with(use_slave=False)
+
+    def test_get_and_reserve_use_master(self, mock_get_session):
+        self.dbapi.get_node_by_id(self.node.id)
+        mock_get_session.assert_called_once_with(use_slave=False)
+        mock_get_session.reset_mock()
+        self.dbapi.reserve_node('fake-host', self.node.id)
+        for call in mock_get_session.call_args_list:
+            self.assertNotEqual(mock.call(use_slave=True), call)
+
+    def test_write_records_time(self, mock_get_session):
+        self.dbapi.update_node(self.node.id, {'extra': {'foo': 'bar'}})
+        self.assertTrue(sqla_api._last_write > 0)
+
+    @mock.patch.object(time, 'time')
+    def test_lists_use_master_after_write(self, mock_time, mock_get_session):
+        mock_time.return_value = 1000
+        self.dbapi.update_node(self.node.id, {'extra': {'foo': 'bar'}})
+
+        mock_time.return_value = 1004
+        mock_get_session.reset_mock()
+        self.dbapi.get_nodeinfo_list(use_slave=True)
+        mock_get_session.assert_called_once_with(use_slave=False)
+
+        mock_time.return_value = 1005
+        mock_get_session.reset_mock()
+        self.dbapi.get_nodeinfo_list(use_slave=True)
+        mock_get_session.assert_called_once_with(use_slave=True)
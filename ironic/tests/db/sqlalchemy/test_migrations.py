@@ -51,6 +51,7 @@ from oslo.db.sqlalchemy import utils as db_utils
 import sqlalchemy
 import sqlalchemy.exc
 
+from ironic.common import hash_ring
 from ironic.common.i18n import _LE
 from ironic.common import utils
 from ironic.db.sqlalchemy import migration
@@ -328,6 +329,61 @@ class MigrationCheckersMixin(object):
         self.assertIsInstance(nodes.c.maintenance_reason.type,
                               sqlalchemy.types.String)
 
+    def _pre_upgrade_c97b55b47310(self, engine):
+        nodes = db_utils.get_table(engine, 'nodes')
+        data = {'driver': 'fake', 'uuid': utils.generate_uuid()}
+        nodes.insert().values(data).execute()
+        return data
+
+    def _check_c97b55b47310(self, engine, data):
+        nodes = db_utils.get_table(engine, 'nodes')
+        col_names = [column.name for column in nodes.c]
+        self.assertIn('hash_key', col_names)
+        self.assertIsInstance(nodes.c.hash_key.type,
+                              sqlalchemy.types.String)
+        node = nodes.select(nodes.c.uuid == data['uuid']).execute().first()
+        self.assertEqual(hash_ring.get_hash_key(data['uuid']),
+                         node['hash_key'])
+
+    def _pre_upgrade_4f4b5ad19f9b(self, engine):
+        conductors = db_utils.get_table(engine, 'conductors')
+        data = {'hostname': 'fake-host', 'drivers': '[]'}
+        conductors.insert().values(data).execute()
+        return data
+
+    def _check_4f4b5ad19f9b(self, engine, data):
+        conductors = db_utils.get_table(engine, 'conductors')
+        col_names = [column.name for column in conductors.c]
+        self.assertIn('weight', col_names)
+        self.assertIsInstance(conductors.c.weight.type,
+                              sqlalchemy.types.Float)
+        conductor = conductors.select(
+            conductors.c.hostname == data['hostname']).execute().first()
+        self.assertEqual(1.0, conductor['weight'])
+
+    def _check_1e1d5ace7dc6(self, engine, data):
+        inspector = sqlalchemy.inspect(engine)
+        node_indexes = dict((i['name'], i['column_names'])
+                            for i in inspector.get_indexes('nodes'))
+        self.assertEqual(
+            ['reservation', 'maintenance', 'provision_state'],
+            node_indexes['nodes_reservation_maintenance_provision_state_idx'])
+        self.assertEqual(
+            ['provision_state', 'provision_updated_at'],
+            node_indexes['nodes_provision_state_provision_updated_at_idx'])
+        port_indexes = dict((i['name'], i['column_names'])
+                            for i in inspector.get_indexes('ports'))
+        self.assertEqual(['node_id'], port_indexes['ports_node_id_idx'])
+
+    def _check_2b7e4c91d5f3(self, engine, data):
+        inspector = sqlalchemy.inspect(engine)
+        for table in ('nodes', 'ports'):
+            indexes = dict((i['name'], i['column_names'])
+                           for i in inspector.get_indexes(table))
+            for column in ('created_at', 'updated_at'):
+                self.assertEqual([column],
+                                 indexes['%s_%s_idx' % (table, column)])
+
     def test_upgrade_and_version(self):
         with patch_with_engine(self.engine):
             self.migration_api.upgrade('head')
@@ -0,0 +1,126 @@
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests that the frequent DB API queries are served by indexes.
+
+The queries of the periodic tasks of the conductors run against all the
+nodes every few seconds, so a filter which cannot use an index makes them
+read the whole table. These tests check the query plans chosen by SQLite
+for the filter combinations used by the conductors, and for the refresh
+of their object cache.
+"""
+
+import re
+
+from oslo.utils import timeutils
+from sqlalchemy import event
+
+from ironic.common import states
+from ironic.db.sqlalchemy import api as sqla_api
+from ironic.tests.db import base
+from ironic.tests.db import utils
+
+
+# "SCAN TABLE nodes" in older versions of SQLite, "SCAN nodes" in newer ones
+_FULL_SCAN = re.compile(r'\bSCAN (TABLE )?(\w+)( AS \w+)?$')
+
+
+class DbQueryPlanTestCase(base.DbTestCase):
+
+    def setUp(self):
+        super(DbQueryPlanTestCase, self).setUp()
+        self.engine = sqla_api.get_engine()
+        if self.engine.dialect.name != 'sqlite':
+            self.skipTest('query plans are only checked on SQLite')
+        self.node = utils.create_test_node()
+        utils.create_test_port(node_id=self.node.id)
+
+    def _get_query_plans(self, func, *args, **kwargs):
+        """Call a DB API method and explain the SELECTs it runs.
+
+        :returns: a list of lists of the details of the steps of the plans.
+        """
+        statements = []
+
+        def before_execute(conn, cursor, statement, parameters, context,
+                           executemany):
+            if statement.lstrip().upper().startswith('SELECT'):
+                statements.append((statement, parameters))
+
+        event.listen(self.engine, 'before_cursor_execute', before_execute)
+        try:
+            func(*args, **kwargs)
+        finally:
+            event.remove(self.engine, 'before_cursor_execute', before_execute)
+
+        self.assertTrue(statements)
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            plans = []
+            for statement, parameters in statements:
+                cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+                plans.append([row[-1] for row in cursor.fetchall()])
+            return plans
+        finally:
+            connection.close()
+
+    def _assert_no_full_scan(self, table, func, *args, **kwargs):
+        for plan in self._get_query_plans(func, *args, **kwargs):
+            for step in plan:
+                match = _FULL_SCAN.search(step)
+                self.assertFalse(match and match.group(2) == table,
+                                 'Full scan of %s: %s' % (table, plan))
+
+    def test_sync_power_states_filters(self):
+        filters = {'reserved': False, 'maintenance': False,
+                   'provision_state_not_in': [states.DEPLOYWAIT]}
+        self._assert_no_full_scan('nodes', self.dbapi.get_nodeinfo_list,
+                                  columns=['id', 'uuid', 'driver'],
+                                  filters=filters)
+
+    def test_active_nodes_filters(self):
+        filters = {'reserved': False, 'maintenance': False,
+                   'provision_state': states.ACTIVE}
+        self._assert_no_full_scan('nodes', self.dbapi.get_nodeinfo_list,
+                                  filters=filters)
+
+    def test_deploy_timeouts_filters(self):
+        filters = {'provision_state': states.DEPLOYWAIT,
+                   'provisioned_before': 60}
+        self._assert_no_full_scan('nodes', self.dbapi.get_nodeinfo_list,
+                                  columns=['uuid', 'driver'],
+                                  filters=filters)
+
+    def test_mapped_nodes_filters(self):
+        key_ranges = {'fake': [(None, '4' * 32), ('c' * 32, None)],
+                      'other': None}
+        filters = {'reserved': False, 'maintenance': False,
+                   'hash_key_ranges': key_ranges}
+        self._assert_no_full_scan('nodes', self.dbapi.get_nodeinfo_list,
+                                  filters=filters)
+
+    def test_driver_filter(self):
+        self._assert_no_full_scan('nodes', self.dbapi.get_nodeinfo_list,
+                                  filters={'driver': 'fake'})
+
+    def test_get_ports_by_node_id(self):
+        self._assert_no_full_scan('ports', self.dbapi.get_ports_by_node_id,
+                                  self.node.id)
+
+    def test_get_nodes_changed_since(self):
+        self._assert_no_full_scan('nodes', self.dbapi.get_nodes_changed_since,
+                                  timeutils.utcnow())
+
+    def test_get_ports_changed_since(self):
+        self._assert_no_full_scan('ports', self.dbapi.get_ports_changed_since,
+                                  timeutils.utcnow())
@@ -110,6 +110,50 @@ class DbConductorTestCase(base.DbTestCase):
         self.assertEqual('hostname2', node2.reservation)
         self.assertIsNone(node3.reservation)
 
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_clear_node_reservations_for_dead_conductors(self, mock_utcnow):
+        past = datetime.datetime(2000, 1, 1, 0, 0)
+        present = past + datetime.timedelta(minutes=2)
+        mock_utcnow.return_value = past
+        self._create_test_cdr(id=1, hostname='dead-host')
+        self._create_test_cdr(id=2, hostname='this-host')
+        mock_utcnow.return_value = present
+        self._create_test_cdr(id=3, hostname='live-host')
+        node1 = self.dbapi.create_node({'reservation': 'dead-host'})
+        node2 = self.dbapi.create_node({'reservation': 'live-host'})
+        node3 = self.dbapi.create_node({'reservation': 'this-host'})
+
+        result = self.dbapi.clear_node_reservations_for_dead_conductors(
+                'this-host', interval=60)
+
+        self.assertEqual(['dead-host'], result)
+        self.assertIsNone(self.dbapi.get_node_by_id(node1.id).reservation)
+        self.assertEqual('live-host',
+                         self.dbapi.get_node_by_id(node2.id).reservation)
+        # the caller itself is never considered dead
+        self.assertEqual('this-host',
+                         self.dbapi.get_node_by_id(node3.id).reservation)
+        self.assertRaises(exception.ConductorNotFound,
+                          self.dbapi.get_conductor, 'dead-host')
+        self.dbapi.get_conductor('this-host')
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_clear_node_reservations_for_dead_conductors_once(self,
+                                                              mock_utcnow):
+        past = datetime.datetime(2000, 1, 1, 0, 0)
+        mock_utcnow.return_value = past
+        self._create_test_cdr(id=1, hostname='dead-host')
+        mock_utcnow.return_value = past + datetime.timedelta(minutes=2)
+
+        self.assertEqual(
+                ['dead-host'],
+                self.dbapi.clear_node_reservations_for_dead_conductors(
+                    'host1', interval=60))
+        # another conductor finds nothing left to do
+        self.assertEqual(
+                [], self.dbapi.clear_node_reservations_for_dead_conductors(
+                        'host2', interval=60))
+
     @mock.patch.object(timeutils, 'utcnow')
     def test_get_active_driver_dict_one_host_no_driver(self, mock_utcnow):
         h = 'fake-host'
@@ -200,3 +244,23 @@ class DbConductorTestCase(base.DbTestCase):
         expected = {d: set([h1, h2]), d1: set([h1]), d2: set([h2])}
         result = self.dbapi.get_active_driver_dict(interval=two_minute)
         self.assertEqual(expected, result)
+
+    def test_register_conductor_default_weight(self):
+        c = utils.get_test_conductor()
+        del c['weight']
+        res = self.dbapi.register_conductor(c)
+        self.assertEqual(1.0, res.weight)
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_get_active_conductor_weights(self, mock_utcnow):
+        past = datetime.datetime(2000, 1, 1, 0, 0)
+        present = past + datetime.timedelta(minutes=2)
+
+        mock_utcnow.return_value = past
+        self._create_test_cdr(id=1, hostname='old-host', weight=4.0)
+        mock_utcnow.return_value = present
+        self._create_test_cdr(id=2, hostname='host-one', weight=1.0)
+        self._create_test_cdr(id=3, hostname='host-two', weight=2.5)
+
+        result = self.dbapi.get_active_conductor_weights(interval=60)
+        self.assertEqual({'host-one': 1.0, 'host-two': 2.5}, result)
@@ -22,6 +22,7 @@ from oslo.utils import timeutils
 import six
 
 from ironic.common import exception
+from ironic.common import hash_ring
 from ironic.common import states
 from ironic.common import utils as ironic_utils
 from ironic.tests.db import base
@@ -33,6 +34,10 @@ class DbNodeTestCase(base.DbTestCase):
     def test_create_node(self):
         utils.create_test_node()
 
+    def test_create_node_sets_hash_key(self):
+        node = utils.create_test_node()
+        self.assertEqual(hash_ring.get_hash_key(node.uuid), node.hash_key)
+
     def test_create_node_nullable_chassis_id(self):
         utils.create_test_node(chassis_id=None)
 
@@ -50,6 +55,52 @@ class DbNodeTestCase(base.DbTestCase):
                           uuid=ironic_utils.generate_uuid(),
                           instance_uuid=instance)
 
+    def test_create_nodes(self):
+        values_list = []
+        for i in range(3):
+            values = utils.get_test_node(uuid=ironic_utils.generate_uuid())
+            del values['id']
+            values_list.append(values)
+        del values_list[1]['uuid']
+        del values_list[2]['extra']
+
+        res = self.dbapi.create_nodes(values_list)
+
+        self.assertEqual([v['uuid'] for v in values_list],
+                         [r.uuid for r in res])
+        for node in res:
+            self.assertEqual(hash_ring.get_hash_key(node.uuid), node.hash_key)
+            self.assertEqual(node.id,
+                             self.dbapi.get_node_by_uuid(node.uuid).id)
+
+    def test_create_nodes_already_exists(self):
+        node = utils.create_test_node()
+        values_list = [utils.get_test_node(id=i,
+                                           uuid=ironic_utils.generate_uuid())
+                       for i in range(2, 4)]
+        values_list.append(utils.get_test_node(id=4, uuid=node.uuid))
+        self.assertRaises(exception.NodeAlreadyExists,
+                          self.dbapi.create_nodes, values_list)
+        self.assertEqual([node.id], [n.id for n in self.dbapi.get_node_list()])
+
+    def test_create_nodes_instance_already_associated(self):
+        instance = ironic_utils.generate_uuid()
+        utils.create_test_node(instance_uuid=instance)
+        values = utils.get_test_node(id=2, uuid=ironic_utils.generate_uuid(),
+                                     instance_uuid=instance)
+        self.assertRaises(exception.InstanceAssociated,
+                          self.dbapi.create_nodes, [values])
+
+    def test_get_node_list_instance_uuid_in(self):
+        instance = ironic_utils.generate_uuid()
+        node = utils.create_test_node(instance_uuid=instance)
+        utils.create_test_node(id=2, uuid=ironic_utils.generate_uuid(),
+                               instance_uuid=ironic_utils.generate_uuid())
+        res = self.dbapi.get_node_list(
+                filters={'instance_uuid_in': [instance,
+                                              ironic_utils.generate_uuid()]})
+        self.assertEqual([node.id], [r.id for r in res])
+
     def test_get_node_by_id(self):
         node = utils.create_test_node()
         res = self.dbapi.get_node_by_id(node.id)
@@ -148,6 +199,61 @@ class DbNodeTestCase(base.DbTestCase):
                                                     states.DEPLOYWAIT})
         self.assertEqual([node2.id], [r[0] for r in res])
 
+    def test_get_nodeinfo_list_provision_state_not_in(self):
+        node1 = utils.create_test_node(uuid=ironic_utils.generate_uuid(),
+                                       provision_state=states.NOSTATE)
+        node2 = utils.create_test_node(uuid=ironic_utils.generate_uuid(),
+                                       provision_state=states.DEPLOYWAIT)
+        node3 = utils.create_test_node(uuid=ironic_utils.generate_uuid(),
+                                       provision_state=states.ACTIVE)
+
+        res = self.dbapi.get_nodeinfo_list(
+                filters={'provision_state_not_in': [states.DEPLOYWAIT]})
+        self.assertEqual(sorted([node1.id, node3.id]),
+                         sorted(r[0] for r in res))
+
+        res = self.dbapi.get_nodeinfo_list(
+                filters={'provision_state_not_in': [states.NOSTATE,
+                                                    states.ACTIVE]})
+        self.assertEqual([node2.id], [r[0] for r in res])
+
+    def test_get_node_list_uuid_in(self):
+        uuids = [ironic_utils.generate_uuid() for i in range(3)]
+        for i, uuid in enumerate(uuids):
+            utils.create_test_node(id=i + 1, uuid=uuid)
+
+        res = self.dbapi.get_node_list(
+                filters={'uuid_in': [uuids[0], uuids[2], 'unknown']})
+        self.assertEqual(sorted([uuids[0], uuids[2]]),
+                         sorted(r.uuid for r in res))
+
+    def test_get_nodeinfo_list_hash_key_ranges(self):
+        nodes = [utils.create_test_node(id=i,
+                                        uuid=ironic_utils.generate_uuid(),
+                                        driver='fake' if i % 2 else 'other')
+                 for i in range(1, 11)]
+        fake_keys = sorted(n.hash_key for n in nodes if n.driver == 'fake')
+        ranges = [(None, fake_keys[1]), (fake_keys[3], None)]
+        expected = [n.id for n in nodes if n.driver == 'fake' and
+                    (n.hash_key < fake_keys[1] or n.hash_key >= fake_keys[3])]
+
+        res = self.dbapi.get_nodeinfo_list(
+                filters={'hash_key_ranges': {'fake': ranges}})
+        self.assertEqual(sorted(expected), sorted(r[0] for r in res))
+
+        res = self.dbapi.get_nodeinfo_list(
+                filters={'hash_key_ranges': {'fake': [(fake_keys[1],
+                                                       fake_keys[3])]}})
+        self.assertEqual(2, len(res))
+
+        res = self.dbapi.get_nodeinfo_list(
+                filters={'hash_key_ranges': {'other': None}})
+        self.assertEqual(sorted(n.id for n in nodes if n.driver == 'other'),
+                         sorted(r[0] for r in res))
+
+        res = self.dbapi.get_nodeinfo_list(filters={'hash_key_ranges': {}})
+        self.assertEqual([], res)
+
     def test_get_node_list(self):
         uuids = []
         for i in range(1, 6):
@@ -157,6 +263,45 @@ class DbNodeTestCase(base.DbTestCase):
         res_uuids = [r.uuid for r in res]
         self.assertEqual(uuids.sort(), res_uuids.sort())
 
+    def test_get_node_list_marker(self):
+        nodes = [utils.create_test_node(id=i,
+                                        uuid=ironic_utils.generate_uuid())
+                 for i in range(1, 6)]
+        res = self.dbapi.get_node_list(limit=2, marker={'id': 2})
+        self.assertEqual([3, 4], [r.id for r in res])
+        res = self.dbapi.get_node_list(marker=nodes[3], sort_dir='desc')
+        self.assertEqual([3, 2, 1], [r.id for r in res])
+
+    def test_get_node_list_marker_sort_key(self):
+        # duplicate drivers, and NULL instance uuids
+        for i, driver in enumerate(['b', 'a', 'b', 'c', 'a', 'c'], 1):
+            instance_uuid = ironic_utils.generate_uuid() if i % 2 else None
+            utils.create_test_node(id=i, uuid=ironic_utils.generate_uuid(),
+                                   driver=driver, instance_uuid=instance_uuid)
+        for sort_key in ('driver', 'instance_uuid'):
+            for sort_dir in ('asc', 'desc'):
+                all_nodes = self.dbapi.get_node_list(sort_key=sort_key,
+                                                     sort_dir=sort_dir)
+                for i, node in enumerate(all_nodes):
+                    res = self.dbapi.get_node_list(
+                        marker={sort_key: node[sort_key], 'id': node.id},
+                        sort_key=sort_key, sort_dir=sort_dir)
+                    self.assertEqual([n.id for n in all_nodes[i + 1:]],
+                                     [r.id for r in res])
+
+    def test_get_nodes_changed_since(self):
+        past = datetime.datetime(2000, 1, 1, 0, 0)
+        since = past + datetime.timedelta(minutes=1)
+        later = past + datetime.timedelta(minutes=2)
+        utils.create_test_node(id=1, uuid=ironic_utils.generate_uuid(),
+                               created_at=past)
+        utils.create_test_node(id=2, uuid=ironic_utils.generate_uuid(),
+                               created_at=past, updated_at=later)
+        utils.create_test_node(id=3, uuid=ironic_utils.generate_uuid(),
+                               created_at=later)
+        res = self.dbapi.get_nodes_changed_since(since)
+        self.assertEqual([(2, later), (3, later)], sorted(res))
+
     def test_get_node_list_with_filters(self):
         ch1 = utils.get_test_chassis(id=1, uuid=ironic_utils.generate_uuid())
         ch2 = utils.get_test_chassis(id=2, uuid=ironic_utils.generate_uuid())
@@ -409,6 +554,36 @@ class DbNodeTestCase(base.DbTestCase):
         self.assertRaises(exception.NodeNotFound,
                           self.dbapi.reserve_node, 'fake', node.uuid)
 
+    def test_reserve_node_with_filters(self):
+        node = utils.create_test_node()
+
+        self.dbapi.reserve_node('fake-reservation', node.uuid,
+                                filters={'maintenance': False,
+                                         'provision_state_not_in':
+                                             [states.DEPLOYWAIT]})
+
+        res = self.dbapi.get_node_by_uuid(node.uuid)
+        self.assertEqual('fake-reservation', res.reservation)
+
+    def test_reserve_node_constraints_not_met(self):
+        node = utils.create_test_node(provision_state=states.DEPLOYWAIT)
+
+        self.assertRaises(exception.NodeConstraintsNotMet,
+                          self.dbapi.reserve_node, 'fake-reservation',
+                          node.uuid,
+                          filters={'provision_state_not_in':
+                                       [states.DEPLOYWAIT]})
+        res = self.dbapi.get_node_by_uuid(node.uuid)
+        self.assertIsNone(res.reservation)
+
+    def test_reserve_locked_node_with_filters(self):
+        node = utils.create_test_node(maintenance=True)
+        self.dbapi.reserve_node('fake-reservation', node.uuid)
+
+        self.assertRaises(exception.NodeLocked,
+                          self.dbapi.reserve_node, 'another-reservation',
+                          node.uuid, filters={'maintenance': False})
+
     def test_release_non_existent_node(self):
         node = utils.create_test_node()
         self.dbapi.destroy_node(node.id)
@@ -15,6 +15,8 @@
 
 """Tests for manipulating Ports via the DB API"""
 
+import datetime
+
 import six
 
 from ironic.common import exception
@@ -54,6 +56,43 @@ class DbPortTestCase(base.DbTestCase):
         res_uuids = [r.uuid for r in res]
         self.assertEqual(uuids.sort(), res_uuids.sort())
 
+    def test_get_port_list_filters(self):
+        port = db_utils.create_test_port(id=2,
+                                         uuid=ironic_utils.generate_uuid(),
+                                         address='52:54:00:cf:2d:40')
+        res = self.dbapi.get_port_list(
+                filters={'address_in': [port.address, '52:54:00:cf:2d:41']})
+        self.assertEqual([port.id], [r.id for r in res])
+        res = self.dbapi.get_port_list(
+                filters={'uuid_in': [self.port.uuid, port.uuid]})
+        self.assertEqual([self.port.id, port.id], [r.id for r in res])
+
+    def test_create_ports(self):
+        values_list = []
+        for i in range(3):
+            values = db_utils.get_test_port(uuid=ironic_utils.generate_uuid(),
+                                            node_id=self.node.id,
+                                            address='52:54:00:cf:2d:4%s' % i)
+            del values['id']
+            values_list.append(values)
+        del values_list[0]['uuid']
+
+        res = self.dbapi.create_ports(values_list)
+
+        self.assertEqual([v['uuid'] for v in values_list],
+                         [r.uuid for r in res])
+        self.assertEqual(4, len(self.dbapi.get_ports_by_node_id(self.node.id)))
+
+    def test_create_ports_duplicated_address(self):
+        addresses = ['52:54:00:cf:2d:40', self.port.address]
+        values_list = [db_utils.get_test_port(
+                           id=i + 2, uuid=ironic_utils.generate_uuid(),
+                           node_id=self.node.id, address=address)
+                       for i, address in enumerate(addresses)]
+        self.assertRaises(exception.MACAlreadyExists,
+                          self.dbapi.create_ports, values_list)
+        self.assertEqual(1, len(self.dbapi.get_ports_by_node_id(self.node.id)))
+
     def test_get_ports_by_node_id(self):
         res = self.dbapi.get_ports_by_node_id(self.node.id)
         self.assertEqual(self.port.address, res[0].address)
@@ -61,6 +100,16 @@ class DbPortTestCase(base.DbTestCase):
     def test_get_ports_by_node_id_that_does_not_exist(self):
         self.assertEqual([], self.dbapi.get_ports_by_node_id(99))
 
+    def test_get_ports_changed_since(self):
+        since = datetime.datetime(2000, 1, 1, 0, 0)
+        later = since + datetime.timedelta(minutes=1)
+        self.dbapi.update_port(self.port.id, {'created_at': since,
+                                              'updated_at': later})
+        res = self.dbapi.get_ports_changed_since(since)
+        self.assertEqual([(self.node.id, later)], res)
+        self.assertEqual([], self.dbapi.get_ports_changed_since(
+                                 later + datetime.timedelta(minutes=1)))
+
     def test_destroy_port(self):
         self.dbapi.destroy_port(self.port.id)
         self.assertRaises(exception.PortNotFound,
@@ -252,6 +252,7 @@ def get_test_conductor(**kw):
         'id': kw.get('id', 6),
         'hostname': kw.get('hostname', 'test-conductor-node'),
         'drivers': kw.get('drivers', ['fake-driver', 'null-driver']),
+        'weight': kw.get('weight', 1.0),
         'created_at': kw.get('created_at', timeutils.utcnow()),
         'updated_at': kw.get('updated_at', timeutils.utcnow()),
     }
@@ -457,6 +457,34 @@ class IPMIToolPrivateMethodTestCase(db_base.DbTestCase):
         mock_exec.assert_called_once_with(*args)
         self.assertFalse(mock_sleep.called)
 
+    @mock.patch.object(ipmi, '_is_option_supported')
+    @mock.patch.object(ipmi, '_make_password_file', autospec=True)
+    @mock.patch.object(utils, 'execute', autospec=True)
+    def test__exec_ipmitool_timeout(self, mock_exec, mock_pwf,
+            mock_support, mock_sleep):
+        ipmi.LAST_CMD_TIME = {}
+        pw_file_handle = tempfile.NamedTemporaryFile()
+        pw_file = pw_file_handle.name
+        file_handle = open(pw_file, "w")
+        args = [
+            'timeout', '-s', 'KILL', '30',
+            'ipmitool',
+            '-I', 'lanplus',
+            '-H', self.info['address'],
+            '-L', self.info['priv_level'],
+            '-U', self.info['username'],
+            '-f', file_handle,
+            'A', 'B', 'C',
+            ]
+
+        mock_support.return_value = False
+        mock_pwf.return_value = file_handle
+        mock_exec.return_value = (None, None)
+
+        ipmi._exec_ipmitool(self.info, 'A B C', timeout=30)
+
+        mock_exec.assert_called_once_with(*args)
+
     @mock.patch.object(ipmi, '_is_option_supported')
     @mock.patch.object(ipmi, '_make_password_file', autospec=True)
     @mock.patch.object(utils, 'execute', autospec=True)
@@ -893,6 +921,17 @@ class IPMIToolDriverTestCase(db_base.DbTestCase):
 
         self.assertEqual(mock_exec.call_args_list, expected)
 
+    @mock.patch.object(ipmi, '_parse_ipmi_sensors_data', autospec=True)
+    @mock.patch.object(ipmi, '_exec_ipmitool', autospec=True)
+    def test_get_sensors_data_timeout(self, mock_exec, mock_parse):
+        self.config(send_sensor_data_wait_timeout=30, group='conductor')
+        mock_exec.return_value = ('fake-output', None)
+        with task_manager.acquire(self.context, self.node.uuid,
+                                  shared=True) as task:
+            self.driver.management.get_sensors_data(task)
+        mock_exec.assert_called_once_with(self.info, 'sdr -v', timeout=30)
+        mock_parse.assert_called_once_with(mock.ANY, 'fake-output')
+
     @mock.patch.object(ipmi, '_exec_ipmitool', autospec=True)
     def test_get_power_state_exception(self, mock_exec):
         mock_exec.side_effect = processutils.ProcessExecutionError("error")
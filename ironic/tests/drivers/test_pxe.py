@@ -571,6 +571,34 @@ class PXEDriverTestCase(db_base.DbTestCase):
             self.assertEqual(states.DELETED, state)
             node_power_mock.assert_called_once_with(task, states.POWER_OFF)
 
+    @mock.patch.object(pxe, '_cache_ramdisk_kernel')
+    @mock.patch.object(pxe_utils, 'create_pxe_config')
+    def test_cache_images(self, mock_pxe_config, mock_cache_r_k):
+        self.node.instance_info = dict(self.node.instance_info,
+                                       kernel='fake-kernel',
+                                       ramdisk='fake-ramdisk')
+        self.node.save()
+        with task_manager.acquire(self.context, self.node.uuid,
+                                  shared=True) as task:
+            task.driver.deploy.cache_images(task)
+            pxe_info = mock_cache_r_k.call_args[0][2]
+            self.assertEqual(set(['deploy_kernel', 'deploy_ramdisk',
+                                  'kernel', 'ramdisk']), set(pxe_info))
+            self.assertEqual('fake-kernel', pxe_info['kernel'][0])
+        self.assertFalse(mock_pxe_config.called)
+
+    @mock.patch.object(pxe, '_get_image_info')
+    @mock.patch.object(pxe, '_cache_ramdisk_kernel')
+    def test_cache_images_deploy_only(self, mock_cache_r_k, mock_img_info):
+        with task_manager.acquire(self.context, self.node.uuid,
+                                  shared=True) as task:
+            task.driver.deploy.cache_images(task)
+            pxe_info = mock_cache_r_k.call_args[0][2]
+            self.assertEqual(set(['deploy_kernel', 'deploy_ramdisk']),
+                             set(pxe_info))
+        # the instance images are not looked up, nor the node saved
+        self.assertFalse(mock_img_info.called)
+
     @mock.patch.object(dhcp_factory.DHCPFactory, 'update_dhcp')
     def test_take_over(self, update_dhcp_mock):
         with task_manager.acquire(
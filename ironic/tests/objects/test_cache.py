@@ -0,0 +1,208 @@
+# coding=utf-8
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+import datetime
+import time
+
+import mock
+from oslo.utils import timeutils
+
+from ironic.common import utils
+from ironic import objects
+from ironic.objects import cache
+from ironic.tests import base
+from ironic.tests.db import base as db_base
+from ironic.tests.objects import utils as obj_utils
+
+
+class ObjectCacheTestCase(base.TestCase):
+
+    def setUp(self):
+        super(ObjectCacheTestCase, self).setUp()
+        self.cache = cache.ObjectCache(size=2, ttl=60)
+
+    def test_get_put(self):
+        self.assertIsNone(self.cache.get('a'))
+        self.cache.put('a', 1)
+        self.assertEqual(1, self.cache.get('a'))
+        self.assertEqual(1, self.cache.hits)
+        self.assertEqual(1, self.cache.misses)
+
+    def test_aliases(self):
+        self.cache.put('a', 1, aliases=['b'])
+        self.assertEqual(1, self.cache.get('b'))
+        self.cache.invalidate('b')
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('b'))
+
+    def test_evicts_least_recently_used(self):
+        self.cache.put('a', 1, aliases=['x'])
+        self.cache.put('b', 2)
+        self.cache.get('a')
+        self.cache.put('c', 3)
+        self.assertEqual(2, len(self.cache))
+        self.assertIsNone(self.cache.get('b'))
+        self.assertEqual(1, self.cache.get('x'))
+        self.assertEqual(3, self.cache.get('c'))
+
+    @mock.patch.object(time, 'time')
+    def test_expires(self, mock_time):
+        mock_time.return_value = 1000
+        self.cache.put('a', 1, aliases=['x'])
+        mock_time.return_value = 1059
+        self.assertEqual(1, self.cache.get('a'))
+        mock_time.return_value = 1060
+        self.assertIsNone(self.cache.get('a'))
+        self.assertIsNone(self.cache.get('x'))
+        self.assertEqual(0, len(self.cache))
+
+    def test_invalidate_if(self):
+        self.cache.put(('ports', 1), [])
+        self.cache.put(('node', 1), 1)
+        self.cache.invalidate_if(lambda key: key[0] == 'ports')
+        self.assertIsNone(self.cache.get(('ports', 1)))
+        self.assertEqual(1, self.cache.get(('node', 1)))
+
+
+class CacheTestCase(db_base.DbTestCase):
+
+    def setUp(self):
+        super(CacheTestCase, self).setUp()
+        cache.enable(10, 60)
+        self.node = obj_utils.create_test_node(self.context)
+        self.port = obj_utils.create_test_port(self.context,
+                                               node_id=self.node.id)
+
+    def test_disabled(self):
+        cache.disable()
+        cache.add_node(self.node)
+        self.assertIsNone(cache.get_cache())
+        self.assertIsNone(cache.get_node(self.context, self.node.id))
+
+    def test_enable_zero_size(self):
+        cache.enable(0, 60)
+        self.assertIsNone(cache.get_cache())
+
+    def test_get_node(self):
+        self.assertIsNone(cache.get_node(self.context, self.node.uuid))
+        cache.add_node(self.node)
+        for node_id in (self.node.id, str(self.node.id), self.node.uuid):
+            node = cache.get_node(self.context, node_id)
+            self.assertEqual(self.node.uuid, node.uuid)
+            self.assertEqual(self.context, node._context)
+
+    def test_get_node_returns_copies(self):
+        cache.add_node(self.node)
+        node = cache.get_node(self.context, self.node.id)
+        node.extra = {'foo': 'bar'}
+        self.assertEqual({}, cache.get_node(self.context,
+                                            self.node.id).obj_get_changes())
+        self.assertIsNot(node, cache.get_node(self.context, self.node.id))
+
+    def test_get_ports(self):
+        self.assertIsNone(cache.get_ports(self.context, self.node.id))
+        cache.add_ports(self.node.id, [self.port])
+        ports = cache.get_ports(self.context, self.node.id)
+        self.assertEqual([self.port.uuid], [p.uuid for p in ports])
+
+    def test_node_save_invalidates(self):
+        cache.add_node(self.node)
+        self.node.extra = {'foo': 'bar'}
+        self.node.save()
+        self.assertIsNone(cache.get_node(self.context, self.node.id))
+
+    def test_node_reserve_release_invalidates(self):
+        cache.add_node(self.node)
+        objects.Node.reserve(self.context, 'fake-host', self.node.uuid)
+        self.assertIsNone(cache.get_node(self.context, self.node.id))
+        cache.add_node(self.node)
+        objects.Node.release(self.context, 'fake-host', self.node.uuid)
+        self.assertIsNone(cache.get_node(self.context, self.node.id))
+
+    def test_port_save_invalidates(self):
+        cache.add_ports(self.node.id, [self.port])
+        self.port.extra = {'foo': 'bar'}
+        self.port.save()
+        self.assertIsNone(cache.get_ports(self.context, self.node.id))
+
+    def test_port_create_invalidates(self):
+        cache.add_ports(self.node.id, [self.port])
+        obj_utils.create_test_port(self.context, node_id=self.node.id,
+                                   id=2, uuid=utils.generate_uuid(),
+                                   address='52:54:00:cf:2d:32')
+        self.assertIsNone(cache.get_ports(self.context, self.node.id))
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_refresh(self, mock_utcnow):
+        # after the node and port were created
+        later = datetime.datetime(2100, 1, 1, 0, 0)
+        mock_utcnow.return_value = later
+        cache.enable(10, 60)
+        cache.add_node(self.node)
+        cache.add_ports(self.node.id, [self.port])
+
+        # changed by another service
+        changed_at = later + datetime.timedelta(seconds=5)
+        self.dbapi.update_node(self.node.id, {'extra': {'foo': 'bar'},
+                                              'updated_at': changed_at})
+        mock_utcnow.return_value = later + datetime.timedelta(seconds=10)
+        cache.refresh()
+
+        self.assertIsNone(cache.get_node(self.context, self.node.id))
+        self.assertIsNotNone(cache.get_ports(self.context, self.node.id))
+        self.assertEqual(changed_at, cache._high_water_mark)
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_refresh_margin(self, mock_utcnow):
+        later = datetime.datetime(2100, 1, 1, 0, 0)
+        mock_utcnow.return_value = later
+        cache.enable(10, 60, refresh_margin=30)
+        cache.add_node(self.node)
+
+        # committed after the previous refresh, but timestamped before it
+        changed_at = later - datetime.timedelta(seconds=20)
+        self.dbapi.update_node(self.node.id, {'extra': {'foo': 'bar'},
+                                              'updated_at': changed_at})
+        cache.refresh()
+
+        self.assertIsNone(cache.get_node(self.context, self.node.id))
+        self.assertEqual(later, cache._high_water_mark)
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_refresh_change_in_the_future(self, mock_utcnow):
+        later = datetime.datetime(2100, 1, 1, 0, 0)
+        mock_utcnow.return_value = later
+        cache.enable(10, 60)
+
+        # changed by a service whose clock is ahead
+        changed_at = later + datetime.timedelta(hours=1)
+        self.dbapi.update_node(self.node.id, {'extra': {'foo': 'bar'},
+                                              'updated_at': changed_at})
+        cache.refresh()
+
+        self.assertEqual(later, cache._high_water_mark)
+
+    @mock.patch.object(timeutils, 'utcnow')
+    def test_refresh_unchanged(self, mock_utcnow):
+        later = datetime.datetime(2100, 1, 1, 0, 0)
+        mock_utcnow.return_value = later
+        cache.enable(10, 60)
+        cache.add_node(self.node)
+        cache.add_ports(self.node.id, [self.port])
+
+        cache.refresh()
+
+        self.assertIsNotNone(cache.get_node(self.context, self.node.id))
+        self.assertIsNotNone(cache.get_ports(self.context, self.node.id))
+        self.assertEqual(later, cache._high_water_mark)
@@ -95,6 +95,19 @@ class TestNodeObject(base.DbTestCase):
             self.assertIsInstance(nodes[0], objects.Node)
             self.assertEqual(self.context, nodes[0]._context)
 
+    def test_create_list(self):
+        with mock.patch.object(self.dbapi, 'create_nodes',
+                               autospec=True) as mock_create_nodes:
+            mock_create_nodes.return_value = [self.fake_node]
+            node = objects.Node(self.context, uuid=self.fake_node['uuid'],
+                                driver='fake')
+            nodes = objects.Node.create_list(self.context, [node])
+            mock_create_nodes.assert_called_once_with(
+                    [{'uuid': self.fake_node['uuid'], 'driver': 'fake'}])
+            self.assertThat(nodes, HasLength(1))
+            self.assertEqual(self.fake_node['id'], nodes[0].id)
+            self.assertEqual(self.context, nodes[0]._context)
+
     def test_reserve(self):
         with mock.patch.object(self.dbapi, 'reserve_node',
                                autospec=True) as mock_reserve:
@@ -103,7 +116,8 @@ class TestNodeObject(base.DbTestCase):
             fake_tag = 'fake-tag'
             node = objects.Node.reserve(self.context, fake_tag, node_id)
             self.assertIsInstance(node, objects.Node)
-            mock_reserve.assert_called_once_with(fake_tag, node_id)
+            mock_reserve.assert_called_once_with(fake_tag, node_id,
+                                                 filters=None)
             self.assertEqual(self.context, node._context)
 
     def test_reserve_node_not_found(self):
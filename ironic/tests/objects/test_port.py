@@ -18,6 +18,7 @@ from testtools.matchers import HasLength
 
 from ironic.common import exception
 from ironic import objects
+from ironic.objects import cache
 from ironic.tests.db import base
 from ironic.tests.db import utils
 
@@ -105,3 +106,20 @@ class TestPortObject(base.DbTestCase):
             self.assertThat(ports, HasLength(1))
             self.assertIsInstance(ports[0], objects.Port)
             self.assertEqual(self.context, ports[0]._context)
+
+    @mock.patch.object(cache, 'invalidate_ports')
+    def test_create_list(self, mock_invalidate):
+        with mock.patch.object(self.dbapi, 'create_ports',
+                               autospec=True) as mock_create_ports:
+            mock_create_ports.return_value = [self.fake_port]
+            port = objects.Port(self.context, uuid=self.fake_port['uuid'],
+                                address=self.fake_port['address'])
+            ports = objects.Port.create_list(self.context, [port])
+            mock_create_ports.assert_called_once_with(
+                    [{'uuid': self.fake_port['uuid'],
+                      'address': self.fake_port['address']}])
+            self.assertThat(ports, HasLength(1))
+            self.assertEqual(self.fake_port['id'], ports[0].id)
+            self.assertEqual(self.context, ports[0]._context)
+            mock_invalidate.assert_called_once_with(
+                    self.fake_port['node_id'])
@@ -109,6 +109,48 @@ class FSMTest(base.TestCase):
         self.assertEqual('up', c.current_state)
         self.assertEqual(None, d.current_state)
 
+    def test_freeze(self):
+        c = fsm.FSM()
+        c.add_state('up')
+        c.add_state('down')
+        c.freeze()
+
+        self.assertTrue(c.frozen)
+        self.assertRaises(excp.InvalidState, c.add_state, 'left')
+        self.assertRaises(excp.InvalidState,
+                          c.add_transition, 'up', 'down', 'fall')
+        self.assertEqual(['up', 'down'], c.states)
+
+    def test_copy_frozen(self):
+        c = fsm.FSM()
+        c.add_state('up')
+        c.freeze()
+
+        shallow = c.copy(shallow=True)
+        self.assertTrue(shallow.frozen)
+        self.assertRaises(excp.InvalidState, shallow.add_state, 'down')
+
+        deep = c.copy()
+        self.assertFalse(deep.frozen)
+        deep.add_state('down')
+        self.assertEqual(['up'], c.states)
+
+    def test_shallow_copies_are_independent(self):
+        c = fsm.FSM()
+        c.add_state('up')
+        c.add_state('down')
+        c.add_transition('up', 'down', 'fall')
+        c.freeze()
+
+        first = c.copy(shallow=True)
+        second = c.copy(shallow=True)
+        first.initialize('up')
+        second.initialize('up')
+        first.process_event('fall')
+
+        self.assertEqual('down', first.current_state)
+        self.assertEqual('up', second.current_state)
+
     def test_invalid_callbacks(self):
         m = fsm.FSM('working')
         m.add_state('working')
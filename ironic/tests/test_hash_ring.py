@@ -202,6 +202,205 @@ class HashRingTestCase(base.TestCase):
                           hash_ring.HashRing,
                           hosts)
 
+    def test_get_hash_key(self):
+        self.assertEqual(hashlib.md5('fake').hexdigest(),
+                         hash_ring.get_hash_key('fake'))
+
+    def test_get_hash_key_invalid_data(self):
+        self.assertRaises(exception.Invalid, hash_ring.get_hash_key, None)
+
+    def _assert_key_ranges_match_hosts(self, ring, host, num_items=1000):
+        ranges = ring.get_key_ranges(host)
+        for i in range(num_items):
+            item = str(i)
+            key = hash_ring.get_hash_key(item)
+            in_ranges = any((start is None or key >= start) and
+                            (end is None or key < end)
+                            for start, end in ranges)
+            self.assertEqual(host in ring.get_hosts(item), in_ranges)
+
+    def test_get_key_ranges_one_replica(self):
+        hosts = ['foo', 'bar', 'baz']
+        ring = hash_ring.HashRing(hosts, replicas=1)
+        for host in hosts:
+            self._assert_key_ranges_match_hosts(ring, host)
+
+    def test_get_key_ranges_two_replicas(self):
+        hosts = ['foo', 'bar', 'baz']
+        ring = hash_ring.HashRing(hosts, replicas=2)
+        for host in hosts:
+            self._assert_key_ranges_match_hosts(ring, host)
+
+    def test_get_key_ranges_single_host(self):
+        ring = hash_ring.HashRing(['foo'], replicas=1)
+        self.assertEqual([(None, None)], ring.get_key_ranges('foo'))
+
+    def test_get_key_ranges_unknown_host(self):
+        ring = hash_ring.HashRing(['foo', 'bar'], replicas=1)
+        self.assertEqual([], ring.get_key_ranges('baz'))
+
+    def test_get_key_ranges_are_merged(self):
+        hosts = ['foo', 'bar']
+        ring = hash_ring.HashRing(hosts, replicas=1)
+        ranges = ring.get_key_ranges('foo') + ring.get_key_ranges('bar')
+        # adjacent partitions of the same host are returned as one range,
+        # so the number of ranges is at most the number of partitions
+        self.assertTrue(len(ranges) <= len(ring._partitions) + 1)
+        ends = [end for start, end in ring.get_key_ranges('foo')]
+        starts = [start for start, end in ring.get_key_ranges('foo')]
+        self.assertEqual([], [e for e in ends if e in starts and e])
+
+    def _assert_moved_key_ranges_match_hosts(self, ring, new_ring,
+                                             num_items=1000):
+        ranges = ring.get_moved_key_ranges(new_ring)
+        for i in range(num_items):
+            item = str(i)
+            key = hash_ring.get_hash_key(item)
+            in_ranges = any((start is None or key >= start) and
+                            (end is None or key < end)
+                            for start, end in ranges)
+            self.assertEqual(
+                ring.get_hosts(item) != new_ring.get_hosts(item), in_ranges)
+
+    def test_get_moved_key_ranges_join(self):
+        hosts = ['foo', 'bar', 'baz']
+        self._assert_moved_key_ranges_match_hosts(
+                hash_ring.HashRing(hosts, replicas=1),
+                hash_ring.HashRing(hosts + ['qux'], replicas=1))
+
+    def test_get_moved_key_ranges_leave_two_replicas(self):
+        hosts = ['foo', 'bar', 'baz']
+        self._assert_moved_key_ranges_match_hosts(
+                hash_ring.HashRing(hosts, replicas=2),
+                hash_ring.HashRing(hosts[:2], replicas=2))
+
+    def test_get_moved_key_ranges_unchanged(self):
+        hosts = ['foo', 'bar']
+        ring = hash_ring.HashRing(hosts)
+        self.assertEqual([], ring.get_moved_key_ranges(
+                                hash_ring.HashRing(hosts)))
+
+    def test_intersect_key_ranges(self):
+        a, b, c, d = ['%032x' % i for i in range(1, 5)]
+        self.assertEqual([(b, c)], hash_ring.intersect_key_ranges(
+                                       [(a, c)], [(b, d)]))
+        self.assertEqual([(None, a), (c, d)],
+                         hash_ring.intersect_key_ranges(
+                             [(None, b), (c, None)], [(None, a), (c, d)]))
+        self.assertEqual([(a, b)], hash_ring.intersect_key_ranges(
+                                       [(None, None)], [(a, b)]))
+        self.assertEqual([(None, None)], hash_ring.intersect_key_ranges(
+                                             [(None, None)], [(None, None)]))
+
+    def test_intersect_key_ranges_disjoint(self):
+        a, b, c, d = ['%032x' % i for i in range(1, 5)]
+        self.assertEqual([], hash_ring.intersect_key_ranges(
+                                 [(a, b)], [(c, d)]))
+        self.assertEqual([], hash_ring.intersect_key_ranges(
+                                 [(a, b)], [(b, c)]))
+        self.assertEqual([], hash_ring.intersect_key_ranges([(a, b)], []))
+
+    def test_get_hosts_many(self):
+        hosts = ['foo', 'bar', 'baz']
+        ring = hash_ring.HashRing(hosts, replicas=2)
+        items = [str(x) for x in range(1000)]
+        self.assertEqual([ring.get_hosts(item) for item in items],
+                         ring.get_hosts_many(items))
+
+    def test_get_hosts_many_ignore_hosts(self):
+        hosts = ['foo', 'bar', 'baz']
+        ring = hash_ring.HashRing(hosts, replicas=2)
+        items = [str(x) for x in range(1000)]
+        self.assertEqual(
+            [ring.get_hosts(item, ignore_hosts=['bar', 'qux'])
+             for item in items],
+            ring.get_hosts_many(items, ignore_hosts=['bar', 'qux']))
+
+    def test_get_hosts_many_empty(self):
+        ring = hash_ring.HashRing(['foo', 'bar'])
+        self.assertEqual([], ring.get_hosts_many([]))
+
+    def test_get_hosts_many_invalid_data(self):
+        ring = hash_ring.HashRing(['foo', 'bar'])
+        self.assertRaises(exception.Invalid,
+                          ring.get_hosts_many,
+                          ['fake', None])
+
+    def _get_shares(self, ring):
+        # the fraction of the ring served by each host
+        size = 2 ** 128
+        partitions = ring._partitions
+        shares = dict((host, 0.0) for host in ring.hosts)
+        for partition in range(len(partitions)):
+            if partition:
+                arc = partitions[partition] - partitions[partition - 1]
+            else:
+                arc = partitions[0] + size - partitions[-1]
+            shares[ring._get_host(partition)] += float(arc) / size
+        return shares
+
+    def test_create_ring_with_weights(self):
+        hosts = ['foo', 'bar', 'baz']
+        ring = hash_ring.HashRing(hosts, weights={'foo': 2, 'bar': 0.5})
+        self.assertEqual({'foo': 2.0, 'bar': 0.5, 'baz': 1.0}, ring.weights)
+        counts = dict((host, 0) for host in hosts)
+        for host in ring._host_hashes.values():
+            counts[host] += 1
+        self.assertEqual({'foo': 2 ** 6, 'bar': 2 ** 4, 'baz': 2 ** 5},
+                         counts)
+
+    def test_create_ring_weight_one_is_unweighted(self):
+        hosts = ['foo', 'bar', 'baz']
+        ring = hash_ring.HashRing(hosts)
+        weighted = hash_ring.HashRing(hosts, weights={'foo': 1, 'bar': 1})
+        self.assertEqual(ring._partitions, weighted._partitions)
+        self.assertEqual([], ring.get_moved_key_ranges(weighted))
+
+    def test_create_ring_invalid_weights(self):
+        hosts = ['foo', 'bar']
+        self.assertRaises(exception.Invalid, hash_ring.HashRing,
+                          hosts, weights={'foo': 0})
+        self.assertRaises(exception.Invalid, hash_ring.HashRing,
+                          hosts, weights={'foo': -1})
+        self.assertRaises(exception.Invalid, hash_ring.HashRing,
+                          hosts, weights={'foo': 'bad'})
+
+    def test_bounded_load(self):
+        hosts = ['host%d' % i for i in range(10)]
+        ring = hash_ring.HashRing(hosts)
+        self.assertEqual(0, ring.load_factor)
+        # hash variance leaves some hosts with more than their fair share
+        self.assertTrue(max(self._get_shares(ring).values()) > 0.11)
+
+        ring = hash_ring.HashRing(hosts, load_factor=0.1)
+        for share in self._get_shares(ring).values():
+            self.assertTrue(share <= 0.11)
+
+    def test_bounded_load_default(self):
+        self.config(hash_bounded_load_factor=0.1)
+        ring = hash_ring.HashRing(['foo', 'bar'])
+        self.assertEqual(0.1, ring.load_factor)
+
+    def test_bounded_load_with_weights(self):
+        hosts = ['host%d' % i for i in range(10)]
+        weights = {'host0': 4, 'host1': 0.5}
+        ring = hash_ring.HashRing(hosts, weights=weights, load_factor=0.1)
+        total = sum(ring.weights.values())
+        for host, share in self._get_shares(ring).items():
+            self.assertTrue(share <= 1.1 * ring.weights[host] / total)
+
+    def test_bounded_load_lookups(self):
+        hosts = ['foo', 'bar', 'baz']
+        ring = hash_ring.HashRing(hosts, replicas=2, load_factor=0.05)
+        items = [str(x) for x in range(1000)]
+        self.assertEqual([ring.get_hosts(item) for item in items],
+                         ring.get_hosts_many(items))
+        for host in hosts:
+            self._assert_key_ranges_match_hosts(ring, host)
+        self._assert_moved_key_ranges_match_hosts(
+                ring, hash_ring.HashRing(hosts + ['qux'], replicas=2,
+                                         load_factor=0.05))
+
     def test_get_hosts_invalid_data(self):
         hosts = ['foo', 'bar']
         ring = hash_ring.HashRing(hosts)
@@ -248,3 +447,95 @@ class HashRingManagerTestCase(db_base.DbTestCase):
         self.assertRaises(exception.DriverNotFound,
                           self.ring_manager.__getitem__,
                           'driver1')
+
+    def test_hash_ring_manager_refresh(self):
+        self.register_conductors()
+        moved = self.ring_manager.refresh()
+        self.assertEqual({'driver1': [(None, None)],
+                          'driver2': [(None, None)]}, moved)
+        self.assertEqual(set(['host1', 'host2']),
+                         self.ring_manager['driver1'].hosts)
+
+    def test_hash_ring_manager_refresh_keeps_unchanged_rings(self):
+        self.register_conductors()
+        self.ring_manager.refresh()
+        ring1 = self.ring_manager['driver1']
+        ring2 = self.ring_manager['driver2']
+        self.dbapi.register_conductor({
+            'hostname': 'host3',
+            'drivers': ['driver1'],
+        })
+
+        moved = self.ring_manager.refresh()
+
+        self.assertEqual(['driver1'], list(moved))
+        self.assertEqual(ring1.get_moved_key_ranges(
+                             self.ring_manager['driver1']),
+                         moved['driver1'])
+        self.assertIsNot(ring1, self.ring_manager['driver1'])
+        self.assertIs(ring2, self.ring_manager['driver2'])
+
+    def test_hash_ring_manager_refresh_removed_driver(self):
+        self.register_conductors()
+        self.ring_manager.refresh()
+        self.dbapi.unregister_conductor('host1')
+
+        moved = self.ring_manager.refresh()
+
+        self.assertEqual([(None, None)], moved['driver2'])
+        self.assertRaises(exception.DriverNotFound,
+                          self.ring_manager.__getitem__,
+                          'driver2')
+
+    def test_hash_ring_manager_refresh_exponent_changed(self):
+        self.register_conductors()
+        self.ring_manager.refresh()
+        ring = self.ring_manager['driver2']
+        self.config(hash_partition_exponent=6)
+
+        moved = self.ring_manager.refresh()
+
+        # a single host serves everything either way
+        self.assertNotIn('driver2', moved)
+        self.assertIsNot(ring, self.ring_manager['driver2'])
+        self.assertEqual(6, self.ring_manager['driver2'].partition_exponent)
+
+    def test_hash_ring_manager_weights(self):
+        self.register_conductors()
+        self.dbapi.register_conductor({
+            'hostname': 'host3',
+            'drivers': ['driver1'],
+            'weight': 2.0,
+        })
+        ring = self.ring_manager['driver1']
+        self.assertEqual({'host1': 1.0, 'host2': 1.0, 'host3': 2.0},
+                         ring.weights)
+
+    def test_hash_ring_manager_refresh_weight_changed(self):
+        self.register_conductors()
+        self.ring_manager.refresh()
+        ring1 = self.ring_manager['driver1']
+        ring2 = self.ring_manager['driver2']
+        self.dbapi.register_conductor({
+            'hostname': 'host2',
+            'drivers': ['driver1'],
+            'weight': 3.0,
+        }, update_existing=True)
+
+        moved = self.ring_manager.refresh()
+
+        self.assertEqual(['driver1'], list(moved))
+        self.assertIsNot(ring1, self.ring_manager['driver1'])
+        self.assertEqual(3.0, self.ring_manager['driver1'].weights['host2'])
+        self.assertIs(ring2, self.ring_manager['driver2'])
+
+    def test_hash_ring_manager_refresh_load_factor_changed(self):
+        self.register_conductors()
+        self.ring_manager.refresh()
+        ring = self.ring_manager['driver1']
+        self.config(hash_bounded_load_factor=0.1)
+
+        self.ring_manager.refresh()
+
+        self.assertIsNot(ring, self.ring_manager['driver1'])
+        self.assertEqual(0.1, self.ring_manager['driver1'].load_factor)
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare deep and shallow copies of the provisioning state machine.
+
+Times what a TaskManager does with its state machine on each lock
+acquire, ie. copy the machine, initialize it and process a deploy
+event, using deep copies versus shallow copies of the shared, frozen
+machine. When tracemalloc is available (Python 3.4+), the number and
+size of the memory blocks allocated per acquire are reported too.
+"""
+
+import optparse
+import os
+import sys
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+top_dir = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                       os.pardir))
+sys.path.insert(0, top_dir)
+
+from ironic.common import states
+
+
+def acquire(shallow):
+    fsm = states.machine.copy(shallow=shallow)
+    fsm.initialize(states.NOSTATE)
+    fsm.process_event('deploy')
+    return fsm
+
+
+def timed(count, shallow):
+    start = time.time()
+    for i in range(count):
+        acquire(shallow)
+    return time.time() - start
+
+
+def allocated(shallow):
+    """Return the number and size of the blocks allocated by acquire()."""
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        fsm = acquire(shallow)
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del fsm
+    stats = after.compare_to(before, 'filename')
+    return (sum(s.count_diff for s in stats),
+            sum(s.size_diff for s in stats))
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-n", "--acquires", dest="acquires", type="int",
+                      help="number of acquires (default: 100000)",
+                      default=100000)
+    (options, args) = parser.parse_args()
+
+    print("%8s %12s %14s" % ('copy', 'time', 'per acquire'))
+    for shallow in (False, True):
+        elapsed = timed(options.acquires, shallow)
+        print("%8s %11.3fs %12.1fus"
+              % ('shallow' if shallow else 'deep', elapsed,
+                 elapsed * 1e6 / options.acquires))
+
+    if tracemalloc is None:
+        print("tracemalloc is not available, allocations are not measured")
+        return
+    print("%8s %12s %14s" % ('copy', 'blocks', 'bytes'))
+    for shallow in (False, True):
+        blocks, size = allocated(shallow)
+        print("%8s %12d %14d"
+              % ('shallow' if shallow else 'deep', blocks, size))
+
+
+if __name__ == '__main__':
+    main()
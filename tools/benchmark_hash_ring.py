@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Compare HashRing.get_hosts() with HashRing.get_hosts_many().
+
+Times the lookup of the given numbers of random node UUIDs, one call per
+UUID versus a single batch call, on a ring built with the configured
+number of conductors, weights, replicas and partition exponent. Rings
+are built and timed both without and with a bounded load factor, along
+with the largest share of the ring served by a conductor relative to its
+fair share.
+"""
+
+import optparse
+import os
+import sys
+import time
+
+top_dir = os.path.abspath(os.path.join(os.path.dirname(__file__),
+                                       os.pardir))
+sys.path.insert(0, top_dir)
+
+from oslo.config import cfg
+
+from ironic.common import hash_ring
+from ironic.common import utils
+
+CONF = cfg.CONF
+
+
+def timed(func, *args, **kwargs):
+    start = time.time()
+    result = func(*args, **kwargs)
+    return time.time() - start, result
+
+
+def max_overload(ring):
+    """Get the largest ratio of a host's share of the ring to its fair one."""
+    size = 2 ** 128
+    partitions = ring._partitions
+    shares = dict((host, 0) for host in ring.hosts)
+    for partition in range(len(partitions)):
+        if partition:
+            arc = partitions[partition] - partitions[partition - 1]
+        else:
+            arc = partitions[0] + size - partitions[-1]
+        shares[ring._get_host(partition)] += arc
+    total_weight = sum(ring.weights.values())
+    return max(float(share) / size * total_weight / ring.weights[host]
+               for host, share in shares.items())
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option("-c", "--conductors", dest="conductors", type="int",
+                      help="number of conductors in the ring (default: 10)",
+                      default=10)
+    parser.add_option("-r", "--replicas", dest="replicas", type="int",
+                      help="number of replicas (default: 1)", default=1)
+    parser.add_option("-e", "--exponent", dest="exponent", type="int",
+                      help="hash partition exponent (default: 5)",
+                      default=5)
+    parser.add_option("-w", "--weights", dest="weights",
+                      help="comma separated conductor weights, repeated "
+                           "across the conductors (default: 1)",
+                      default="1")
+    parser.add_option("-l", "--load-factor", dest="load_factor",
+                      type="float",
+                      help="bounded load factor (default: 0.1)",
+                      default=0.1)
+    parser.add_option("-n", "--lookups", dest="lookups",
+                      help="comma separated numbers of lookups "
+                           "(default: 10000,100000,1000000)",
+                      default="10000,100000,1000000")
+    (options, args) = parser.parse_args()
+
+    CONF([], project='ironic')
+    CONF.set_override('hash_partition_exponent', options.exponent)
+    hosts = ['conductor-%d' % i for i in range(options.conductors)]
+    weights = [float(w) for w in options.weights.split(',')]
+    weights = dict((host, weights[i % len(weights)])
+                   for i, host in enumerate(hosts))
+
+    rings = []
+    for load_factor in (0, options.load_factor):
+        build_time, ring = timed(hash_ring.HashRing, hosts,
+                                 replicas=options.replicas, weights=weights,
+                                 load_factor=load_factor)
+        print("Built a ring of %d partitions with a load factor of %.2f in "
+              "%.3f seconds; max share %.2fx the fair share"
+              % (len(ring._partitions), load_factor, build_time,
+                 max_overload(ring)))
+        rings.append(ring)
+
+    print("%10s %12s %12s %15s %8s" % ('lookups', 'load factor',
+                                       'get_hosts', 'get_hosts_many',
+                                       'speedup'))
+    for count in [int(c) for c in options.lookups.split(',')]:
+        uuids = [utils.generate_uuid() for i in range(count)]
+        for ring in rings:
+            scalar_time, scalar = timed(lambda: [ring.get_hosts(u)
+                                                 for u in uuids])
+            batch_time, batch = timed(ring.get_hosts_many, uuids)
+            if scalar != batch:
+                sys.exit("get_hosts_many() and get_hosts() disagree")
+            print("%10d %12.2f %11.3fs %14.3fs %7.1fx"
+                  % (count, ring.load_factor, scalar_time, batch_time,
+                     scalar_time / max(batch_time, 1e-9)))
+
+
+if __name__ == '__main__':
+    main()